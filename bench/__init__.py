@@ -0,0 +1,3 @@
+# Benchmarks for the timing, dispatch and output paths; each module runs as
+# ``python -m bench.<name>``. Most drive DryRunBackend / SimBackend and run
+# anywhere; the ones measuring hooks or SendInput need Windows.
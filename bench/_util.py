@@ -0,0 +1,48 @@
+from __future__ import annotations
+
+import time
+from contextlib import contextmanager
+from typing import Callable, Iterator
+
+from lib.actions import Actions
+from lib.backend import Backend, DryRunBackend, set_backend
+from lib.config import Settings
+from lib.hotkeys import HotkeyManager
+from lib.log import Logger
+from lib.stats import Histogram
+
+
+def fmt_us(h: Histogram) -> str:
+    s = h.snapshot()
+    return f"n={s['count']} p50={s['p50']}us p90={s['p90']}us p99={s['p99']}us max={s['max']}us"
+
+
+def per_op(total_ns: int, n: int) -> str:
+    return f"{total_ns / n / 1000:.3f} us/op ({n * 1e9 / total_ns:,.0f} ops/s)" if n and total_ns else "-"
+
+
+@contextmanager
+def dry_run(engine: str = "thread", cadence: str = "skip", settings: Settings | None = None,
+            backend: Backend | None = None,
+            is_context_enabled: Callable[[], bool] = lambda: True) -> Iterator[tuple[Backend, HotkeyManager, Actions]]:
+    # Started manager with the standard hotkeys on a real clock; DryRunBackend (output discarded) by default.
+    backend = backend or DryRunBackend()
+    prev = set_backend(backend)
+    try:
+        hk = HotkeyManager(is_context_enabled=is_context_enabled, logger=Logger(None), engine=engine, cadence=cadence)
+        actions = Actions(settings or Settings(), hk)
+        actions.define_hotkeys()
+        hk.start()
+        try:
+            yield backend, hk, actions
+        finally:
+            hk.stop()
+    finally:
+        set_backend(prev)
+
+
+def cpu_during(seconds: float) -> float:
+    # Process CPU seconds used while sleeping for ``seconds`` of wall time.
+    c0 = time.process_time()
+    time.sleep(seconds)
+    return time.process_time() - c0
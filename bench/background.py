@@ -0,0 +1,94 @@
+from __future__ import annotations
+
+import argparse
+import sys
+import threading
+import time
+
+from lib.backend import DryRunBackend, WinBackend
+from lib.keys import vk_of
+from lib.stats import Histogram
+
+from ._util import dry_run, fmt_us
+
+# Cost of the app while the game is in the background (idle mode) against
+# the same app in the foreground with nothing held, plus how quickly the
+# hooks are back when the game returns. --windows runs on the real hooks
+# with output discarded; --keys-per-s injects harmless F24 taps meanwhile,
+# which only cost anything while the hooks are installed:
+#   python -m bench.background --seconds 5 --windows --keys-per-s 200
+
+
+def _hooks_installed(backend, hk) -> bool:
+    if isinstance(backend, WinBackend):
+        return bool(backend.hook_stats(hk._hook_state).get("is_keyboard_hooked"))
+    return not hk.is_idle
+
+
+def _phase(backend, hk, seconds: float, keys_per_s: int) -> float:
+    # Process CPU share over the phase; F24 taps go through the OS (Windows) or the hook callback (dry run).
+    tap = None
+    if keys_per_s and isinstance(backend, WinBackend):
+        tap = backend._winapi.send_key_tap
+    kid = vk_of("F24")
+    c0 = time.process_time()
+    start = time.perf_counter()
+    sent = 0
+    while True:
+        elapsed = time.perf_counter() - start
+        if elapsed >= seconds:
+            break
+        if keys_per_s:
+            while sent < int(elapsed * keys_per_s):
+                if tap is not None:
+                    tap("F24")
+                elif backend.on_key is not None and not hk.is_idle:
+                    backend.on_key(kid, True)
+                    backend.on_key(kid, False)
+                sent += 1
+        time.sleep(0.001 if keys_per_s else 0.05)
+    return (time.process_time() - c0) / seconds
+
+
+def main(argv: list[str] | None = None) -> int:
+    p = argparse.ArgumentParser(prog="python -m bench.background",
+                                description="Measure foreground vs background (idle) cost and resume latency.")
+    p.add_argument("--seconds", type=float, default=3.0, help="length of each phase")
+    p.add_argument("--engine", choices=("thread", "scheduler", "asyncio"), default="thread")
+    p.add_argument("--windows", action="store_true", help="real hooks (Windows only), output discarded")
+    p.add_argument("--keys-per-s", type=int, default=0, help="F24 taps injected during each phase")
+    p.add_argument("--resume-trials", type=int, default=20)
+    args = p.parse_args(argv)
+    if args.windows and sys.platform != "win32":
+        print("--windows needs Windows", file=sys.stderr)
+        return 2
+
+    is_fg = [True]
+    backend = WinBackend(sink="null") if args.windows else DryRunBackend()
+    with dry_run(engine=args.engine, backend=backend, is_context_enabled=lambda: is_fg[0]) as (backend, hk, _):
+        time.sleep(0.2)
+        for label, fg in (("foreground", True), ("background", False)):
+            is_fg[0] = fg
+            hk.on_context_changed(fg)
+            time.sleep(0.1)
+            cpu = _phase(backend, hk, args.seconds, args.keys_per_s)
+            print(f"{label:10s} cpu={cpu * 100:.2f}% threads={threading.active_count()} "
+                  f"idle={int(hk.is_idle)} hooks={int(_hooks_installed(backend, hk))}")
+        resume = Histogram()
+        for _ in range(args.resume_trials):
+            is_fg[0] = False
+            hk.on_context_changed(False)
+            time.sleep(0.02)
+            t0 = time.perf_counter_ns()
+            is_fg[0] = True
+            hk.on_context_changed(True)
+            deadline = time.perf_counter() + 1.0
+            while not _hooks_installed(backend, hk) and time.perf_counter() < deadline:
+                time.sleep(0)
+            resume.record((time.perf_counter_ns() - t0) // 1000)
+        print(f"foreground -> hooks back: {fmt_us(resume)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,86 @@
+from __future__ import annotations
+
+import argparse
+import random
+import sys
+import time
+
+from lib.actions import Actions
+from lib.backend import DryRunBackend, set_backend
+from lib.config import Settings
+from lib.hotkeys import HotkeyManager
+from lib.keys import _GENERIC_VARIANTS, KEY_TABLE, key_ids, name_of, norm
+from lib.log import Logger
+
+from ._util import per_op
+
+# Key-down dispatch throughput with the standard hotkeys defined: the indexed
+# lookup the dispatcher uses, the per-definition scan it replaced (same
+# trigger path once matched), and hook -> ring -> dispatcher end to end.
+# Nothing is started, so triggers only queue on the scheduler heap:
+#   python -m bench.dispatch --events 200000 --bound-share 0.1
+
+
+def _linear_trigger(hk: HotkeyManager, name: str) -> None:
+    # Baseline shape: normalise and match every definition, context check per match.
+    event_norm = norm(name)
+    for hk_def in hk._defs.values():
+        if not hk_def.is_enabled:
+            continue
+        binding_norm = norm(hk_def.key_name)
+        if binding_norm != event_norm and event_norm not in _GENERIC_VARIANTS.get(binding_norm, ()):
+            continue
+        if not hk.is_context_enabled():
+            continue
+        hk.schedule_if_needed(hk_def)
+
+
+def _events(s: Settings, n: int, bound_share: float, seed: int) -> list[int]:
+    rng = random.Random(seed)
+    bound = [kid for k in (s.key_spam_d, s.key_spam_s, s.key_spam_a, s.key_click1, s.key_click2,
+                           s.key_click3, s.key_jitter) for kid in key_ids(k)]
+    unbound = [info.vk for info in KEY_TABLE if info.vk and info.vk not in bound]
+    return [rng.choice(bound) if rng.random() < bound_share else rng.choice(unbound) for _ in range(n)]
+
+
+def main(argv: list[str] | None = None) -> int:
+    p = argparse.ArgumentParser(prog="python -m bench.dispatch", description="Measure hotkey dispatch throughput.")
+    p.add_argument("--events", type=int, default=200_000)
+    p.add_argument("--bound-share", type=float, default=0.1, help="fraction of events on bound keys")
+    p.add_argument("--seed", type=int, default=1)
+    args = p.parse_args(argv)
+
+    prev = set_backend(DryRunBackend())
+    try:
+        settings = Settings()
+        hk = HotkeyManager(is_context_enabled=lambda: True, logger=Logger(None), engine="scheduler")
+        Actions(settings, hk).define_hotkeys()
+        kids = _events(settings, args.events, args.bound_share, args.seed)
+        names = [name_of(kid) for kid in kids]
+
+        t0 = time.perf_counter_ns()
+        for name in names:
+            _linear_trigger(hk, name)
+        print(f"linear scan:  {per_op(time.perf_counter_ns() - t0, len(names))}")
+
+        trigger = hk._maybe_trigger
+        t0 = time.perf_counter_ns()
+        for kid in kids:
+            trigger(kid)
+        print(f"index lookup: {per_op(time.perf_counter_ns() - t0, len(kids))}")
+
+        on_key = hk._on_hook_key
+        pump = hk.pump_events
+        t0 = time.perf_counter_ns()
+        for kid in kids:
+            on_key(kid, True)
+            on_key(kid, False)
+            pump()
+        print(f"hook+ring+dispatch (down/up pairs): {per_op(time.perf_counter_ns() - t0, len(kids))}")
+    finally:
+        set_backend(prev)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,98 @@
+from __future__ import annotations
+
+import argparse
+import random
+import sys
+import threading
+import time
+
+from lib.config import Settings
+from lib.keys import vk_of
+from lib.ring import OutputRecorder
+from lib.stats import Histogram, group_outputs
+
+from ._util import dry_run, fmt_us
+
+# All seven built-in macros held at once on each engine, real clock, output
+# discarded. Reports process CPU, live threads and how far each output
+# interval strays from its stream's median (timing accuracy under load),
+# then stop latency: ClickSeq1 released mid-hold, time until its button-up
+# (sent by the run as it unwinds) reaches the arbiter:
+#   python -m bench.engines --seconds 5 --engine thread --engine asyncio
+
+ENGINES = ("thread", "scheduler", "asyncio")
+
+
+def _trigger_keys(s: Settings) -> list[str]:
+    return [s.key_spam_d, s.key_spam_s, s.key_spam_a, s.key_click1, s.key_click2, s.key_click3, s.key_jitter]
+
+
+def _run(engine: str, seconds: float) -> dict[str, object]:
+    settings = Settings()
+    kids = [vk_of(k) for k in _trigger_keys(settings)]
+    with dry_run(engine=engine, settings=settings) as (backend, hk, _):
+        recorder = OutputRecorder(1 << 18)
+        hk.output.recorder = recorder
+        c0 = time.process_time()
+        for kid in kids:
+            backend.on_key(kid, True)
+        time.sleep(seconds)
+        threads = threading.active_count()
+        cpu = time.process_time() - c0
+        for kid in kids:
+            backend.on_key(kid, False)
+    deviation = Histogram()
+    for key, ts in group_outputs(recorder.records()).items():
+        if key.split()[1] not in ("tap", "down") or len(ts) < 3:
+            continue
+        intervals = sorted(b - a for a, b in zip(ts, ts[1:]))
+        median = intervals[len(intervals) // 2]
+        for v in intervals:
+            deviation.record(abs(v - median) // 1000)
+    return {"cpu": cpu / seconds, "threads": threads, "events": recorder.count, "deviation": deviation}
+
+
+def _stop_latency(engine: str, trials: int, seed: int) -> Histogram:
+    rng = random.Random(seed)
+    settings = Settings()
+    kid = vk_of(settings.key_click1)
+    latency = Histogram()
+    with dry_run(engine=engine, settings=settings) as (backend, hk, _):
+        recorder = OutputRecorder(1 << 12)
+        hk.output.recorder = recorder
+        for _ in range(trials):
+            backend.on_key(kid, True)
+            # Release inside the 225 ms hold, after the down went out.
+            time.sleep(rng.uniform(0.05, 0.15))
+            n = recorder.count
+            release_ns = time.perf_counter_ns()
+            backend.on_key(kid, False)
+            deadline = time.perf_counter() + 1.0
+            while recorder.count == n and time.perf_counter() < deadline:
+                time.sleep(0)
+            ups = [ts for ts, _, action, _ in recorder.records() if action == "up" and ts >= release_ns]
+            if ups:
+                latency.record((ups[0] - release_ns) // 1000)
+            time.sleep(0.02)
+    return latency
+
+
+def main(argv: list[str] | None = None) -> int:
+    p = argparse.ArgumentParser(prog="python -m bench.engines",
+                                description="Compare macro engines with every built-in macro running.")
+    p.add_argument("--seconds", type=float, default=5.0)
+    p.add_argument("--engine", action="append", choices=ENGINES, help="engine to run (repeatable); default: all")
+    p.add_argument("--stop-trials", type=int, default=20, help="release-to-stop samples per engine (0 skips)")
+    p.add_argument("--seed", type=int, default=1)
+    args = p.parse_args(argv)
+    for engine in args.engine or ENGINES:
+        r = _run(engine, args.seconds)
+        print(f"{engine:9s} cpu={r['cpu'] * 100:.1f}% threads={r['threads']} outputs={r['events']}")
+        print(f"          interval deviation from median: {fmt_us(r['deviation'])}")
+        if args.stop_trials:
+            print(f"          release -> stop: {fmt_us(_stop_latency(engine, args.stop_trials, args.seed))}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
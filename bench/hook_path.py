@@ -0,0 +1,104 @@
+from __future__ import annotations
+
+import argparse
+import random
+import sys
+import threading
+import time
+
+from lib.actions import Actions
+from lib.backend import DryRunBackend, set_backend
+from lib.config import Settings
+from lib.hotkeys import HotkeyManager
+from lib.keys import _GENERIC_VARIANTS, KEY_TABLE, VK_NAME_MAP, key_ids, norm
+from lib.log import Logger
+
+from ._util import per_op
+
+# Hook-side cost of a key event and of is_pressed polls: the integer id /
+# bytearray path against the string-name / locked-dict path it replaced
+# (reimplemented here with the baseline's normalisation):
+#   python -m bench.hook_path --events 200000
+
+
+class _StringTable:
+    """Baseline shape: VK -> name in the hook, normalised dict under a lock."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._key_down: dict[str, bool] = {}
+
+    def on_key(self, vk: int, is_down: bool) -> bool:
+        name = VK_NAME_MAP.get(vk) or f"vk_{vk:02x}"
+        with self._lock:
+            self._key_down[norm(name)] = is_down
+        return False
+
+    def is_pressed(self, key_name: str) -> bool:
+        with self._lock:
+            n = norm(key_name)
+            if n in _GENERIC_VARIANTS:
+                if self._key_down.get(n, False):
+                    return True
+                return any(self._key_down.get(v, False) for v in _GENERIC_VARIANTS[n])
+            return self._key_down.get(n, False)
+
+
+def _time_events(on_key, vks: list[int]) -> int:
+    t0 = time.perf_counter_ns()
+    for vk in vks:
+        on_key(vk, True)
+        on_key(vk, False)
+    return time.perf_counter_ns() - t0
+
+
+def _time_polls(is_pressed, names: list[str], rounds: int) -> int:
+    t0 = time.perf_counter_ns()
+    for _ in range(rounds):
+        for name in names:
+            is_pressed(name)
+    return time.perf_counter_ns() - t0
+
+
+def main(argv: list[str] | None = None) -> int:
+    p = argparse.ArgumentParser(prog="python -m bench.hook_path",
+                                description="Measure hook callback and is_pressed cost.")
+    p.add_argument("--events", type=int, default=200_000, help="key down/up pairs")
+    p.add_argument("--polls", type=int, default=200_000, help="is_pressed rounds over the bound keys")
+    p.add_argument("--seed", type=int, default=1)
+    args = p.parse_args(argv)
+
+    prev = set_backend(DryRunBackend())
+    try:
+        s = Settings()
+        hk = HotkeyManager(is_context_enabled=lambda: True, logger=Logger(None), engine="scheduler")
+        Actions(s, hk).define_hotkeys()
+        bound_names = [s.key_spam_d, s.key_spam_s, s.key_spam_a, s.key_click1, s.key_click2, s.key_click3,
+                       s.key_jitter]
+        bound = {kid for name in bound_names for kid in key_ids(name)}
+        # Typing traffic: keys nobody binds, the common case the hook sees.
+        rng = random.Random(args.seed)
+        unbound = [info.vk for info in KEY_TABLE if info.vk and info.vk not in bound]
+        vks = [rng.choice(unbound) for _ in range(args.events)]
+        polled = bound_names + ["shift", "left"]
+
+        ref = _StringTable()
+        print("hook callback, unbound key (down+up pair):")
+        print(f"  string names + lock: {per_op(_time_events(ref.on_key, vks), len(vks))}")
+        print(f"  key ids + bytearray: {per_op(_time_events(hk._on_hook_key, vks), len(vks))}")
+        n = args.polls * len(polled)
+        print(f"is_pressed ({len(polled)} names incl. generic shift and left):")
+        print(f"  string names + lock: {per_op(_time_polls(ref.is_pressed, polled, args.polls), n)}")
+        print(f"  key ids + bytearray: {per_op(_time_polls(hk.is_pressed, polled, args.polls), n)}")
+        kid = key_ids(s.key_spam_d)[0]
+        t0 = time.perf_counter_ns()
+        for _ in range(n):
+            hk.is_id_pressed(kid)
+        print(f"  is_id_pressed:       {per_op(time.perf_counter_ns() - t0, n)}")
+    finally:
+        set_backend(prev)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
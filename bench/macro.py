@@ -0,0 +1,78 @@
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+
+from lib.backend import SimBackend, set_backend
+from lib.macro import compile_macro
+from lib.output import OutputArbiter
+
+from ._util import per_op
+
+# Compile and execute throughput of user macros. Execution drives the step
+# generator directly (no waits): once against no-op outputs for the bare
+# interpreter, once through the output arbiter into SimBackend:
+#   python -m bench.macro --compiles 20000 --steps 200000
+
+PROGRAM = """
+loop {
+  repeat 3 { tap z; wait 30; tap x; wait 30 }
+  click lbutton 20; wait 10
+  press lshift; tap c; release lshift; wait 40
+}
+"""
+
+
+class _NullOut:
+    def tap(self, owner: str, name: str) -> None:
+        pass
+
+    press = release = tap
+
+    def down(self, owner: str, btn_name: str) -> int:
+        return 0
+
+    def up(self, owner: str, btn_name: str, is_forced: bool = False) -> None:
+        pass
+
+
+def _execute(prog, out, n_steps: int) -> int:
+    steps = prog.steps(out, "Macro:bench")
+    t0 = time.perf_counter_ns()
+    for _ in range(n_steps):
+        next(steps)
+    elapsed = time.perf_counter_ns() - t0
+    steps.close()
+    return elapsed
+
+
+def main(argv: list[str] | None = None) -> int:
+    p = argparse.ArgumentParser(prog="python -m bench.macro", description="Measure macro compile and execute throughput.")
+    p.add_argument("--compiles", type=int, default=20_000)
+    p.add_argument("--steps", type=int, default=200_000, help="waits to run through")
+    p.add_argument("--program", default=PROGRAM, help="macro source (default: a mixed combo)")
+    args = p.parse_args(argv)
+
+    t0 = time.perf_counter_ns()
+    for _ in range(args.compiles):
+        prog = compile_macro(args.program)
+    print(f"compile: {per_op(time.perf_counter_ns() - t0, args.compiles)} "
+          f"({len(prog.code) // 3} ops, {len(prog.names)} names)")
+
+    backend = SimBackend()
+    prev = set_backend(backend)
+    try:
+        elapsed = _execute(prog, _NullOut(), args.steps)
+        print(f"interpreter only:     {per_op(elapsed, args.steps)} per wait")
+        elapsed = _execute(prog, OutputArbiter(), args.steps)
+        n = len(backend.events)
+        print(f"arbiter + SimBackend: {per_op(elapsed, args.steps)} per wait, "
+              f"{per_op(elapsed, n)} per output ({n} outputs)")
+    finally:
+        set_backend(prev)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
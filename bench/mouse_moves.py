@@ -0,0 +1,73 @@
+from __future__ import annotations
+
+import argparse
+import ctypes
+import sys
+import time
+
+# Process CPU spent on a synthetic 8 kHz stream of mouse moves with the
+# low-level mouse hook removed and installed (Windows only). Moves are
+# injected with SendInput in 1 ms batches; the injector costs the same in
+# both runs, so the difference is the hook's share:
+#   python -m bench.mouse_moves --seconds 5 --rate 8000
+
+MOUSEEVENTF_MOVE = 0x0001
+
+
+def _inject(winapi, seconds: float, rate: int) -> tuple[int, float]:
+    batch = max(1, rate // 1000)
+    arr = (winapi.INPUT * batch)(*(winapi._mouse_input(MOUSEEVENTF_MOVE) for _ in range(batch)))
+    size = ctypes.sizeof(winapi.INPUT)
+    send = winapi.user32.SendInput
+    sent = 0
+    c0 = time.process_time()
+    start = time.perf_counter()
+    while True:
+        elapsed = time.perf_counter() - start
+        if elapsed >= seconds:
+            break
+        due = int(elapsed * rate) - sent
+        while due > 0:
+            n = min(due, batch)
+            sent += send(n, arr, size)
+            due -= n
+        winapi.msg_wait(1)
+    return sent, time.process_time() - c0
+
+
+def main(argv: list[str] | None = None) -> int:
+    p = argparse.ArgumentParser(prog="python -m bench.mouse_moves",
+                                description="Measure low-level mouse hook CPU under a synthetic move stream.")
+    p.add_argument("--seconds", type=float, default=5.0)
+    p.add_argument("--rate", type=int, default=8000, help="moves per second")
+    args = p.parse_args(argv)
+    if sys.platform != "win32":
+        print("bench.mouse_moves needs Windows (low-level hooks and SendInput)", file=sys.stderr)
+        return 2
+
+    from lib import winapi, winhook
+
+    winapi.time_begin_period(1)
+    try:
+        results = {}
+        for is_mouse_hook in (False, True):
+            state = winhook.start_hooks(lambda kid, is_down: False, lambda kid, is_down: False,
+                                        is_keyboard_hook=False, is_mouse_hook=is_mouse_hook)
+            time.sleep(0.2)
+            try:
+                sent, cpu = _inject(winapi, args.seconds, args.rate)
+            finally:
+                winhook.stop_hooks(state)
+            results[is_mouse_hook] = (sent, cpu)
+            label = "mouse hook on " if is_mouse_hook else "mouse hook off"
+            print(f"{label}: moves={sent} ({sent / args.seconds:.0f}/s) cpu={cpu / args.seconds * 100:.2f}%")
+        sent, cpu = results[True]
+        hook_cpu = cpu - results[False][1]
+        print(f"hook share: {hook_cpu / args.seconds * 100:.2f}% of a core, {hook_cpu * 1e6 / max(1, sent):.2f} us per move")
+    finally:
+        winapi.time_end_period(1)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
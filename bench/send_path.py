@@ -0,0 +1,54 @@
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+
+from ._util import per_op
+
+# Per-event cost of the SendInput path (Windows only): INPUT arrays rebuilt
+# for every event, as before the payload cache, against the cached lookup.
+# SendInput is called with a count of 0, so nothing is injected unless
+# --inject is given (then F24, which nothing binds by default, is sent):
+#   python -m bench.send_path --calls 200000
+
+
+def main(argv: list[str] | None = None) -> int:
+    p = argparse.ArgumentParser(prog="python -m bench.send_path", description="Measure per-tap SendInput path cost.")
+    p.add_argument("--calls", type=int, default=200_000)
+    p.add_argument("--key", default="F24")
+    p.add_argument("--inject", action="store_true", help="really send the events")
+    args = p.parse_args(argv)
+    if sys.platform != "win32":
+        print("bench.send_path needs Windows (SendInput)", file=sys.stderr)
+        return 2
+
+    from lib import winapi
+
+    winapi.prepare_payloads([args.key], ["LButton"])
+    hkl = winapi._payload_hkl
+    size = winapi._INPUT_SIZE
+    send = winapi.user32.SendInput
+    events = [("tap", args.key), ("down", "LButton"), ("up", "LButton")]
+    if args.inject:
+        # Injected clicks would land wherever the cursor is.
+        events = events[:1]
+    count = None if args.inject else 0
+    for action, name in events:
+        t0 = time.perf_counter_ns()
+        for _ in range(args.calls):
+            n, arr = winapi._build_payload(action, name, hkl)
+            send(n if count is None else count, arr, size)
+        rebuilt = time.perf_counter_ns() - t0
+        payloads = winapi._payloads
+        t0 = time.perf_counter_ns()
+        for _ in range(args.calls):
+            n, arr = payloads.get((action, name))
+            send(n if count is None else count, arr, size)
+        cached = time.perf_counter_ns() - t0
+        print(f"{action:4s} {name}: rebuilt {per_op(rebuilt, args.calls)}  cached {per_op(cached, args.calls)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
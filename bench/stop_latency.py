@@ -0,0 +1,71 @@
+from __future__ import annotations
+
+import argparse
+import random
+import sys
+import threading
+import time
+
+from lib.backend import DryRunBackend, set_backend
+from lib.stats import Histogram
+from lib.timing import CancelToken, wait_ms_cancel, wait_ms_token
+
+from ._util import fmt_us
+
+# Release-to-stop latency and CPU per wait: a macro waits out a long hold and
+# is cancelled part-way, once with the token wait the engines use and once
+# with the polling loop (wait_ms_cancel) they replaced:
+#   python -m bench.stop_latency --trials 50 --hold-ms 500
+
+
+def _trial(mode: str, hold_ms: int, cancel_after_s: float) -> tuple[int, float]:
+    token = CancelToken("bench")
+    done: list[int] = []
+    cpu: list[float] = []
+
+    def waiter() -> None:
+        c0 = time.thread_time()
+        if mode == "token":
+            wait_ms_token(hold_ms, token)
+        else:
+            wait_ms_cancel(hold_ms, token.is_set)
+        done.append(time.perf_counter_ns())
+        cpu.append(time.thread_time() - c0)
+
+    t = threading.Thread(target=waiter)
+    start = time.perf_counter()
+    t.start()
+    time.sleep(cancel_after_s)
+    cancel_ns = time.perf_counter_ns()
+    token.set()
+    t.join()
+    return done[0] - cancel_ns, cpu[0] / (time.perf_counter() - start)
+
+
+def main(argv: list[str] | None = None) -> int:
+    p = argparse.ArgumentParser(prog="python -m bench.stop_latency",
+                                description="Compare stop latency and CPU of token and polling waits.")
+    p.add_argument("--trials", type=int, default=30)
+    p.add_argument("--hold-ms", type=int, default=500, help="length of the wait being cancelled")
+    p.add_argument("--seed", type=int, default=1)
+    args = p.parse_args(argv)
+
+    prev = set_backend(DryRunBackend())
+    try:
+        for mode in ("poll", "token"):
+            rng = random.Random(args.seed)
+            latency = Histogram()
+            cpu_share = 0.0
+            for _ in range(args.trials):
+                # Cancel somewhere in the middle of the hold, away from the fine-grained tail.
+                lat_ns, share = _trial(mode, args.hold_ms, rng.uniform(0.2, 0.7) * args.hold_ms / 1000)
+                latency.record(lat_ns // 1000)
+                cpu_share += share
+            print(f"{mode:5s} stop latency: {fmt_us(latency)}  cpu/wait={cpu_share / args.trials * 100:.2f}%")
+    finally:
+        set_backend(prev)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
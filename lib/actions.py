@@ -1,89 +1,216 @@
 ﻿from __future__ import annotations
 
+import random
 import threading
+from typing import Iterator
 
 from .config import Settings
-from .hotkeys import HotkeyManager
-from . import winapi
+from .hotkeys import HotkeyDef, HotkeyManager
+from .backend import get_backend
+from .keys import MOUSE_LEFT, MOUSE_RIGHT
+from .macro import compile_macro
+
+
+# Length of the precomputed shuffled / weighted jitter tables.
+_JITTER_TABLE_SIZE = 256
 
 
 class Actions:
     def __init__(self, settings: Settings, hotkeys: HotkeyManager):
         self.s = settings
         self.hk = hotkeys
+        # (key, delay_ms) steps; replaced as a whole by update_jitter, never mutated.
+        self._jitter_table: tuple[tuple[str, int], ...] = ()
+        # Settings the current table was built from; None until the first build.
+        self._jitter_inputs: tuple | None = None
+        self.update_jitter()
+        self.apply_rate_limit()
 
     def is_context_enabled(self) -> bool:
-        return self.s.is_global_hotkeys or winapi.is_foreground_exe("nikke.exe")
+        return self.hk.is_context_enabled()
+
+    def define_hotkeys(self) -> None:
+        s = self.s
+        hk = self.hk
+        hk.define(HotkeyDef("DSpam", s.key_spam_d, s.is_spam_d_enabled,
+                            lambda stop: self.run_spam(s.key_spam_d, "d", stop, "DSpam"),
+                            lambda: self.spam_steps("d", "DSpam")))
+        hk.define(HotkeyDef("SSpam", s.key_spam_s, s.is_spam_s_enabled,
+                            lambda stop: self.run_spam(s.key_spam_s, "s", stop, "SSpam"),
+                            lambda: self.spam_steps("s", "SSpam")))
+        hk.define(HotkeyDef("ASpam", s.key_spam_a, s.is_spam_a_enabled,
+                            lambda stop: self.run_spam(s.key_spam_a, "a", stop, "ASpam"),
+                            lambda: self.spam_steps("a", "ASpam")))
+
+        hk.define(HotkeyDef("ClickSeq1", s.key_click1, s.is_click1_enabled,
+                            lambda stop: self.run_click(s.key_click1, s.click_btn1,
+                                                         s.click1_hold_ms, s.click1_gap_ms, stop, "ClickSeq1"),
+                            lambda: self.click_steps(s.click_btn1, s.click1_hold_ms, s.click1_gap_ms, "ClickSeq1"),
+                            is_mouse_tracked=True))
+        hk.define(HotkeyDef("ClickSeq2", s.key_click2, s.is_click2_enabled,
+                            lambda stop: self.run_click(s.key_click2, s.click_btn2,
+                                                         s.click2_hold_ms, s.click2_gap_ms, stop, "ClickSeq2"),
+                            lambda: self.click_steps(s.click_btn2, s.click2_hold_ms, s.click2_gap_ms, "ClickSeq2"),
+                            is_mouse_tracked=True))
+        hk.define(HotkeyDef("ClickSeq3", s.key_click3, s.is_click3_enabled,
+                            lambda stop: self.run_click(s.key_click3, s.click_btn3,
+                                                         s.click3_hold_ms, s.click3_gap_ms, stop, "ClickSeq3"),
+                            lambda: self.click_steps(s.click_btn3, s.click3_hold_ms, s.click3_gap_ms, "ClickSeq3"),
+                            is_mouse_tracked=True))
+
+        hk.define(HotkeyDef("Jitter", s.key_jitter, s.is_jitter_enabled,
+                            lambda stop: self.run_jitter(s.key_jitter, stop),
+                            self.jitter_steps,
+                            can_start=lambda: bool(self._jitter_table)))
+        # Everything the macros can emit, so no payload is built on the send path.
+        get_backend().prepare_outputs(["d", "s", "a", "z", "x", "c", "v", "b"], ["LButton", "RButton"])
+        for name, (key_name, source) in s.macros.items():
+            self.define_macro(name, key_name, source)
+
+    def define_macro(self, name: str, key_name: str, source: str) -> bool:
+        # Compiled once here; a program that does not compile is logged and left unbound.
+        hid = f"Macro:{name}"
+        try:
+            prog = compile_macro(source)
+        except ValueError as exc:
+            self.hk.log.event("HK", hid, "compileFail", f"err={exc}")
+            return False
+        out = self.hk.output
+        hk_def = HotkeyDef(hid, key_name, True,
+                           lambda stop: self.hk.run_steps(prog.steps(out, hid), hk_def.key_name, stop),
+                           lambda: prog.steps(out, hid))
+        self.hk.define(hk_def)
+        get_backend().prepare_outputs(*prog.outputs())
+        return True
+
+    def update_jitter(self) -> None:
+        """Rebuilds the jitter table from settings and publishes it to running macros.
+
+        Unchanged inputs keep the current table, so a running sequence is not
+        restarted (or reshuffled) by unrelated settings refreshes.
+        """
+        inputs = _jitter_inputs(self.s)
+        if inputs == self._jitter_inputs:
+            return
+        self._jitter_inputs = inputs
+        self._jitter_table = _build_jitter_table(self.s)
+
+    def apply_rate_limit(self) -> None:
+        s = self.s
+        self.hk.output.set_rate_limit(s.rate_limit_cps, s.rate_limit_button_cps, s.rate_limit_burst,
+                                      is_drop=s.rate_limit_mode == "drop")
 
-    def run_spam(self, trigger_key: str, output_key: str, stop_ev: threading.Event) -> None:
-        while self.hk.should_run(trigger_key, stop_ev):
-            self._press_key(output_key)
-            if not self.hk.wait_ms_cancel(self.s.key_spam_delay_ms, trigger_key, stop_ev):
-                break
+    def run_spam(self, trigger_key: str, output_key: str, stop_ev: threading.Event, owner: str) -> None:
+        self.hk.run_steps(self.spam_steps(output_key, owner), trigger_key, stop_ev)
 
-    def run_click(self, key_name: str, btn_name: str, hold_ms: int, gap_ms: int, stop_ev: threading.Event) -> None:
+    def run_click(self, key_name: str, btn_name: str, hold_ms: int, gap_ms: int, stop_ev: threading.Event,
+                  owner: str) -> None:
+        self.hk.run_steps(self.click_steps(btn_name, hold_ms, gap_ms, owner), key_name, stop_ev)
+
+    def run_jitter(self, trigger_key: str, stop_ev: threading.Event) -> None:
+        self.hk.run_steps(self.jitter_steps(), trigger_key, stop_ev)
+
+    # Step generators: each resume emits output, each yield is the delay (ms)
+    # before the next resume. The driver checks should_run between steps.
+    # owner is the hotkey id the output arbiter attributes held buttons to.
+    def spam_steps(self, output_key: str, owner: str) -> Iterator[int]:
+        while True:
+            self._press_key(output_key, owner)
+            yield self.s.key_spam_delay_ms
+
+    def click_steps(self, btn_name: str, hold_ms: int, gap_ms: int, owner: str) -> Iterator[int]:
         released_any = False
-        if self.hk.is_pressed("left"):
-            self._release_click("LButton")
+        # Physically held buttons: released even though no macro holds them.
+        if self.hk.is_id_pressed(MOUSE_LEFT):
+            self._release_click("LButton", owner, is_forced=True)
             released_any = True
-        if self.hk.is_pressed("right"):
-            self._release_click("RButton")
+        if self.hk.is_id_pressed(MOUSE_RIGHT):
+            self._release_click("RButton", owner, is_forced=True)
             released_any = True
         if released_any:
-            if not self.hk.wait_ms_cancel(gap_ms, key_name, stop_ev):
-                return
+            yield gap_ms
         try:
-            while self.hk.should_run(key_name, stop_ev):
-                self._hold_click(btn_name)
-                if not self.hk.wait_ms_cancel(hold_ms, key_name, stop_ev):
-                    break
-                self._release_click(btn_name)
-                if not self.hk.wait_ms_cancel(gap_ms, key_name, stop_ev):
-                    break
+            while True:
+                wait_ns = self._hold_click(btn_name, owner)
+                if wait_ns:
+                    # Held back by the click rate limit: retry once a token is due.
+                    yield wait_ns / 1_000_000
+                    continue
+                yield hold_ms
+                self._release_click(btn_name, owner)
+                yield gap_ms
         finally:
-            self._release_click(btn_name)
+            self._release_click(btn_name, owner)
 
-    def run_jitter(self, trigger_key: str, stop_ev: threading.Event) -> None:
-        while self.hk.should_run(trigger_key, stop_ev):
-            seq = []
-            if self.s.jitter_z:
-                seq.append("z")
-            if self.s.jitter_x:
-                seq.append("x")
-            if self.s.jitter_c:
-                seq.append("c")
-            if self.s.jitter_v:
-                seq.append("v")
-            if self.s.jitter_b:
-                seq.append("b")
-            if not seq:
-                if not self.hk.wait_ms_cancel(self.s.key_spam_delay_ms, trigger_key, stop_ev):
-                    break
-                continue
-            for key in seq:
-                if not self.hk.should_run(trigger_key, stop_ev):
-                    return
-                self._press_key(key)
-                if not self.hk.wait_ms_cancel(self.s.key_spam_delay_ms, trigger_key, stop_ev):
-                    return
-
-    def _key_from_name(self, name: str):
-        n = name.strip().lower()
-        if len(n) == 1:
-            return n
-        return n
-
-    def _press_key(self, name: str) -> None:
-        key = self._key_from_name(name)
+    def jitter_steps(self) -> Iterator[int]:
+        tap = self.hk.output.tap
+        table = self._jitter_table
+        i = 0
+        while table:
+            key, delay_ms = table[i]
+            tap("Jitter", key)
+            yield delay_ms
+            i += 1
+            if i == len(table):
+                i = 0
+            if self._jitter_table is not table:
+                # A new pattern was published; an empty one ends the run.
+                table = self._jitter_table
+                i = 0
+
+    def _press_key(self, name: str, owner: str) -> None:
+        key = name.strip().lower()
         if not key:
             return
-        winapi.send_key_tap(key)
+        self.hk.output.tap(owner, key)
+
+    def _hold_click(self, btn_name: str, owner: str) -> int:
+        return self.hk.output.down(owner, btn_name)
+
+    def _release_click(self, btn_name: str, owner: str, is_forced: bool = False) -> None:
+        self.hk.output.up(owner, btn_name, is_forced)
+
+
+def _parse_key_values(text: str) -> dict[str, int]:
+    # "z=2 x=1" / "z=2,x=1"; malformed entries are ignored.
+    out: dict[str, int] = {}
+    for part in text.replace(",", " ").split():
+        key, sep, value = part.partition("=")
+        if sep and value.strip().isdigit():
+            out[key.strip().lower()] = int(value)
+    return out
+
 
-    def _click(self, btn_name: str) -> None:
-        winapi.send_mouse_click(btn_name)
+def _jitter_inputs(s: Settings) -> tuple:
+    return (s.jitter_z, s.jitter_x, s.jitter_c, s.jitter_v, s.jitter_b, s.jitter_order,
+            s.jitter_weights, s.jitter_delays_ms, s.key_spam_delay_ms)
 
-    def _hold_click(self, btn_name: str) -> None:
-        winapi.send_mouse_down(btn_name)
 
-    def _release_click(self, btn_name: str) -> None:
-        winapi.send_mouse_up(btn_name)
+def _build_jitter_table(s: Settings) -> tuple[tuple[str, int], ...]:
+    keys = [k for k, on in (("z", s.jitter_z), ("x", s.jitter_x), ("c", s.jitter_c),
+                            ("v", s.jitter_v), ("b", s.jitter_b)) if on]
+    delays = _parse_key_values(s.jitter_delays_ms)
+    step = {k: delays.get(k, s.key_spam_delay_ms) for k in keys}
+    order = s.jitter_order
+    rng = random.Random()
+    if order == "weighted":
+        weights = _parse_key_values(s.jitter_weights)
+        keys = [k for k in keys if weights.get(k, 1) > 0]
+        if not keys:
+            return ()
+        seq = rng.choices(keys, [weights.get(k, 1) for k in keys], k=_JITTER_TABLE_SIZE)
+    elif order == "shuffle" and len(keys) > 1:
+        seq = []
+        while len(seq) < _JITTER_TABLE_SIZE:
+            cycle = keys[:]
+            rng.shuffle(cycle)
+            if seq and cycle[0] == seq[-1]:
+                # No key twice in a row across cycle boundaries.
+                cycle[0], cycle[-1] = cycle[-1], cycle[0]
+            seq.extend(cycle)
+        if len(keys) > 2 and seq[-1] == seq[0]:
+            # The table loops, so its wrap is a cycle boundary as well.
+            seq[-1], seq[-2] = seq[-2], seq[-1]
+    else:
+        seq = keys
+    return tuple((k, step[k]) for k in seq)
@@ -0,0 +1,157 @@
+from __future__ import annotations
+
+import asyncio
+import threading
+from typing import TYPE_CHECKING, Any, Coroutine, Iterator
+
+from .backend import get_backend
+from .timing import CancelToken, _qpc_now_ns, get_wait_profile
+
+if TYPE_CHECKING:
+    from .hotkeys import HotkeyDef, HotkeyManager
+
+
+async def sleep_until(deadline_ns: int, token: threading.Event | None = None) -> bool:
+    """Sleep until the backend clock reaches deadline_ns; False if token fired first.
+
+    Coarse loop sleeps cover all but the last ``mid_above_ms`` of the wait,
+    the tail yields to the loop until the deadline passes.
+    """
+    profile = get_wait_profile()
+    now_ns = get_backend().now_ns
+    while True:
+        if token is not None and token.is_set():
+            return False
+        now = now_ns()
+        if now >= deadline_ns:
+            return True
+        remaining_ms = (deadline_ns - now) / 1_000_000
+        if remaining_ms >= profile.mid_above_ms + 1:
+            await asyncio.sleep((remaining_ms - profile.mid_above_ms) / 1000)
+        elif remaining_ms >= profile.mid_above_ms:
+            await asyncio.sleep(profile.mid_ms / 1000)
+        else:
+            await asyncio.sleep(0)
+
+
+class _Run:
+    __slots__ = ("token", "task", "is_done")
+
+    def __init__(self, token: CancelToken) -> None:
+        self.token = token
+        self.task: asyncio.Task | None = None
+        self.is_done = False
+
+
+class AsyncEngine:
+    """Runs every macro as a task on one asyncio loop thread.
+
+    Step generators are driven by a coroutine with the same cadence and
+    timing accounting as ``HotkeyManager.run_steps``; coroutine ``on_start``
+    functions are awaited directly. A cancelled token cancels the task, so the
+    generator's ``finally`` (button release) runs right away.
+    """
+
+    def __init__(self, hk: HotkeyManager) -> None:
+        self.hk = hk
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._thread: threading.Thread | None = None
+        self._runs: dict[str, _Run] = {}
+
+    def start(self) -> None:
+        ready = threading.Event()
+        self._thread = threading.Thread(target=self._run_loop, args=(ready,), daemon=True)
+        self._thread.start()
+        ready.wait()
+
+    def stop(self) -> None:
+        loop = self._loop
+        if loop is None:
+            return
+        for run in list(self._runs.values()):
+            run.token.set()
+        loop.call_soon_threadsafe(loop.stop)
+        if self._thread and self._thread.is_alive():
+            self._thread.join(timeout=2.0)
+        self._loop = None
+
+    def is_running(self, hotkey_id: str) -> bool:
+        run = self._runs.get(hotkey_id)
+        return run is not None and not run.is_done and not run.token.is_set()
+
+    def submit(self, hk: HotkeyDef, token: CancelToken) -> None:
+        # Registered here, not on the loop, so key repeat sees the run at once.
+        prev = self._runs.get(hk.id)
+        run = _Run(token)
+        self._runs[hk.id] = run
+        if self._loop is None:
+            run.is_done = True
+            return
+        self._loop.call_soon_threadsafe(self._start, hk, run, prev)
+
+    async def run_steps(self, steps: Iterator[int], key_name: str, token: CancelToken) -> None:
+        hk = self.hk
+        hid = token.hotkey_id
+        cad = hk.new_cadence(hid)
+        hk.timing.reset_run(hid)
+        try:
+            while hk.should_run(key_name, token):
+                now = _qpc_now_ns()
+                hk.timing.mark_run(hid, now)
+                cad.mark(now)
+                delay = next(steps, None)
+                if delay is None:
+                    return
+                start = _qpc_now_ns()
+                deadline = cad.next_deadline(delay, start)
+                if not await sleep_until(deadline, token):
+                    return
+                hk.timing.record_wait(hid, start, deadline, _qpc_now_ns())
+        finally:
+            steps.close()
+
+    def _start(self, hk: HotkeyDef, run: _Run, prev: _Run | None) -> None:
+        if run.token.is_set():
+            run.is_done = True
+            return
+        if hk.make_steps:
+            coro = self.run_steps(hk.make_steps(), hk.key_name, run.token)
+        else:
+            coro = hk.on_start(run.token)
+        if prev is not None and prev.task is not None and not prev.task.done():
+            # Re-pressed while the cancelled run is still unwinding: start after it.
+            coro = self._after(prev.task, coro)
+        task = self._loop.create_task(coro)
+        run.task = task
+        task.add_done_callback(lambda t, hid=hk.id, run=run: self._on_done(hid, run, t))
+        loop = self._loop
+        run.token.add_callback(lambda: loop.call_soon_threadsafe(task.cancel))
+        if run.token.is_set():
+            task.cancel()
+
+    async def _after(self, prev: asyncio.Task, coro: Coroutine[Any, Any, None]) -> None:
+        try:
+            await asyncio.wait([prev])
+        except asyncio.CancelledError:
+            coro.close()
+            raise
+        await coro
+
+    def _on_done(self, hotkey_id: str, run: _Run, task: asyncio.Task) -> None:
+        run.is_done = True
+        if not task.cancelled() and task.exception() is not None:
+            self.hk.log.event("HK", hotkey_id, "runError", f"err={task.exception()}")
+
+    def _run_loop(self, ready: threading.Event) -> None:
+        loop = asyncio.new_event_loop()
+        self._loop = loop
+        asyncio.set_event_loop(loop)
+        get_backend().warm()
+        loop.call_soon(ready.set)
+        try:
+            loop.run_forever()
+        finally:
+            for task in asyncio.all_tasks(loop):
+                task.cancel()
+            loop.run_until_complete(asyncio.gather(*asyncio.all_tasks(loop), return_exceptions=True))
+            loop.close()
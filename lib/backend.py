@@ -0,0 +1,318 @@
+from __future__ import annotations
+
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Any, Callable
+
+
+class Backend(ABC):
+    """Platform services used by the timing, hotkey and action layers.
+
+    ``WinBackend`` forwards to ``winapi``/``winhook``; ``SimBackend`` runs on a
+    virtual clock and records outputs so the logic can run off Windows.
+    Abstract methods have no usable default; a backend missing one fails
+    when it is instantiated, not on its first use.
+    """
+
+    @abstractmethod
+    def now_ns(self) -> int:
+        raise NotImplementedError
+
+    @abstractmethod
+    def msg_wait(self, timeout_ms: int) -> None:
+        raise NotImplementedError
+
+    @abstractmethod
+    def wait_event(self, ev: threading.Event, timeout_s: float) -> bool:
+        raise NotImplementedError
+
+    @abstractmethod
+    def send_key_tap(self, name: str) -> None:
+        raise NotImplementedError
+
+    @abstractmethod
+    def send_key_down(self, name: str) -> None:
+        raise NotImplementedError
+
+    @abstractmethod
+    def send_key_up(self, name: str) -> None:
+        raise NotImplementedError
+
+    @abstractmethod
+    def send_mouse_down(self, btn_name: str) -> None:
+        raise NotImplementedError
+
+    @abstractmethod
+    def send_mouse_up(self, btn_name: str) -> None:
+        raise NotImplementedError
+
+    def send_batch(self, events: list[tuple[str, str]]) -> None:
+        # (action, name) pairs in order; backends that can should emit them in one call.
+        for action, name in events:
+            if action == "tap":
+                self.send_key_tap(name)
+            elif action == "press":
+                self.send_key_down(name)
+            elif action == "release":
+                self.send_key_up(name)
+            elif action == "down":
+                self.send_mouse_down(name)
+            elif action == "up":
+                self.send_mouse_up(name)
+
+    @abstractmethod
+    def is_foreground_exe(self, exe_name: str) -> bool:
+        raise NotImplementedError
+
+    def warm(self) -> None:
+        pass
+
+    def prepare_outputs(self, keys: list[str], buttons: list[str], held_keys: list[str] = ()) -> None:
+        pass
+
+    @abstractmethod
+    def start_hooks(self, on_key, on_mouse, on_log=None, on_auto_fail_open=None, budget_us: int = 0,
+                    is_keyboard_hook: bool = True, is_mouse_hook: bool = True) -> Any:
+        raise NotImplementedError
+
+    @abstractmethod
+    def stop_hooks(self, state: Any) -> None:
+        raise NotImplementedError
+
+    def set_key_filter(self, state: Any, key_filter: bytearray) -> None:
+        pass
+
+    def set_hooks(self, state: Any, is_keyboard: bool, is_mouse: bool) -> None:
+        pass
+
+    def set_trace(self, state: Any, trace: Any) -> None:
+        # Hands every hook event to a TraceWriter (None stops).
+        pass
+
+    def hook_stats(self, state: Any) -> dict[str, object]:
+        return {}
+
+
+# Where macro output goes: "real" = SendInput, "null" = discarded,
+# "record" = discarded and kept in an OutputRecorder by the arbiter.
+OUTPUT_SINKS = ("real", "null", "record")
+
+
+def _discard(*args: Any) -> None:
+    pass
+
+
+class WinBackend(Backend):
+    def __init__(self, sink: str = "real") -> None:
+        from . import winapi, winhook
+        self._winapi = winapi
+        self._winhook = winhook
+        self.sink = sink
+        self.msg_wait = winapi.msg_wait
+        if sink == "real":
+            self.send_key_tap = winapi.send_key_tap
+            self.send_key_down = winapi.send_key_down
+            self.send_key_up = winapi.send_key_up
+            self.send_mouse_down = winapi.send_mouse_down
+            self.send_mouse_up = winapi.send_mouse_up
+            self.send_batch = winapi.send_batch
+        else:
+            # Hooks, waits and foreground checks stay real; nothing is injected.
+            self.send_key_tap = self.send_key_down = self.send_key_up = _discard
+            self.send_mouse_down = self.send_mouse_up = self.send_batch = _discard
+        self.is_foreground_exe = winapi.is_foreground_exe
+        self.warm = winapi.warm_send_path
+        self.prepare_outputs = winapi.prepare_payloads
+
+    # Class-level forms for Backend; __init__ rebinds each instance straight to winapi or _discard.
+    def msg_wait(self, timeout_ms: int) -> None:
+        self._winapi.msg_wait(timeout_ms)
+
+    def send_key_tap(self, name: str) -> None:
+        self._winapi.send_key_tap(name)
+
+    def send_key_down(self, name: str) -> None:
+        self._winapi.send_key_down(name)
+
+    def send_key_up(self, name: str) -> None:
+        self._winapi.send_key_up(name)
+
+    def send_mouse_down(self, btn_name: str) -> None:
+        self._winapi.send_mouse_down(btn_name)
+
+    def send_mouse_up(self, btn_name: str) -> None:
+        self._winapi.send_mouse_up(btn_name)
+
+    def is_foreground_exe(self, exe_name: str) -> bool:
+        return self._winapi.is_foreground_exe(exe_name)
+
+    def now_ns(self) -> int:
+        return time.perf_counter_ns()
+
+    def wait_event(self, ev: threading.Event, timeout_s: float) -> bool:
+        return ev.wait(timeout_s)
+
+    def start_hooks(self, on_key, on_mouse, on_log=None, on_auto_fail_open=None, budget_us: int = 0,
+                    is_keyboard_hook: bool = True, is_mouse_hook: bool = True) -> Any:
+        return self._winhook.start_hooks(
+            on_key, on_mouse, on_log=on_log, on_auto_fail_open=on_auto_fail_open, budget_us=budget_us,
+            is_keyboard_hook=is_keyboard_hook, is_mouse_hook=is_mouse_hook)
+
+    def stop_hooks(self, state: Any) -> None:
+        self._winhook.stop_hooks(state)
+
+    def set_key_filter(self, state: Any, key_filter: bytearray) -> None:
+        self._winhook.set_key_filter(state, key_filter)
+
+    def set_hooks(self, state: Any, is_keyboard: bool, is_mouse: bool) -> None:
+        self._winhook.set_hooks(state, is_keyboard, is_mouse)
+
+    def set_trace(self, state: Any, trace: Any) -> None:
+        self._winhook.set_trace(state, trace)
+
+    def hook_stats(self, state: Any) -> dict[str, object]:
+        return self._winhook.hook_stats(state)
+
+
+class SimBackend(Backend):
+    """Virtual clock plus an output recorder.
+
+    Waits advance the clock instead of sleeping. ``events`` holds
+    ``(t_ns, kind, name)`` for every emitted input, in emission order.
+    """
+
+    # msg_wait(0) still costs a little virtual time so spin loops terminate.
+    SPIN_NS = 50_000
+
+    def __init__(self, start_ns: int = 0) -> None:
+        self.now = start_ns
+        self.events: list[tuple[int, str, str]] = []
+        self.foreground_exe = "nikke.exe"
+        self.on_key: Callable[[int, bool], bool] | None = None
+        self.on_mouse: Callable[[int, bool], bool] | None = None
+        self.is_keyboard_hooked = False
+        self.is_mouse_hooked = False
+
+    def now_ns(self) -> int:
+        return self.now
+
+    def advance(self, ns: int) -> None:
+        self.now += max(0, int(ns))
+
+    def msg_wait(self, timeout_ms: int) -> None:
+        self.now += max(self.SPIN_NS, int(timeout_ms) * 1_000_000)
+
+    def wait_event(self, ev: threading.Event, timeout_s: float) -> bool:
+        if not ev.is_set():
+            self.now += max(self.SPIN_NS, int(timeout_s * 1_000_000_000))
+        return ev.is_set()
+
+    def send_key_tap(self, name: str) -> None:
+        self.events.append((self.now, "tap", name))
+
+    def send_key_down(self, name: str) -> None:
+        self.events.append((self.now, "press", name))
+
+    def send_key_up(self, name: str) -> None:
+        self.events.append((self.now, "release", name))
+
+    def send_mouse_down(self, btn_name: str) -> None:
+        self.events.append((self.now, "down", btn_name))
+
+    def send_mouse_up(self, btn_name: str) -> None:
+        self.events.append((self.now, "up", btn_name))
+
+    def is_foreground_exe(self, exe_name: str) -> bool:
+        return self.foreground_exe.lower() == exe_name.lower()
+
+    def start_hooks(self, on_key, on_mouse, on_log=None, on_auto_fail_open=None, budget_us: int = 0,
+                    is_keyboard_hook: bool = True, is_mouse_hook: bool = True) -> Any:
+        self.on_key = on_key
+        self.on_mouse = on_mouse
+        self.is_keyboard_hooked = is_keyboard_hook
+        self.is_mouse_hooked = is_mouse_hook
+        return self
+
+    def set_hooks(self, state: Any, is_keyboard: bool, is_mouse: bool) -> None:
+        self.is_keyboard_hooked = is_keyboard
+        self.is_mouse_hooked = is_mouse
+
+    def stop_hooks(self, state: Any) -> None:
+        self.on_key = None
+        self.on_mouse = None
+        self.is_keyboard_hooked = False
+        self.is_mouse_hooked = False
+
+
+class DryRunBackend(Backend):
+    """Real clock and waits, no OS hooks or input; runs on any platform.
+
+    Used by ``lib.dryrun`` to drive the macros at full speed: outputs are
+    discarded (record them with an ``OutputRecorder`` on the arbiter) and key
+    events are injected through the stored hook callbacks.
+    """
+
+    sink = "null"
+
+    def __init__(self) -> None:
+        self.on_key: Callable[[int, bool], bool] | None = None
+        self.on_mouse: Callable[[int, bool], bool] | None = None
+
+    def send_key_tap(self, name: str) -> None:
+        pass
+
+    def send_key_down(self, name: str) -> None:
+        pass
+
+    def send_key_up(self, name: str) -> None:
+        pass
+
+    def send_mouse_down(self, btn_name: str) -> None:
+        pass
+
+    def send_mouse_up(self, btn_name: str) -> None:
+        pass
+
+    def send_batch(self, events: list[tuple[str, str]]) -> None:
+        pass
+
+    def now_ns(self) -> int:
+        return time.perf_counter_ns()
+
+    def msg_wait(self, timeout_ms: int) -> None:
+        time.sleep(timeout_ms / 1000)
+
+    def wait_event(self, ev: threading.Event, timeout_s: float) -> bool:
+        return ev.wait(timeout_s)
+
+    def is_foreground_exe(self, exe_name: str) -> bool:
+        return True
+
+    def start_hooks(self, on_key, on_mouse, on_log=None, on_auto_fail_open=None, budget_us: int = 0,
+                    is_keyboard_hook: bool = True, is_mouse_hook: bool = True) -> Any:
+        self.on_key = on_key
+        self.on_mouse = on_mouse
+        return self
+
+    def stop_hooks(self, state: Any) -> None:
+        self.on_key = None
+        self.on_mouse = None
+
+
+_backend: Backend | None = None
+
+
+def get_backend() -> Backend:
+    global _backend
+    if _backend is None:
+        _backend = WinBackend()
+    return _backend
+
+
+def set_backend(backend: Backend | None) -> Backend | None:
+    # Returns the previous backend so callers can restore it.
+    global _backend
+    prev = _backend
+    _backend = backend
+    return prev
@@ -1,8 +1,9 @@
 from __future__ import annotations
 
 import configparser
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from pathlib import Path
+from typing import Any
 
 APP_NAME = "NikkeWitchcraft"
 APP_VERSION = "1.05"
@@ -44,6 +45,11 @@ class Settings:
     jitter_c: bool = True
     jitter_v: bool = True
     jitter_b: bool = True
+    # jitter pattern: "cycle" (fixed Z-X-C-V-B order), "shuffle" (each cycle reshuffled),
+    # "weighted" (random draws by weight); "z=2 x=1" weights, "z=40" per-key delays (ms)
+    jitter_order: str = "cycle"
+    jitter_weights: str = ""
+    jitter_delays_ms: str = ""
 
     # buttons
     click_btn1: str = "LButton"
@@ -55,12 +61,41 @@ class Settings:
     is_cursor_lock: bool = False
     is_global_hotkeys: bool = False
 
+    # engine (read at startup): "thread" = one worker per macro, "scheduler" = shared timer thread,
+    # "asyncio" = one event-loop thread, macros as tasks
+    engine: str = "thread"
+    # step timeline: "relative" (chained waits), "catchup" / "skip" (absolute, t0 + n*period)
+    cadence: str = "skip"
+    # wait calibration: p99 bound on deadline overshoot, force re-measure at next start
+    wait_p99_bound_ms: float = 0.5
+    is_wait_recalibrate: bool = False
+    # latency tracing: keep every Nth trigger's full stage timestamps (0 = histograms only)
+    trace_sample_every: int = 0
+    # hook callback p99 budget in us; above it unbound keys bypass Python handling (0 = off)
+    hook_budget_us: int = 500
+    # output sink (read at startup): "real" = SendInput, "null" = discard, "record" = discard and
+    # keep (ns, hotkey, event) records for the timing dump; hooks and timing stay live either way
+    output_sink: str = "real"
+    # binary trace of hook events and outputs (read at startup; empty = off, relative to the settings dir)
+    trace_file: str = ""
+
+    # click rate limit (button downs per second, 0 = off): across all buttons, per button;
+    # burst = clicks allowed back to back; mode "delay" (hold the click back) or "drop"
+    rate_limit_cps: float = 0.0
+    rate_limit_button_cps: float = 0.0
+    rate_limit_burst: int = 1
+    rate_limit_mode: str = "delay"
+
+    # user macros: name -> (trigger key, program text), see lib/macro.py
+    macros: dict[str, tuple[str, str]] = field(default_factory=dict)
+
 
 class ConfigStore:
     def __init__(self, base_dir: Path) -> None:
         self.base_dir = base_dir
         self.base_dir.mkdir(parents=True, exist_ok=True)
         self.ini_path = self.base_dir / f"{APP_NAME}Settings.ini"
+        self.timing_path = self.base_dir / f"{APP_NAME}Timing.ini"
 
     def load(self, settings: Settings) -> Settings:
         if not self.ini_path.exists():
@@ -101,6 +136,9 @@ class ConfigStore:
             s.jitter_c = getbool("Jitter", "C", fallback=s.jitter_c)
             s.jitter_v = getbool("Jitter", "V", fallback=s.jitter_v)
             s.jitter_b = getbool("Jitter", "B", fallback=s.jitter_b)
+            s.jitter_order = get("Jitter", "Order", fallback=s.jitter_order).strip().lower()
+            s.jitter_weights = get("Jitter", "Weights", fallback=s.jitter_weights)
+            s.jitter_delays_ms = get("Jitter", "DelaysMs", fallback=s.jitter_delays_ms)
         if cp.has_section("Buttons"):
             s.click_btn1 = get("Buttons", "ClickSeq1_Button", fallback=s.click_btn1)
             s.click_btn2 = get("Buttons", "ClickSeq2_Button", fallback=s.click_btn2)
@@ -109,6 +147,26 @@ class ConfigStore:
             s.is_auto_start = getbool("General", "AutoStart", fallback=s.is_auto_start)
             s.is_cursor_lock = getbool("General", "CursorLock", fallback=s.is_cursor_lock)
             s.is_global_hotkeys = getbool("General", "GlobalHotkeys", fallback=s.is_global_hotkeys)
+        if cp.has_section("Engine"):
+            s.engine = get("Engine", "Mode", fallback=s.engine).strip().lower()
+            s.cadence = get("Engine", "Cadence", fallback=s.cadence).strip().lower()
+            s.wait_p99_bound_ms = cp.getfloat("Engine", "WaitP99BoundMs", fallback=s.wait_p99_bound_ms)
+            s.is_wait_recalibrate = getbool("Engine", "WaitRecalibrate", fallback=s.is_wait_recalibrate)
+            s.trace_sample_every = max(0, cp.getint("Engine", "TraceSampleEvery", fallback=s.trace_sample_every))
+            s.hook_budget_us = max(0, cp.getint("Engine", "HookBudgetUs", fallback=s.hook_budget_us))
+            s.output_sink = get("Engine", "OutputSink", fallback=s.output_sink).strip().lower()
+            s.trace_file = get("Engine", "TraceFile", fallback=s.trace_file).strip()
+        if cp.has_section("RateLimit"):
+            s.rate_limit_cps = max(0.0, cp.getfloat("RateLimit", "MaxCps", fallback=s.rate_limit_cps))
+            s.rate_limit_button_cps = max(0.0, cp.getfloat("RateLimit", "ButtonMaxCps", fallback=s.rate_limit_button_cps))
+            s.rate_limit_burst = max(1, getint("RateLimit", "Burst", fallback=s.rate_limit_burst))
+            s.rate_limit_mode = get("RateLimit", "Mode", fallback=s.rate_limit_mode).strip().lower()
+        if cp.has_section("Macros"):
+            # Name = <trigger key> | <program>; the program may continue on indented lines.
+            for name, value in cp.items("Macros", raw=True):
+                key, sep, program = value.partition("|")
+                if sep and key.strip() and program.strip():
+                    s.macros[name] = (key.strip(), program.strip())
         return s
 
     def save(self, s: Settings) -> None:
@@ -146,6 +204,9 @@ class ConfigStore:
             "C": str(int(s.jitter_c)),
             "V": str(int(s.jitter_v)),
             "B": str(int(s.jitter_b)),
+            "Order": s.jitter_order,
+            "Weights": s.jitter_weights,
+            "DelaysMs": s.jitter_delays_ms,
         }
         cp["Buttons"] = {
             "ClickSeq1_Button": s.click_btn1,
@@ -157,5 +218,53 @@ class ConfigStore:
             "CursorLock": str(int(s.is_cursor_lock)),
             "GlobalHotkeys": str(int(s.is_global_hotkeys)),
         }
+        cp["Engine"] = {
+            "Mode": s.engine,
+            "Cadence": s.cadence,
+            "WaitP99BoundMs": str(s.wait_p99_bound_ms),
+            "WaitRecalibrate": str(int(s.is_wait_recalibrate)),
+            "TraceSampleEvery": str(s.trace_sample_every),
+            "HookBudgetUs": str(s.hook_budget_us),
+            "OutputSink": s.output_sink,
+            "TraceFile": s.trace_file,
+        }
+        cp["RateLimit"] = {
+            "MaxCps": str(s.rate_limit_cps),
+            "ButtonMaxCps": str(s.rate_limit_button_cps),
+            "Burst": str(s.rate_limit_burst),
+            "Mode": s.rate_limit_mode,
+        }
+        cp["Macros"] = {name: f"{key} | {program}" for name, (key, program) in s.macros.items()}
         with self.ini_path.open("w", encoding="utf-8") as f:
             cp.write(f)
+
+    def load_wait_profile(self, profile: Any) -> Any:
+        if not self.timing_path.exists():
+            return profile
+        cp = configparser.ConfigParser()
+        cp.read(self.timing_path, encoding="utf-8")
+        if not cp.has_section("WaitProfile"):
+            return profile
+        p = profile
+        p.long_ms = cp.getint("WaitProfile", "LongMs", fallback=p.long_ms)
+        p.mid_ms = cp.getint("WaitProfile", "MidMs", fallback=p.mid_ms)
+        p.short_ms = cp.getint("WaitProfile", "ShortMs", fallback=p.short_ms)
+        p.long_above_ms = cp.getfloat("WaitProfile", "LongAboveMs", fallback=p.long_above_ms)
+        p.mid_above_ms = cp.getfloat("WaitProfile", "MidAboveMs", fallback=p.mid_above_ms)
+        p.spin_p99_ms = cp.getfloat("WaitProfile", "SpinP99Ms", fallback=p.spin_p99_ms)
+        p.is_calibrated = cp.getboolean("WaitProfile", "Calibrated", fallback=p.is_calibrated)
+        return p
+
+    def save_wait_profile(self, p: Any) -> None:
+        cp = configparser.ConfigParser()
+        cp["WaitProfile"] = {
+            "LongMs": str(p.long_ms),
+            "MidMs": str(p.mid_ms),
+            "ShortMs": str(p.short_ms),
+            "LongAboveMs": str(p.long_above_ms),
+            "MidAboveMs": str(p.mid_above_ms),
+            "SpinP99Ms": str(p.spin_p99_ms),
+            "Calibrated": str(int(p.is_calibrated)),
+        }
+        with self.timing_path.open("w", encoding="utf-8") as f:
+            cp.write(f)
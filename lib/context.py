@@ -0,0 +1,86 @@
+from __future__ import annotations
+
+import threading
+from typing import Any, Callable
+
+from .config import Settings
+
+
+class ForegroundContext:
+    """Foreground snapshot kept current by the foreground WinEvent hook.
+
+    Reads are O(1) once tracking is on; before that (or when the hook failed
+    to install) they fall back to a live Win32 query through ``backend``.
+    """
+
+    def __init__(self, settings: Settings, exe_name: str = "nikke.exe", backend: Any = None) -> None:
+        self.s = settings
+        self.exe_name = exe_name.lower()
+        self._backend = backend
+        self._lock = threading.Lock()
+        self._listeners: list[Callable[[bool], None]] = []
+        self.is_tracking = False
+        self.is_fg = False
+        self.is_primary = False
+        self.exe = "-"
+        self.hwnd = 0
+        self.queries_avoided = 0
+        self.win32_queries = 0
+
+    def is_enabled(self) -> bool:
+        if self.s.is_global_hotkeys:
+            # No foreground query would be made here either way.
+            return True
+        if not self.is_tracking:
+            return self.refresh()
+        self.queries_avoided += 1
+        return self.is_fg
+
+    def is_foreground(self) -> bool:
+        if not self.is_tracking:
+            return self.refresh()
+        self.queries_avoided += 1
+        return self.is_fg
+
+    def update(self, hwnd: int, exe: str, is_primary: bool) -> bool:
+        """Store a foreground change; returns True when fg/exe changed."""
+        exe = exe.lower() if exe else "-"
+        with self._lock:
+            was_enabled = self.s.is_global_hotkeys or self.is_fg
+            changed = (exe == self.exe_name) != self.is_fg or exe != self.exe
+            self.hwnd = hwnd
+            self.exe = exe
+            self.is_fg = exe == self.exe_name
+            self.is_primary = is_primary
+            is_enabled = self.s.is_global_hotkeys or self.is_fg
+        if was_enabled != is_enabled:
+            self._notify(is_enabled)
+        return changed
+
+    def refresh(self) -> bool:
+        backend = self._get_backend()
+        self.win32_queries += 1
+        is_fg = bool(backend.is_foreground_exe(self.exe_name))
+        self.is_fg = is_fg
+        return self.s.is_global_hotkeys or is_fg
+
+    def add_listener(self, cb: Callable[[bool], None]) -> None:
+        self._listeners.append(cb)
+
+    def info(self) -> str:
+        g = 1 if self.s.is_global_hotkeys else 0
+        fg = 1 if self.is_fg else 0
+        return f"global={g} fg={fg} exe={self.exe}"
+
+    def stats(self) -> dict[str, int]:
+        return {"queries_avoided": self.queries_avoided, "win32_queries": self.win32_queries}
+
+    def _notify(self, is_enabled: bool) -> None:
+        for cb in list(self._listeners):
+            cb(is_enabled)
+
+    def _get_backend(self):
+        if self._backend is None:
+            from .backend import get_backend
+            self._backend = get_backend()
+        return self._backend
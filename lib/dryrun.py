@@ -0,0 +1,128 @@
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+from .actions import Actions
+from .backend import DryRunBackend, set_backend
+from .config import ConfigStore, Settings
+from .hotkeys import HotkeyManager
+from .keys import mouse_id, vk_of
+from .log import Logger
+from .ring import OutputRecorder
+from .stats import group_outputs, output_rates
+from .trace import TraceWriter
+
+# Runs the macros against a discarding output sink in real time and reports
+# what they achieved:
+#   python -m lib.dryrun --seconds 10 --hold F17 --engine scheduler
+
+
+def main(argv: list[str] | None = None) -> int:
+    p = argparse.ArgumentParser(prog="python -m lib.dryrun",
+                                description="Drive the macros with synthetic key holds, without sending input.")
+    p.add_argument("--seconds", type=float, default=5.0, help="how long the keys are held")
+    p.add_argument("--hold", action="append", default=[], metavar="KEY",
+                   help="trigger key to hold (repeatable); default: the DSpam and ClickSeq1 keys")
+    p.add_argument("--settings", type=Path, help="settings directory to load (default: built-in defaults)")
+    p.add_argument("--engine", choices=("thread", "scheduler", "asyncio"), help="override the engine")
+    p.add_argument("--cadence", choices=("relative", "catchup", "skip"), help="override the cadence")
+    p.add_argument("--sink", choices=("null", "record"), default="record",
+                   help="null: count outputs only; record: keep every output for rates and histograms")
+    p.add_argument("--capacity", type=int, default=1 << 20, help="recorder ring size")
+    p.add_argument("--bins", type=int, default=10, help="interval histogram bins")
+    p.add_argument("--trace", type=Path, help="also write the outputs to this trace file (see lib/trace.py)")
+    args = p.parse_args(argv)
+
+    settings = ConfigStore(args.settings).load(Settings()) if args.settings else Settings()
+    if args.engine:
+        settings.engine = args.engine
+    if args.cadence:
+        settings.cadence = args.cadence
+    holds = args.hold or [settings.key_spam_d, settings.key_click1]
+    kids = []
+    for name in holds:
+        kid = vk_of(name)
+        if kid is None:
+            kid = mouse_id(name)
+        if kid is None:
+            p.error(f"unknown key: {name}")
+        kids.append(kid)
+
+    backend = DryRunBackend()
+    prev = set_backend(backend)
+    try:
+        hk = HotkeyManager(is_context_enabled=lambda: True, logger=Logger(None),
+                           engine=settings.engine, cadence=settings.cadence)
+        recorder = OutputRecorder(args.capacity) if args.sink == "record" else None
+        hk.output.recorder = recorder
+        trace = TraceWriter(args.trace) if args.trace else None
+        if trace is not None:
+            trace.start()
+            hk.set_trace(trace)
+        Actions(settings, hk).define_hotkeys()
+        hk.start()
+        try:
+            start = backend.now_ns()
+            for kid in kids:
+                backend.on_key(kid, True)
+            time.sleep(args.seconds)
+            for kid in kids:
+                backend.on_key(kid, False)
+            elapsed = backend.now_ns() - start
+            # Let cancelled runs unwind so their final releases are counted.
+            time.sleep(0.1)
+        finally:
+            hk.stop()
+            if trace is not None:
+                hk.set_trace(None)
+                trace.close()
+    finally:
+        set_backend(prev)
+
+    print(f"engine={settings.engine} cadence={settings.cadence} held={','.join(holds)} "
+          f"seconds={elapsed / 1e9:.2f}")
+    out = hk.output.stats()
+    print(f"output: events={out['events']} ({out['events'] * 1e9 / elapsed:.1f}/s) calls={out['calls']} "
+          f"deduped={out['deduped']} conflicts={out['conflicts']} "
+          f"throttled={out['throttle_delayed']}/{out['throttle_dropped']}")
+    if recorder is None:
+        return 0
+    if recorder.count > len(recorder):
+        print(f"recorder: {recorder.count - len(recorder)} oldest records overwritten, raise --capacity")
+    groups = group_outputs(recorder.records())
+    rates = output_rates(groups, elapsed)
+    for key in sorted(groups):
+        st = rates[key]
+        print(f"\n{key}: count={st['count']} rate={st['per_s']}/s")
+        ts = groups[key]
+        if len(ts) > 1:
+            _print_intervals([(b - a) / 1e6 for a, b in zip(ts, ts[1:])], args.bins)
+    return 0
+
+
+def _print_intervals(intervals: list[float], bins: int, width: int = 40) -> None:
+    # Exact percentiles (all records are at hand) plus a linear histogram from min to max.
+    srt = sorted(intervals)
+
+    def pct(q: float) -> float:
+        return srt[min(len(srt) - 1, int(q * len(srt)))]
+
+    lo, hi = srt[0], srt[-1]
+    print(f"  interval ms: min={lo:.3f} p50={pct(0.5):.3f} p90={pct(0.9):.3f} p99={pct(0.99):.3f} max={hi:.3f}")
+    step = (hi - lo) / bins or 1.0
+    counts = [0] * bins
+    for v in intervals:
+        counts[min(bins - 1, int((v - lo) / step))] += 1
+    peak = max(counts)
+    for i, n in enumerate(counts):
+        if hi == lo and i:
+            break
+        bar = "#" * max(1 if n else 0, n * width // peak)
+        print(f"  {lo + i * step:8.2f} ms | {bar} {n}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
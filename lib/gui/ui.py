@@ -5,7 +5,7 @@ import sys
 from tkinter import ttk, filedialog, messagebox
 from pathlib import Path
 
-from ..config import Settings, ConfigStore, APP_TITLE
+from ..config import Settings, ConfigStore, APP_NAME, APP_TITLE
 from ..log import Logger
 from ..hotkeys import HotkeyManager
 from ..actions import Actions
@@ -61,6 +61,8 @@ class AppUI:
             "ClickSeq2": tk.StringVar(),
             "ClickSeq3": tk.StringVar(),
         }
+        self._limit_info_var = tk.StringVar()
+        self._is_limit_tick = False
 
         self._build()
         self._refresh()
@@ -115,6 +117,9 @@ class AppUI:
         self._add_click_info(info_frame, 0, "ClickSeq1")
         self._add_click_info(info_frame, 1, "ClickSeq2")
         self._add_click_info(info_frame, 2, "ClickSeq3")
+        create_msg_label(info_frame, self._limit_info_var, row=3, column=0, padx=0)
+        # Throttle counters refresh only while the window is shown.
+        self.root.bind("<Map>", lambda e: self._start_limit_tick(), add="+")
         row += 1
 
         self._add_separator(container, row)
@@ -134,7 +139,8 @@ class AppUI:
         btn_row = create_btn_frame(opt_frame, row=3, column=0)
         create_btn_between(btn_row, "開啟設定資料夾", self._open_settings, row=0, column=0, sticky="w", pady=ui.LABEL_PADY)
         create_btn_between(btn_row, "匯出設定", self._export_settings, row=0, column=1, sticky="w")
-        create_btn_last(btn_row, "匯入設定", self._import_settings, row=0, column=2, sticky="w")
+        create_btn_between(btn_row, "匯入設定", self._import_settings, row=0, column=2, sticky="w")
+        create_btn_last(btn_row, "匯出時序統計", self._dump_timing_stats, row=0, column=3, sticky="w")
         row += 1
 
         self._add_separator(container, row)
@@ -307,6 +313,7 @@ class AppUI:
             self.s.jitter_v = not self.s.jitter_v
         elif key == "B":
             self.s.jitter_b = not self.s.jitter_b
+        self.actions.update_jitter()
         self.store.save(self.s)
         self._refresh_jitter_buttons()
 
@@ -347,6 +354,7 @@ class AppUI:
 
     def _toggle_global_hotkeys(self) -> None:
         self.s.is_global_hotkeys = self.chk_global_hotkeys.get() != 0
+        self.hk.on_context_changed(self.hk.is_context_enabled())
         self.store.save(self.s)
 
     def _apply_delays(self) -> None:
@@ -389,22 +397,25 @@ class AppUI:
         self._apply_hotkey_defs()
         self._refresh()
 
+    def _dump_timing_stats(self) -> None:
+        path = self.store.base_dir / f"{APP_NAME}TimingStats.json"
+        try:
+            self.hk.dump_timing_stats(path)
+        except OSError as exc:
+            messagebox.showerror("時序統計", f"匯出失敗：{exc}")
+            return
+        messagebox.showinfo("時序統計", f"已匯出：{path}")
+
     def _apply_hotkey_defs(self) -> None:
-        self.hk.update_key("DSpam", self.s.key_spam_d)
-        self.hk.update_key("SSpam", self.s.key_spam_s)
-        self.hk.update_key("ASpam", self.s.key_spam_a)
-        self.hk.update_key("ClickSeq1", self.s.key_click1)
-        self.hk.update_key("ClickSeq2", self.s.key_click2)
-        self.hk.update_key("ClickSeq3", self.s.key_click3)
-        self.hk.update_key("Jitter", self.s.key_jitter)
-
-        self.hk.update_enabled("DSpam", self.s.is_spam_d_enabled)
-        self.hk.update_enabled("SSpam", self.s.is_spam_s_enabled)
-        self.hk.update_enabled("ASpam", self.s.is_spam_a_enabled)
-        self.hk.update_enabled("ClickSeq1", self.s.is_click1_enabled)
-        self.hk.update_enabled("ClickSeq2", self.s.is_click2_enabled)
-        self.hk.update_enabled("ClickSeq3", self.s.is_click3_enabled)
-        self.hk.update_enabled("Jitter", self.s.is_jitter_enabled)
+        self.hk.apply_bindings({
+            "DSpam": (self.s.key_spam_d, self.s.is_spam_d_enabled),
+            "SSpam": (self.s.key_spam_s, self.s.is_spam_s_enabled),
+            "ASpam": (self.s.key_spam_a, self.s.is_spam_a_enabled),
+            "ClickSeq1": (self.s.key_click1, self.s.is_click1_enabled),
+            "ClickSeq2": (self.s.key_click2, self.s.is_click2_enabled),
+            "ClickSeq3": (self.s.key_click3, self.s.is_click3_enabled),
+            "Jitter": (self.s.key_jitter, self.s.is_jitter_enabled),
+        })
 
     def _refresh(self) -> None:
         self._hotkey_vars["DSpam"].set(self.s.key_spam_d)
@@ -442,6 +453,9 @@ class AppUI:
         self._update_all_row_enabled()
         self._update_click_info()
         self._update_status()
+        self.actions.update_jitter()
+        self.actions.apply_rate_limit()
+        self._update_limit_info()
         self._refresh_jitter_buttons()
 
     def _update_click_info(self) -> None:
@@ -460,6 +474,29 @@ class AppUI:
             else:
                 self._click_warn_vars[hid].set("")
 
+    def _start_limit_tick(self) -> None:
+        if not self._is_limit_tick:
+            self._is_limit_tick = True
+            self._limit_tick()
+
+    def _limit_tick(self) -> None:
+        self._update_limit_info()
+        if not self.root.winfo_viewable():
+            self._is_limit_tick = False
+            return
+        self.root.after(1000, self._limit_tick)
+
+    def _update_limit_info(self) -> None:
+        out = self.hk.output
+        if not out.is_rate_limited():
+            self._limit_info_var.set("限速：關閉")
+            return
+        cps = f"{self.s.rate_limit_cps:g}" if self.s.rate_limit_cps > 0 else "-"
+        btn_cps = f"{self.s.rate_limit_button_cps:g}" if self.s.rate_limit_button_cps > 0 else "-"
+        mode = "丟棄" if out.is_limit_drop else "延後"
+        self._limit_info_var.set(f"限速：總 {cps} / 單鍵 {btn_cps} 次/秒（{mode}），"
+                                 f"已延後 {out.throttle_delayed} 次、已丟棄 {out.throttle_dropped} 次")
+
     def _update_status(self) -> None:
         from .. import winapi
         exe = winapi.get_foreground_exe_name() or "-"
@@ -1,13 +1,23 @@
 from __future__ import annotations
 
+import asyncio
+import inspect
+import json
 import threading
-import queue
 from dataclasses import dataclass
-from typing import Callable, Optional
+from pathlib import Path
+from typing import Any, Callable, Iterator, Optional
 
-from .timing import wait_ms_cancel
+from .timing import Cadence, CadenceStats, CancelToken, _qpc_now_ns, wait_ms_cancel, wait_ms_token, wait_until_token
 from .log import Logger
-from .winhook import start_hooks, stop_hooks
+from .aio import AsyncEngine
+from .scheduler import MacroScheduler
+from .output import OutputArbiter
+from .ring import EventRing
+from .stats import Histogram, TimingStats, group_outputs, output_rates
+from .trace import TraceWriter
+from .backend import get_backend
+from .keys import KEY_TABLE_SIZE, MOUSE_LEFT, MOUSE_RIGHT, is_mouse_id, key_ids, name_of
 
 
 @dataclass
@@ -15,7 +25,43 @@ class HotkeyDef:
     id: str
     key_name: str
     is_enabled: bool
-    on_start: Callable[[threading.Event], None]
+    # May be a coroutine function; the asyncio engine awaits it, others run it to completion.
+    on_start: Callable[[threading.Event], Any]
+    make_steps: Optional[Callable[[], Iterator[int]]] = None
+    # Needs physical left/right button state (mouse hook) while enabled, even if bound to a key.
+    is_mouse_tracked: bool = False
+    # Checked on each trigger; False keeps the key bound (and blocked) but starts nothing.
+    can_start: Optional[Callable[[], bool]] = None
+
+
+class _Bindings:
+    """Immutable binding snapshot, indexed by key id.
+
+    ``bound``: enabled keys (blocked when suppressing). ``dispatch``: enabled
+    hotkey ids per key. ``release``: every hotkey id per key, for cancel on
+    key-up. Replaced as a whole, so the hook never sees a half-built table.
+    """
+
+    __slots__ = ("bound", "dispatch", "release")
+
+    def __init__(self, bound: bytearray, dispatch: list[tuple[str, ...]], release: list[tuple[str, ...]]) -> None:
+        self.bound = bound
+        self.dispatch = dispatch
+        self.release = release
+
+
+class _Worker:
+    """Long-lived thread for one hotkey; parks on ``wake`` between runs."""
+
+    __slots__ = ("hotkey_id", "thread", "wake", "job", "is_active", "is_closed")
+
+    def __init__(self, hotkey_id: str) -> None:
+        self.hotkey_id = hotkey_id
+        self.thread: threading.Thread | None = None
+        self.wake = threading.Event()
+        self.job: tuple[Callable[[threading.Event], None], CancelToken] | None = None
+        self.is_active = False
+        self.is_closed = False
 
 
 class HotkeyManager:
@@ -24,17 +70,31 @@ class HotkeyManager:
         is_context_enabled: Callable[[], bool],
         logger: Logger,
         context_info: Optional[Callable[[], str]] = None,
+        engine: str = "thread",
+        cadence: str = "skip",
     ):
         self.is_context_enabled = is_context_enabled
         self.log = logger
         self.context_info = context_info
+        self.engine = engine
+        self.cadence = cadence
+        self._cadence_stats: dict[str, CadenceStats] = {}
+        self.timing = TimingStats()
+        # Every macro output goes through here (ownership, dedup, batching).
+        self.output = OutputArbiter()
+        self.output.timing = self.timing
+        self._scheduler = MacroScheduler(self) if engine == "scheduler" else None
+        self._aio = AsyncEngine(self) if engine == "asyncio" else None
         self._lock = threading.Lock()
-        self._threads: dict[str, threading.Thread] = {}
-        self._stop_flags: dict[str, threading.Event] = {}
-        self._pressed: dict[str, bool] = {}
-        self._key_down: dict[str, bool] = {}
-        self._pressed_lock = threading.Lock()
-        self._event_q: queue.Queue[tuple[str, bool]] = queue.Queue()
+        self._workers: dict[str, _Worker] = {}
+        self._stop_flags: dict[str, CancelToken] = {}
+        # Pressed state by key id; single-byte stores, so readers need no lock.
+        self._down = bytearray(KEY_TABLE_SIZE)
+        self._events = EventRing()
+        # Hook entry -> dispatcher dequeue, microseconds.
+        self.hook_latency = Histogram()
+        # (hook_ns, dequeue_ns) of the event being dispatched, for trace marks.
+        self._cur_event = (0, 0)
         self._event_stop = threading.Event()
         self._event_thread: threading.Thread | None = None
         self._defs: dict[str, HotkeyDef] = {}
@@ -42,33 +102,59 @@ class HotkeyManager:
         self._suppress = False
         self._force_pass_through = False
         self._hook_state = None
-        self._bound_keys_cache: set[str] = set()
-
-    _GENERIC_VARIANTS: dict[str, tuple[str, ...]] = {
-        # Keep old config values working, while allowing left/right bindings.
-        "shift": ("lshift", "rshift"),
-        "ctrl": ("lctrl", "rctrl"),
-        "alt": ("lalt", "ralt"),
-        "cmd": ("lcmd", "rcmd"),
-    }
+        self._trace: TraceWriter | None = None
+        # p99 hook-callback budget (us); above it the hook skips keys outside the filter. 0 = off.
+        self.hook_budget_us = 0
+        # No hooks installed: out of context and not binding.
+        self.is_idle = False
+        self._bindings = _Bindings(bytearray(KEY_TABLE_SIZE), [()] * KEY_TABLE_SIZE, [()] * KEY_TABLE_SIZE)
 
     def start(self) -> None:
+        if self._scheduler:
+            self._scheduler.start()
+        if self._aio:
+            self._aio.start()
+        with self._lock:
+            for hk in self._defs.values():
+                if not self._is_engine_driven(hk):
+                    self._get_worker(hk.id)
         self._event_stop.clear()
+        self._events.open()
         self._event_thread = threading.Thread(target=self._event_loop, daemon=True)
         self._event_thread.start()
-        self._hook_state = start_hooks(
+        is_keyboard, is_mouse = self._wanted_hooks()
+        self.is_idle = not is_keyboard
+        self._hook_state = get_backend().start_hooks(
             self._on_hook_key,
             self._on_hook_mouse,
             on_log=self.log.event,
             on_auto_fail_open=self._on_hook_auto_fail_open,
+            budget_us=self.hook_budget_us,
+            is_keyboard_hook=is_keyboard,
+            is_mouse_hook=is_mouse,
         )
+        self._publish_hook_config()
+        if self._trace is not None:
+            get_backend().set_trace(self._hook_state, self._trace)
         self.log.event("HK", "-", "listeners", "started")
 
     def stop(self) -> None:
         self._event_stop.set()
+        self._events.close()
+        with self._lock:
+            for ev in self._stop_flags.values():
+                ev.set()
+            for w in self._workers.values():
+                w.is_closed = True
+                w.wake.set()
+            self._workers = {}
         if self._hook_state:
-            stop_hooks(self._hook_state)
+            get_backend().stop_hooks(self._hook_state)
             self._hook_state = None
+        if self._scheduler:
+            self._scheduler.stop()
+        if self._aio:
+            self._aio.stop()
 
     def set_suppress(self, enable: bool) -> None:
         with self._lock:
@@ -77,7 +163,7 @@ class HotkeyManager:
             self._suppress = enable
 
     def _bound_keys(self) -> set[str]:
-        return set(self._bound_keys_cache)
+        return {name_of(kid) for kid in range(KEY_TABLE_SIZE) if self._bindings.bound[kid]}
 
     def set_key_blocking(self, enable: bool) -> None:
         if self._force_pass_through:
@@ -87,9 +173,18 @@ class HotkeyManager:
 
     def set_binding_callback(self, cb: Optional[Callable[[str], None]]) -> None:
         self._binding_cb = cb
+        self._publish_hook_config()
+
+    def set_trace(self, trace: TraceWriter | None) -> None:
+        # Hook events and accepted outputs both go to trace; None stops tracing.
+        self._trace = trace
+        self.output.trace = trace
+        if self._hook_state:
+            get_backend().set_trace(self._hook_state, trace)
 
     def define(self, hk: HotkeyDef) -> None:
         self._defs[hk.id] = hk
+        self.timing.register(hk.id)
         self._refresh_bound_keys()
         self.log.event("HK", hk.id, "define", f"key={hk.key_name} enabled={int(hk.is_enabled)}")
 
@@ -107,26 +202,133 @@ class HotkeyManager:
             self.log.event("HK", hotkey_id, "updateEnabled", f"enabled={int(enabled)}")
             self.set_key_blocking(self.is_context_enabled())
 
+    def apply_bindings(self, bindings: dict[str, tuple[str, bool]]) -> bool:
+        """Set key name and enabled state for many hotkeys at once.
+
+        ``bindings`` maps hotkey id to ``(key_name, is_enabled)``. The binding
+        snapshot is rebuilt and context evaluated once for the whole batch;
+        returns False when nothing changed.
+        """
+        changes: list[str] = []
+        for hid, (key_name, enabled) in bindings.items():
+            hk = self._defs.get(hid)
+            if hk is None or (hk.key_name == key_name and hk.is_enabled == enabled):
+                continue
+            hk.key_name = key_name
+            hk.is_enabled = enabled
+            changes.append(f"{hid}={key_name}:{int(enabled)}")
+        if not changes:
+            return False
+        self._refresh_bound_keys()
+        self.log.event("HK", "-", "applyBindings", " ".join(changes))
+        self.set_key_blocking(self.is_context_enabled())
+        return True
+
     def is_pressed(self, key_name: str) -> bool:
-        with self._pressed_lock:
-            norm = self._norm(key_name)
-            if norm in ("left", "right"):
-                return self._pressed.get(norm, False)
-            if norm in self._GENERIC_VARIANTS:
-                if self._key_down.get(norm, False):
-                    return True
-                return any(self._key_down.get(v, False) for v in self._GENERIC_VARIANTS[norm])
-            return self._key_down.get(norm, False)
+        down = self._down
+        for kid in key_ids(key_name):
+            if down[kid]:
+                return True
+        return False
+
+    def is_id_pressed(self, kid: int) -> bool:
+        return bool(self._down[kid])
 
     def spawn_if_needed(self, hotkey_id: str, run_fn: Callable[[threading.Event], None]) -> None:
         with self._lock:
-            if hotkey_id in self._threads and self._threads[hotkey_id].is_alive():
+            w = self._get_worker(hotkey_id)
+            if w.is_active and not self._stop_flags[hotkey_id].is_set():
                 return
-            stop_ev = threading.Event()
-            th = threading.Thread(target=run_fn, args=(stop_ev,), daemon=True)
+            # A re-press while the cancelled run is still unwinding runs as soon as it returns.
+            stop_ev = CancelToken(hotkey_id)
             self._stop_flags[hotkey_id] = stop_ev
-            self._threads[hotkey_id] = th
-            th.start()
+            w.job = (run_fn, stop_ev)
+            w.is_active = True
+            self.timing.mark_trigger(hotkey_id, _qpc_now_ns(), *self._cur_event)
+            w.wake.set()
+
+    def schedule_if_needed(self, hk: HotkeyDef) -> None:
+        with self._lock:
+            if self._scheduler.is_running(hk.id):
+                return
+            stop_ev = CancelToken(hk.id)
+            self._stop_flags[hk.id] = stop_ev
+        self.timing.mark_trigger(hk.id, _qpc_now_ns(), *self._cur_event)
+        self._scheduler.submit(hk.id, hk.key_name, hk.make_steps(), stop_ev)
+
+    def run_async_if_needed(self, hk: HotkeyDef) -> None:
+        with self._lock:
+            if self._aio.is_running(hk.id):
+                return
+            stop_ev = CancelToken(hk.id)
+            self._stop_flags[hk.id] = stop_ev
+        self.timing.mark_trigger(hk.id, _qpc_now_ns(), *self._cur_event)
+        self._aio.submit(hk, stop_ev)
+
+    def run_steps(self, steps: Iterator[int], key_name: str, stop_ev: threading.Event) -> None:
+        # Thread-engine driver for the step generators the scheduler advances.
+        if not isinstance(stop_ev, CancelToken):
+            self._run_steps_polling(steps, key_name, stop_ev)
+            return
+        hid = stop_ev.hotkey_id
+        cad = self.new_cadence(hid)
+        self.timing.reset_run(hid)
+        try:
+            while self.should_run(key_name, stop_ev):
+                now = _qpc_now_ns()
+                self.timing.mark_run(hid, now)
+                cad.mark(now)
+                delay = next(steps, None)
+                if delay is None:
+                    return
+                start = _qpc_now_ns()
+                deadline = cad.next_deadline(delay, start)
+                if not wait_until_token(deadline, stop_ev):
+                    return
+                self.timing.record_wait(hid, start, deadline, _qpc_now_ns())
+        finally:
+            steps.close()
+
+    def new_cadence(self, hotkey_id: str) -> Cadence:
+        stats = self._cadence_stats.get(hotkey_id)
+        if stats is None:
+            stats = self._cadence_stats.setdefault(hotkey_id, CadenceStats())
+        return Cadence(self.cadence, stats)
+
+    def cadence_stats(self) -> dict[str, dict[str, float]]:
+        return {hid: st.snapshot() for hid, st in self._cadence_stats.items()}
+
+    def timing_stats(self) -> dict[str, dict[str, dict[str, float]]]:
+        return self.timing.snapshot()
+
+    def hook_stats(self) -> dict[str, object]:
+        if not self._hook_state:
+            return {}
+        return get_backend().hook_stats(self._hook_state)
+
+    def event_stats(self) -> dict[str, object]:
+        data: dict[str, object] = dict(self._events.stats())
+        data["hook_latency_us"] = self.hook_latency.snapshot()
+        return data
+
+    def dump_timing_stats(self, path: Path) -> Path:
+        data = self.timing.snapshot()
+        for hid, st in self.cadence_stats().items():
+            data.setdefault(hid, {})["cadence"] = st
+        data["_events"] = self.event_stats()
+        data["_hook"] = self.hook_stats()
+        data["_output"] = self.output.stats()
+        recorder = self.output.recorder
+        if recorder is not None and len(recorder):
+            records = recorder.records()
+            data["_recorded"] = output_rates(group_outputs(records), records[-1][0] - records[0][0])
+        if self.timing.samples:
+            data["_traces"] = list(self.timing.samples)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with path.open("w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        self.log.event("HK", "-", "dumpTiming", f"path={path}")
+        return path
 
     def stop_hotkey(self, hotkey_id: str) -> None:
         with self._lock:
@@ -134,6 +336,17 @@ class HotkeyManager:
             if ev:
                 ev.set()
 
+    def cancel_all(self) -> None:
+        with self._lock:
+            for ev in self._stop_flags.values():
+                if not ev.is_set():
+                    ev.set()
+
+    def on_context_changed(self, is_enabled: bool) -> None:
+        if not is_enabled:
+            self.cancel_all()
+        self._publish_hook_config()
+
     def should_run(self, key_name: str, stop_ev: threading.Event) -> bool:
         if stop_ev.is_set():
             return False
@@ -144,37 +357,73 @@ class HotkeyManager:
         return True
 
     def wait_ms_cancel(self, ms: int, key_name: str, stop_ev: threading.Event) -> bool:
+        if isinstance(stop_ev, CancelToken):
+            return wait_ms_token(ms, stop_ev)
         return wait_ms_cancel(ms, lambda: stop_ev.is_set() or (not self.is_pressed(key_name)) or (not self.is_context_enabled()))
 
-    def _norm(self, key_name: str) -> str:
-        norm = key_name.strip().lower()
-        # Shifted glyph for the same physical OEM_3 key
-        if norm == "~":
-            return "`"
-        return norm
-
-    def _expand_bound_key(self, norm: str) -> set[str]:
-        keys = {norm}
-        variants = self._GENERIC_VARIANTS.get(norm)
-        if variants:
-            keys.update(variants)
-        return keys
-
-    def _match_key(self, binding_norm: str, event_norm: str) -> bool:
-        if binding_norm == event_norm:
-            return True
-        variants = self._GENERIC_VARIANTS.get(binding_norm)
-        if variants and event_norm in variants:
-            return True
-        return False
-
-    def _set_pressed(self, key_name: str, down: bool) -> None:
-        with self._pressed_lock:
-            self._pressed[self._norm(key_name)] = down
-
-    def _set_key_down(self, key_name: str, down: bool) -> None:
-        with self._pressed_lock:
-            self._key_down[self._norm(key_name)] = down
+    def _cancel_released(self, kid: int) -> None:
+        for hid in self._bindings.release[kid]:
+            ev = self._stop_flags.get(hid)
+            if not ev or ev.is_set():
+                continue
+            hk = self._defs.get(hid)
+            if hk and self.is_pressed(hk.key_name):
+                continue
+            ev.set()
+
+    def _run_steps_polling(self, steps: Iterator[int], key_name: str, stop_ev: threading.Event) -> None:
+        try:
+            while self.should_run(key_name, stop_ev):
+                delay = next(steps, None)
+                if delay is None:
+                    return
+                if not self.wait_ms_cancel(delay, key_name, stop_ev):
+                    return
+        finally:
+            steps.close()
+
+    def _is_engine_driven(self, hk: HotkeyDef) -> bool:
+        # True when the scheduler / asyncio engine runs hk instead of a worker thread.
+        if self._aio:
+            return bool(hk.make_steps) or inspect.iscoroutinefunction(hk.on_start)
+        return bool(self._scheduler and hk.make_steps)
+
+    def _get_worker(self, hotkey_id: str) -> _Worker:
+        # Caller holds self._lock.
+        w = self._workers.get(hotkey_id)
+        if w is None:
+            w = _Worker(hotkey_id)
+            w.thread = threading.Thread(target=self._worker_loop, args=(w,), daemon=True)
+            self._workers[hotkey_id] = w
+            w.thread.start()
+        return w
+
+    def _worker_loop(self, w: _Worker) -> None:
+        # Touch the output path once so the first real press does not pay for it.
+        get_backend().warm()
+        while True:
+            w.wake.wait()
+            with self._lock:
+                w.wake.clear()
+                if w.is_closed:
+                    w.is_active = False
+                    return
+                job = w.job
+                w.job = None
+                if job is None:
+                    continue
+            run_fn, stop_ev = job
+            try:
+                if not stop_ev.is_set():
+                    result = run_fn(stop_ev)
+                    if inspect.isawaitable(result):
+                        asyncio.run(result)
+            except Exception as exc:
+                self.log.event("HK", w.hotkey_id, "runError", f"err={exc}")
+            finally:
+                with self._lock:
+                    if w.job is None:
+                        w.is_active = False
 
     def _maybe_bind(self, name: str) -> bool:
         if self._binding_cb:
@@ -182,80 +431,139 @@ class HotkeyManager:
             return True
         return False
 
-    def _maybe_trigger(self, name: str) -> None:
-        event_norm = self._norm(name)
-        for hk in self._defs.values():
-            if not hk.is_enabled:
-                continue
-            binding_norm = self._norm(hk.key_name)
-            if not self._match_key(binding_norm, event_norm):
-                continue
-            ctx = self.is_context_enabled()
-            if not ctx:
-                extra = self.context_info() if self.context_info else ""
-                detail = f"ctx=0 key={hk.key_name} name={name}"
-                if extra:
-                    detail = detail + " " + extra
+    def _maybe_trigger(self, kid: int) -> None:
+        ids = self._bindings.dispatch[kid]
+        if not ids:
+            return
+        if not self.is_context_enabled():
+            return
+        for hid in ids:
+            hk = self._defs[hid]
+            if hk.can_start is not None and not hk.can_start():
                 continue
-            self.spawn_if_needed(hk.id, hk.on_start)
+            if self._aio and self._is_engine_driven(hk):
+                self.run_async_if_needed(hk)
+            elif self._scheduler and hk.make_steps:
+                self.schedule_if_needed(hk)
+            else:
+                self.spawn_if_needed(hk.id, hk.on_start)
+
+    def pump_events(self) -> int:
+        # Synchronous dispatch of queued hook events (simulation / tests).
+        n = 0
+        while True:
+            rec = self._events.pop()
+            if rec is None:
+                return n
+            self._dispatch_record(rec)
+            n += 1
+
+    def _dispatch(self, kid: int, is_down: bool) -> None:
+        if not is_down:
+            return
+        if self._binding_cb and self._maybe_bind(name_of(kid)):
+            return
+        self._maybe_trigger(kid)
+
+    def _dispatch_record(self, rec: tuple[int, bool, int]) -> None:
+        kid, is_down, ts = rec
+        now = _qpc_now_ns()
+        self.hook_latency.record((now - ts) // 1000)
+        self._cur_event = (ts, now)
+        try:
+            self._dispatch(kid, is_down)
+        finally:
+            self._cur_event = (0, 0)
 
     def _event_loop(self) -> None:
+        # Parks without a timeout; the hook wakes it only when it is asleep.
+        events = self._events
+        dropped = events.dropped
         while not self._event_stop.is_set():
-            try:
-                name, is_down = self._event_q.get(timeout=0.1)
-            except Exception:
-                continue
-            if not is_down:
+            rec = events.pop()
+            if rec is None:
+                if events.dropped != dropped:
+                    dropped = events.dropped
+                    self.log.event("HK", "-", "eventsDropped", f"total={dropped}")
+                events.wait()
                 continue
-            if self._maybe_bind(name):
-                continue
-            self._maybe_trigger(name)
+            self._dispatch_record(rec)
 
     def _refresh_bound_keys(self) -> None:
-        keys: set[str] = set()
+        # Key names are resolved to ids here, once per binding change.
+        bound = bytearray(KEY_TABLE_SIZE)
+        dispatch: list[tuple[str, ...]] = [()] * KEY_TABLE_SIZE
+        release: list[tuple[str, ...]] = [()] * KEY_TABLE_SIZE
         for hk in self._defs.values():
+            ids = key_ids(hk.key_name)
+            for kid in ids:
+                release[kid] += (hk.id,)
             if not hk.is_enabled:
                 continue
-            keys.update(self._expand_bound_key(self._norm(hk.key_name)))
-        self._bound_keys_cache = keys
-
-    def _should_block(self, name: str) -> bool:
+            for kid in ids:
+                bound[kid] = 1
+                dispatch[kid] += (hk.id,)
+        self._bindings = _Bindings(bound, dispatch, release)
+        self._publish_hook_config()
+
+    def _wanted_hooks(self) -> tuple[bool, bool]:
+        # (keyboard, mouse). Binding mode sees everything. Out of context nothing
+        # can trigger, so both hooks go (idle mode). Otherwise the mouse hook is
+        # only needed for an enabled hotkey bound to a mouse button or tracking left/right.
         if self._binding_cb:
-            return False
-        return self._norm(name) in self._bound_keys_cache
+            return True, True
+        if not self.is_context_enabled():
+            return False, False
+        for hk in self._defs.values():
+            if not hk.is_enabled:
+                continue
+            if hk.is_mouse_tracked or any(is_mouse_id(kid) for kid in key_ids(hk.key_name)):
+                return True, True
+        return True, False
 
-    def _on_hook_key(self, name: str, is_down: bool) -> bool:
+    def _publish_hook_config(self) -> None:
+        if not self._hook_state:
+            return
+        backend = get_backend()
+        is_keyboard, is_mouse = self._wanted_hooks()
+        is_idle = not is_keyboard
+        if is_idle != self.is_idle:
+            self.is_idle = is_idle
+            if is_idle:
+                # Releases are not seen while unhooked; forget held keys instead of keeping them stuck.
+                self._down[:] = bytes(KEY_TABLE_SIZE)
+            self.log.event("HK", "-", "idle" if is_idle else "resume", f"mouse={int(is_mouse)}")
+        backend.set_hooks(self._hook_state, is_keyboard, is_mouse)
+        # Keys the hook must always hand over, even when degraded: every defined
+        # hotkey key plus the mouse buttons click macros check; all keys while binding.
+        if self._binding_cb:
+            key_filter = bytearray(b"\x01" * KEY_TABLE_SIZE)
+        else:
+            release = self._bindings.release
+            key_filter = bytearray(1 if release[kid] else 0 for kid in range(KEY_TABLE_SIZE))
+            key_filter[MOUSE_LEFT] = key_filter[MOUSE_RIGHT] = 1
+        backend.set_key_filter(self._hook_state, key_filter)
+
+    def _on_hook_key(self, kid: int, is_down: bool) -> bool:
         if self._force_pass_through:
             return False
-        if self._binding_cb and is_down:
-            self._binding_cb(name)
-            return False
-        if self._should_block(name):
-            self._set_key_down(name, is_down)
+        self._down[kid] = is_down
+        if self._binding_cb:
+            # Binding mode passes everything; a blocked release would leave the key stuck down.
             if is_down:
-                self._event_q.put((name, True))
-            if self._suppress:
-                return True
-        return False
-
-    def _on_hook_mouse(self, name: str, is_down: bool) -> bool:
-        if self._force_pass_through:
+                self._binding_cb(name_of(kid))
             return False
-        if name in ("left", "right"):
-            self._set_pressed(name, is_down)
-        if self._binding_cb and is_down:
-            self._binding_cb(name)
+        if not self._bindings.bound[kid]:
             return False
-        if self._should_block(name):
-            # Track mouse-bound hotkeys (x1/x2/middle) via key_down state.
-            self._set_key_down(name, is_down)
-            if is_down:
-                self._event_q.put((name, True))
-                if self._suppress:
-                    return True
-            if self._suppress:
-                return True
-        return False
+        if is_down:
+            self._events.push(kid, True, _qpc_now_ns())
+        else:
+            self._cancel_released(kid)
+        return self._suppress
+
+    def _on_hook_mouse(self, kid: int, is_down: bool) -> bool:
+        # Mouse buttons share the key-id table, so both hooks take the same path.
+        return self._on_hook_key(kid, is_down)
 
     def _on_hook_auto_fail_open(self) -> None:
         with self._lock:
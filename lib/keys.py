@@ -0,0 +1,306 @@
+from __future__ import annotations
+
+from types import MappingProxyType
+from typing import Mapping, NamedTuple
+
+# Key ids: 0-255 are Windows VK codes, mouse buttons follow, and names that
+# are neither (typos, layout-specific glyphs) are interned above that so they
+# can still be bound. Pressed-state tables are indexed by these ids.
+MOUSE_LEFT = 0x100
+MOUSE_RIGHT = 0x101
+MOUSE_MIDDLE = 0x102
+MOUSE_X1 = 0x103
+MOUSE_X2 = 0x104
+_FIRST_EXTRA_ID = 0x105
+KEY_TABLE_SIZE = 0x200
+
+_VK_NAMES: dict[int, str] = {
+    # 1) System / control
+    0x03: "cancel",
+    0x08: "backspace",
+    0x09: "tab",
+    0x0C: "clear",
+    0x0D: "enter",
+    0x10: "shift",
+    0x11: "ctrl",
+    0x12: "alt",
+    0x13: "pause",
+    0x14: "capslock",
+    0x15: "ime_kana",
+    0x17: "ime_junja",
+    0x18: "ime_final",
+    0x19: "ime_hanja",
+    0x1B: "esc",
+    0x1C: "ime_convert",
+    0x1D: "ime_nonconvert",
+    0x1E: "ime_accept",
+    0x1F: "ime_modechange",
+    0x20: "space",
+    0x29: "select",
+    0x2A: "print",
+    0x2B: "execute",
+    0x2F: "help",
+    # Left/right modifiers (distinct names)
+    0xA0: "lshift",  # VK_LSHIFT
+    0xA1: "rshift",  # VK_RSHIFT
+    0xA2: "lctrl",   # VK_LCONTROL
+    0xA3: "rctrl",   # VK_RCONTROL
+    0xA4: "lalt",    # VK_LMENU
+    0xA5: "ralt",    # VK_RMENU
+    # 2) Navigation / edit
+    0x21: "pageup",
+    0x22: "pagedown",
+    0x23: "end",
+    0x24: "home",
+    0x25: "left",
+    0x26: "up",
+    0x27: "right",
+    0x28: "down",
+    0x2C: "printscreen",
+    0x2D: "insert",
+    0x2E: "delete",
+    # 4) Windows keys / apps
+    0x5B: "lcmd",
+    0x5C: "rcmd",
+    0x5D: "apps",
+    0x5F: "sleep",
+    # 5) Numpad operators
+    0x6A: "num*",
+    0x6B: "num+",
+    0x6C: "numsep",  # VK_SEPARATOR
+    0x6D: "num-",
+    0x6E: "num.",
+    0x6F: "num/",
+    # 7) Lock keys
+    0x90: "numlock",
+    0x91: "scrolllock",
+    # 9) Browser / media / launch
+    0xA6: "browser_back",
+    0xA7: "browser_forward",
+    0xA8: "browser_refresh",
+    0xA9: "browser_stop",
+    0xAA: "browser_search",
+    0xAB: "browser_favorites",
+    0xAC: "browser_home",
+    0xAD: "volume_mute",
+    0xAE: "volume_down",
+    0xAF: "volume_up",
+    0xB0: "media_next",
+    0xB1: "media_prev",
+    0xB2: "media_stop",
+    0xB3: "media_play_pause",
+    0xB4: "launch_mail",
+    0xB5: "launch_media",
+    0xB6: "launch_app1",
+    0xB7: "launch_app2",
+    # 8) OEM symbols (US layout names)
+    0xBA: ";",   # VK_OEM_1
+    0xBB: "=",   # VK_OEM_PLUS
+    0xBC: ",",   # VK_OEM_COMMA
+    0xBD: "-",   # VK_OEM_MINUS
+    0xBE: ".",   # VK_OEM_PERIOD
+    0xBF: "/",   # VK_OEM_2
+    0xC0: "`",   # VK_OEM_3 (`~ key)
+    0xDB: "[",   # VK_OEM_4
+    0xDC: "\\",  # VK_OEM_5
+    0xDD: "]",   # VK_OEM_6
+    0xDE: "'",   # VK_OEM_7
+    0xDF: "oem_8",
+    0xE1: "oem_ax",
+    0xE2: "oem_102",
+    0xE5: "processkey",
+    0xE7: "packet",
+    0xE9: "oem_reset",
+    0xEA: "oem_jump",
+    0xEB: "oem_pa1",
+    0xEC: "oem_pa2",
+    0xED: "oem_pa3",
+    0xEE: "oem_wsctrl",
+    0xEF: "oem_cusel",
+    0xF0: "oem_attn",
+    0xF1: "oem_finish",
+    0xF2: "oem_copy",
+    0xF3: "oem_auto",
+    0xF4: "oem_enlw",
+    0xF5: "oem_backtab",
+    0xF6: "attn",
+    0xF7: "crsel",
+    0xF8: "exsel",
+    0xF9: "ereof",
+    0xFA: "play",
+    0xFB: "zoom",
+    0xFD: "pa1",
+    0xFE: "oem_clear",
+}
+
+# 3) Main alnum area
+_VK_NAMES.update({vk: chr(vk) for vk in range(0x30, 0x3A)})
+_VK_NAMES.update({vk: chr(vk + 32) for vk in range(0x41, 0x5B)})
+
+# 5) Numpad digits
+_VK_NAMES.update({vk: f"num{vk - 0x60}" for vk in range(0x60, 0x6A)})
+
+# 6) Function keys
+_VK_NAMES.update({vk: f"f{vk - 0x6F}" for vk in range(0x70, 0x88)})
+
+VK_NAME_MAP: Mapping[int, str] = MappingProxyType(_VK_NAMES)
+
+# Set-1 scan codes on a US layout; 0xE0xx marks an extended key, which
+# SendInput must flag or e.g. the arrows arrive as numpad keys.
+_SCAN_CODES: dict[int, int] = {
+    0x08: 0x0E, 0x09: 0x0F, 0x0D: 0x1C, 0x10: 0x2A, 0x11: 0x1D, 0x12: 0x38,
+    0x14: 0x3A, 0x1B: 0x01, 0x20: 0x39,
+    0xA0: 0x2A, 0xA1: 0x36, 0xA2: 0x1D, 0xA3: 0xE01D, 0xA4: 0x38, 0xA5: 0xE038,
+    0x21: 0xE049, 0x22: 0xE051, 0x23: 0xE04F, 0x24: 0xE047,
+    0x25: 0xE04B, 0x26: 0xE048, 0x27: 0xE04D, 0x28: 0xE050,
+    0x2C: 0xE037, 0x2D: 0xE052, 0x2E: 0xE053,
+    0x5B: 0xE05B, 0x5C: 0xE05C, 0x5D: 0xE05D, 0x5F: 0xE05F,
+    0x6A: 0x37, 0x6B: 0x4E, 0x6D: 0x4A, 0x6E: 0x53, 0x6F: 0xE035,
+    0x90: 0xE045, 0x91: 0x46,
+    0xA6: 0xE06A, 0xA7: 0xE069, 0xA8: 0xE067, 0xA9: 0xE068, 0xAA: 0xE065,
+    0xAB: 0xE066, 0xAC: 0xE032, 0xAD: 0xE020, 0xAE: 0xE02E, 0xAF: 0xE030,
+    0xB0: 0xE019, 0xB1: 0xE010, 0xB2: 0xE024, 0xB3: 0xE022,
+    0xB4: 0xE06C, 0xB5: 0xE06D, 0xB6: 0xE06B, 0xB7: 0xE021,
+    0xBA: 0x27, 0xBB: 0x0D, 0xBC: 0x33, 0xBD: 0x0C, 0xBE: 0x34, 0xBF: 0x35,
+    0xC0: 0x29, 0xDB: 0x1A, 0xDC: 0x2B, 0xDD: 0x1B, 0xDE: 0x28, 0xE2: 0x56,
+}
+_SCAN_CODES.update(zip(b"1234567890", range(0x02, 0x0C)))
+_SCAN_CODES.update(zip(b"QWERTYUIOP", range(0x10, 0x1A)))
+_SCAN_CODES.update(zip(b"ASDFGHJKL", range(0x1E, 0x27)))
+_SCAN_CODES.update(zip(b"ZXCVBNM", range(0x2C, 0x33)))
+_SCAN_CODES.update({  # num0-num9
+    0x60: 0x52, 0x61: 0x4F, 0x62: 0x50, 0x63: 0x51, 0x64: 0x4B,
+    0x65: 0x4C, 0x66: 0x4D, 0x67: 0x47, 0x68: 0x48, 0x69: 0x49,
+})
+_SCAN_CODES.update(zip(range(0x70, 0x7A), range(0x3B, 0x45)))  # f1-f10
+_SCAN_CODES.update({0x7A: 0x57, 0x7B: 0x58, 0x87: 0x76})  # f11, f12, f24
+_SCAN_CODES.update(zip(range(0x7C, 0x87), range(0x64, 0x6F)))  # f13-f23
+
+# Extra spellings accepted for bindings and outputs (older output names).
+_ALIASES: dict[str, str] = {
+    "escape": "esc",
+    "lwin": "lcmd",
+    "rwin": "rcmd",
+}
+
+
+class KeyInfo(NamedTuple):
+    name: str
+    vk: int
+    scan: int  # US-layout scan code without the 0xE0 prefix, 0 if none
+    is_extended: bool
+
+
+# One entry per VK (unknown ones are named vk_xx), indexed by VK; built once
+# and shared by hook decode (VK -> name) and SendInput encode (name -> VK/scan).
+KEY_TABLE: tuple[KeyInfo, ...] = tuple(
+    KeyInfo(_VK_NAMES.get(vk) or f"vk_{vk:02x}", vk, _SCAN_CODES.get(vk, 0) & 0xFF, _SCAN_CODES.get(vk, 0) >> 8 == 0xE0)
+    for vk in range(0x100)
+)
+
+MOUSE_NAME_MAP: dict[int, str] = {
+    MOUSE_LEFT: "left",
+    MOUSE_RIGHT: "right",
+    MOUSE_MIDDLE: "middle",
+    MOUSE_X1: "x1",
+    MOUSE_X2: "x2",
+}
+
+_GENERIC_VARIANTS: dict[str, tuple[str, ...]] = {
+    # Keep old config values working, while allowing left/right bindings.
+    "shift": ("lshift", "rshift"),
+    "ctrl": ("lctrl", "rctrl"),
+    "alt": ("lalt", "ralt"),
+    "cmd": ("lcmd", "rcmd"),
+}
+
+_by_name = {info.name: info for info in KEY_TABLE}
+_by_name.update({alias: _by_name[name] for alias, name in _ALIASES.items()})
+_KEY_BY_NAME: Mapping[str, KeyInfo] = MappingProxyType(_by_name)
+del _by_name
+_MOUSE_BY_NAME: dict[str, int] = {name: kid for kid, name in MOUSE_NAME_MAP.items()}
+_extra_ids: dict[str, int] = {}
+_extra_names: dict[int, str] = {}
+_ids_cache: dict[str, tuple[int, ...]] = {}
+
+
+def norm(name: str) -> str:
+    norm = name.strip().lower()
+    # Shifted glyph for the same physical OEM_3 key
+    if norm == "~":
+        return "`"
+    return norm
+
+
+def vk_to_name(vk: int) -> str:
+    # Unknown VK still returns a stable name so it can be bound.
+    if 0 <= vk < 0x100:
+        return KEY_TABLE[vk].name
+    return f"vk_{vk:02x}"
+
+
+def name_of(kid: int) -> str:
+    if kid < 0x100:
+        return vk_to_name(kid)
+    return MOUSE_NAME_MAP.get(kid) or _extra_names.get(kid, "")
+
+
+def key_info(name: str) -> KeyInfo | None:
+    n = norm(name)
+    info = _KEY_BY_NAME.get(n)
+    if info is None and n.startswith("vk_"):
+        try:
+            vk = int(n[3:], 16)
+        except ValueError:
+            return None
+        if 0 < vk < 0x100:
+            info = KEY_TABLE[vk]
+    return info
+
+
+def vk_of(name: str) -> int | None:
+    info = key_info(name)
+    return info.vk if info is not None and info.vk else None
+
+
+def is_mouse_id(kid: int) -> bool:
+    return MOUSE_LEFT <= kid <= MOUSE_X2
+
+
+def mouse_id(name: str) -> int | None:
+    return _MOUSE_BY_NAME.get(norm(name))
+
+
+def key_ids(name: str) -> tuple[int, ...]:
+    """Every id a bound key name matches, resolved once and cached.
+
+    ``left``/``right`` match both the arrow key and the mouse button, and the
+    generic modifiers match their left/right variants.
+    """
+    ids = _ids_cache.get(name)
+    if ids is not None:
+        return ids
+    n = norm(name)
+    found: list[int] = []
+    for part in (n,) + _GENERIC_VARIANTS.get(n, ()):
+        vk = vk_of(part)
+        if vk is not None:
+            found.append(vk)
+    kid = mouse_id(n)
+    if kid is not None:
+        found.append(kid)
+    if not found:
+        found.append(_intern_extra(n))
+    ids = tuple(found)
+    _ids_cache[name] = ids
+    return ids
+
+
+def _intern_extra(n: str) -> int:
+    kid = _extra_ids.get(n)
+    if kid is None:
+        # Out of slots: share the last id; such names never see a key event anyway.
+        kid = min(_FIRST_EXTRA_ID + len(_extra_ids), KEY_TABLE_SIZE - 1)
+        _extra_ids[n] = kid
+        _extra_names.setdefault(kid, n)
+    return kid
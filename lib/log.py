@@ -5,11 +5,15 @@ from pathlib import Path
 
 
 class Logger:
-    def __init__(self, log_path: Path) -> None:
+    def __init__(self, log_path: Path | None) -> None:
+        # None discards all lines (simulation / headless runs).
         self.log_path = log_path
-        self.log_path.parent.mkdir(parents=True, exist_ok=True)
+        if self.log_path is not None:
+            self.log_path.parent.mkdir(parents=True, exist_ok=True)
 
     def write(self, line: str) -> None:
+        if self.log_path is None:
+            return
         ts = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         with self.log_path.open("a", encoding="utf-8") as f:
             f.write(f"{ts} - {line}\n")
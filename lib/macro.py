@@ -0,0 +1,282 @@
+from __future__ import annotations
+
+import re
+from array import array
+from typing import TYPE_CHECKING, Iterator
+
+from .keys import key_info
+
+if TYPE_CHECKING:
+    from .output import OutputArbiter
+
+# Program text, statements separated by ';' or newlines:
+#   tap <key>                 press and release a key
+#   press <key|button>        hold a key or mouse button
+#   release <key|button>      let it go
+#   click <button> [ms]       button down, optional hold, button up
+#   wait <ms>                 delay before the next statement (fractions allowed)
+#   repeat <n> { ... }        run the block n times
+#   loop { ... }              run the block until the trigger is released
+# Every program only runs while its trigger is held; held outputs are
+# released when it stops for any reason.
+
+OP_TAP = 0
+OP_KEY_DOWN = 1
+OP_KEY_UP = 2
+OP_MOUSE_DOWN = 3
+OP_MOUSE_UP = 4
+OP_WAIT = 5
+OP_JUMP = 6
+OP_SET = 7
+OP_LOOP = 8
+
+_BUTTONS = {"lbutton": "LButton", "rbutton": "RButton"}
+_TOKEN_RE = re.compile(r"[{};\n]|[^\s{};]+")
+
+
+class MacroProgram:
+    """Compiled macro: flat ``(op, a, b)`` code plus the output names it uses.
+
+    Names are resolved and validated at compile time and waits are stored in
+    nanoseconds, so ``steps()`` only indexes arrays.
+    """
+
+    __slots__ = ("source", "code", "names", "n_counters")
+
+    def __init__(self, source: str, code: array, names: tuple[str, ...], n_counters: int) -> None:
+        self.source = source
+        self.code = code
+        self.names = names
+        self.n_counters = n_counters
+
+    def outputs(self) -> tuple[list[str], list[str], list[str]]:
+        # (tapped keys, held keys, buttons) for Backend.prepare_outputs.
+        taps: set[str] = set()
+        held: set[str] = set()
+        buttons: set[str] = set()
+        code = self.code
+        for pc in range(0, len(code), 3):
+            op, a = code[pc], code[pc + 1]
+            if op == OP_TAP:
+                taps.add(self.names[a])
+            elif op in (OP_KEY_DOWN, OP_KEY_UP):
+                held.add(self.names[a])
+            elif op in (OP_MOUSE_DOWN, OP_MOUSE_UP):
+                buttons.add(self.names[a])
+        return sorted(taps), sorted(held), sorted(buttons)
+
+    def steps(self, out: OutputArbiter, owner: str) -> Iterator[float]:
+        """Step generator: runs ops until the next wait and yields its delay in ms."""
+        tap = out.tap
+        key_down = out.press
+        key_up = out.release
+        mouse_down = out.down
+        mouse_up = out.up
+        code = self.code
+        names = self.names
+        end = len(code)
+        counters = [0] * self.n_counters
+        held_keys: set[int] = set()
+        held_buttons: set[int] = set()
+        pc = 0
+        try:
+            while pc < end:
+                op = code[pc]
+                a = code[pc + 1]
+                pc += 3
+                if op == OP_WAIT:
+                    yield a / 1_000_000
+                    continue
+                if op == OP_JUMP:
+                    pc = a
+                    continue
+                if op == OP_LOOP:
+                    counters[a] -= 1
+                    if counters[a] > 0:
+                        pc = code[pc - 1]
+                    continue
+                if op == OP_SET:
+                    counters[a] = code[pc - 1]
+                    continue
+                if op == OP_TAP:
+                    tap(owner, names[a])
+                elif op == OP_MOUSE_DOWN:
+                    wait_ns = mouse_down(owner, names[a])
+                    if wait_ns:
+                        # Rate limited, nothing sent: run this op again after the wait.
+                        pc -= 3
+                        yield wait_ns / 1_000_000
+                        continue
+                    held_buttons.add(a)
+                elif op == OP_MOUSE_UP:
+                    mouse_up(owner, names[a])
+                    held_buttons.discard(a)
+                elif op == OP_KEY_DOWN:
+                    key_down(owner, names[a])
+                    held_keys.add(a)
+                else:
+                    key_up(owner, names[a])
+                    held_keys.discard(a)
+        finally:
+            for a in held_buttons:
+                mouse_up(owner, names[a])
+            for a in held_keys:
+                key_up(owner, names[a])
+
+
+def compile_macro(source: str) -> MacroProgram:
+    """Parses and compiles program text; raises ValueError with the offending token."""
+    return _Compiler(source).compile()
+
+
+class _Compiler:
+    def __init__(self, source: str) -> None:
+        self.source = source
+        self.tokens = _TOKEN_RE.findall(source.lower())
+        self.pos = 0
+        self.code = array("q")
+        self.names: list[str] = []
+        self.name_index: dict[str, int] = {}
+        self.n_counters = 0
+
+    def compile(self) -> MacroProgram:
+        self._block(is_nested=False)
+        if not self.code:
+            raise ValueError("empty macro")
+        return MacroProgram(self.source, self.code, tuple(self.names), self.n_counters)
+
+    def _block(self, is_nested: bool) -> int:
+        # Compiles statements up to '}' (nested) or the end; returns total wait ns.
+        wait_ns = 0
+        while True:
+            tok = self._next()
+            if tok is None:
+                if is_nested:
+                    raise ValueError("missing '}'")
+                return wait_ns
+            if tok in (";", "\n"):
+                continue
+            if tok == "}":
+                if not is_nested:
+                    raise ValueError("unexpected '}'")
+                return wait_ns
+            wait_ns += self._statement(tok)
+
+    def _statement(self, tok: str) -> int:
+        if tok == "tap":
+            self._emit(OP_TAP, self._key(self._arg(tok)))
+        elif tok in ("press", "release"):
+            name = self._arg(tok)
+            if name in _BUTTONS:
+                self._emit(OP_MOUSE_DOWN if tok == "press" else OP_MOUSE_UP, self._name(_BUTTONS[name]))
+            else:
+                self._emit(OP_KEY_DOWN if tok == "press" else OP_KEY_UP, self._key(name))
+        elif tok == "click":
+            idx = self._button(self._arg(tok))
+            self._emit(OP_MOUSE_DOWN, idx)
+            hold_ns = self._ms(self._next_number()) if self._peek_number() else 0
+            if hold_ns:
+                self._emit(OP_WAIT, hold_ns)
+            self._emit(OP_MOUSE_UP, idx)
+            return hold_ns
+        elif tok == "wait":
+            ns = self._ms(self._arg(tok))
+            if ns:
+                self._emit(OP_WAIT, ns)
+            return ns
+        elif tok == "repeat":
+            count = self._int(self._arg(tok))
+            return self._repeat(count)
+        elif tok == "loop":
+            return self._loop()
+        else:
+            raise ValueError(f"unknown statement: {tok}")
+        return 0
+
+    def _repeat(self, count: int) -> int:
+        slot = self.n_counters
+        self.n_counters += 1
+        set_at = len(self.code)
+        self._emit(OP_SET, slot, count)
+        body = len(self.code)
+        self._expect("{")
+        wait_ns = self._block(is_nested=True)
+        if count <= 0:
+            del self.code[set_at:]
+            return 0
+        self._emit(OP_LOOP, slot, body)
+        return wait_ns * count
+
+    def _loop(self) -> int:
+        body = len(self.code)
+        self._expect("{")
+        wait_ns = self._block(is_nested=True)
+        if wait_ns <= 0:
+            raise ValueError("loop without wait")
+        self._emit(OP_JUMP, body)
+        return wait_ns
+
+    def _emit(self, op: int, a: int, b: int = 0) -> None:
+        self.code.extend((op, a, b))
+
+    def _name(self, name: str) -> int:
+        idx = self.name_index.get(name)
+        if idx is None:
+            idx = len(self.names)
+            self.names.append(name)
+            self.name_index[name] = idx
+        return idx
+
+    def _key(self, name: str) -> int:
+        info = key_info(name)
+        if info is None or not info.vk:
+            raise ValueError(f"unknown key: {name}")
+        return self._name(info.name)
+
+    def _button(self, name: str) -> int:
+        btn = _BUTTONS.get(name)
+        if btn is None:
+            raise ValueError(f"unknown button: {name}")
+        return self._name(btn)
+
+    def _ms(self, tok: str) -> int:
+        try:
+            ms = float(tok)
+        except ValueError:
+            raise ValueError(f"bad delay: {tok}") from None
+        if not 0 <= ms <= 3_600_000:
+            raise ValueError(f"bad delay: {tok}")
+        return int(ms * 1_000_000)
+
+    def _int(self, tok: str) -> int:
+        try:
+            return int(tok)
+        except ValueError:
+            raise ValueError(f"bad count: {tok}") from None
+
+    def _next(self) -> str | None:
+        if self.pos >= len(self.tokens):
+            return None
+        tok = self.tokens[self.pos]
+        self.pos += 1
+        return tok
+
+    def _arg(self, stmt: str) -> str:
+        tok = self._next()
+        if tok is None or tok in ("{", "}", ";", "\n"):
+            raise ValueError(f"{stmt}: missing argument")
+        return tok
+
+    def _peek_number(self) -> bool:
+        if self.pos >= len(self.tokens):
+            return False
+        return self.tokens[self.pos].replace(".", "", 1).isdigit()
+
+    def _next_number(self) -> str:
+        return self._next() or ""
+
+    def _expect(self, tok: str) -> None:
+        while self.pos < len(self.tokens) and self.tokens[self.pos] == "\n":
+            self.pos += 1
+        if self._next() != tok:
+            raise ValueError(f"expected '{tok}'")
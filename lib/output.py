@@ -0,0 +1,262 @@
+from __future__ import annotations
+
+import threading
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Iterator
+
+from .backend import get_backend
+
+if TYPE_CHECKING:
+    from .ring import OutputRecorder
+    from .stats import TimingStats
+    from .trace import TraceWriter
+
+_HOLD_ACTIONS = ("down", "press")
+_RELEASE_ACTIONS = ("up", "release")
+# Outputs that count toward a hotkey's first-output and interval timing.
+_STAMP_ACTIONS = ("tap", "press", "down")
+
+
+class TokenBucket:
+    """``rate`` tokens per second, holding at most ``burst``; starts full."""
+
+    __slots__ = ("rate", "burst", "tokens", "last_ns")
+
+    def __init__(self, rate: float, burst: int) -> None:
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.tokens = float(self.burst)
+        self.last_ns = -1
+
+    def wait_ns(self, now: int) -> int:
+        # Refills for the time since the last call; 0 when a token is available.
+        if self.last_ns >= 0:
+            self.tokens = min(self.burst, self.tokens + (now - self.last_ns) * self.rate / 1e9)
+        self.last_ns = now
+        if self.tokens >= 1.0:
+            return 0
+        return max(1, int((1.0 - self.tokens) * 1e9 / self.rate))
+
+    def take(self) -> None:
+        self.tokens -= 1.0
+
+
+class OutputArbiter:
+    """Single output stage every macro sends through.
+
+    Events are ``(action, name)`` pairs as understood by ``Backend.send_batch``:
+    ``tap``/``press``/``release`` for keys, ``down``/``up`` for buttons.
+
+    - Ownership: the first macro to hold a key or button owns it until it lets
+      go; holds and releases from other macros meanwhile are dropped.
+    - Logical state: a hold of something already held, or a release of
+      something not held, is dropped. ``is_forced`` releases pass anyway
+      (letting go of a button the user holds physically).
+    - Coalescing: a thread that finds a send in flight only queues its event;
+      the sending thread flushes the queue as one batch when its call returns.
+      Inside ``batch()`` (one scheduler pass) everything is sent at the end.
+    - Rate limit: button downs (clicks) pass a global and a per-button token
+      bucket (``set_rate_limit``). Over the limit a down is dropped, or, in
+      delay mode, not sent and ``down`` returns the ns to wait before retrying.
+    - Recording: with ``recorder`` / ``trace`` set, every event that passes is
+      stored with its owner and the backend clock when it is accepted.
+    - Timing: with ``timing`` set, taps and holds are stamped for their owner
+      (the hotkey id) when accepted and again by the thread that sends them.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._pending: list[tuple[str, str]] = []
+        # (owner, accepted ns) for the stamped events in _pending.
+        self._pending_stamps: list[tuple[str, int]] = []
+        self._owners: dict[str, str] = {}
+        self._is_flushing = False
+        self._batch_depth = 0
+        self.events = 0
+        self.calls = 0
+        self.deduped = 0
+        self.conflicts = 0
+        self.max_batch = 0
+        self.throttle_delayed = 0
+        self.throttle_dropped = 0
+        self._click_limit: TokenBucket | None = None
+        self._button_cps = 0.0
+        self._burst = 1
+        self._button_limits: dict[str, TokenBucket] = {}
+        # (owner, button) whose last down was dropped by the limit; its release is part of that click.
+        self._dropped_downs: set[tuple[str, str]] = set()
+        self._limit_params: tuple[float, float, int, bool] = (0.0, 0.0, 1, False)
+        self.is_limit_drop = False
+        self.recorder: OutputRecorder | None = None
+        self.trace: TraceWriter | None = None
+        self.timing: TimingStats | None = None
+
+    def tap(self, owner: str, name: str) -> None:
+        self._submit(owner, "tap", name)
+
+    def press(self, owner: str, name: str) -> None:
+        self._submit(owner, "press", name)
+
+    def release(self, owner: str, name: str) -> None:
+        self._submit(owner, "release", name)
+
+    def down(self, owner: str, btn_name: str) -> int:
+        """Returns 0 once handled, or the ns to wait before retrying (rate limit, delay mode)."""
+        return self._submit(owner, "down", btn_name)
+
+    def up(self, owner: str, btn_name: str, is_forced: bool = False) -> None:
+        self._submit(owner, "up", btn_name, is_forced)
+
+    def set_rate_limit(self, cps: float, button_cps: float, burst: int = 1, is_drop: bool = False) -> None:
+        # cps / button_cps are clicks per second across all buttons / per button; 0 turns a limit off.
+        # Unchanged parameters keep the current buckets, so re-applying settings grants no fresh burst.
+        params = (max(0.0, cps), max(0.0, button_cps), burst, is_drop)
+        with self._lock:
+            if params == self._limit_params:
+                return
+            self._limit_params = params
+            self._click_limit = TokenBucket(cps, burst) if cps > 0 else None
+            self._button_cps = button_cps if button_cps > 0 else 0.0
+            self._burst = burst
+            self._button_limits = {}
+            self.is_limit_drop = is_drop
+
+    def is_rate_limited(self) -> bool:
+        return self._click_limit is not None or self._button_cps > 0
+
+    def owner_of(self, name: str) -> str | None:
+        return self._owners.get(name)
+
+    @contextmanager
+    def batch(self) -> Iterator[None]:
+        with self._lock:
+            self._batch_depth += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._batch_depth -= 1
+                is_flush = not self._batch_depth and not self._is_flushing and bool(self._pending)
+                if is_flush:
+                    self._is_flushing = True
+            if is_flush:
+                self._flush([], [])
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "events": self.events,
+            "calls": self.calls,
+            "calls_saved": self.events - self.calls,
+            "deduped": self.deduped,
+            "conflicts": self.conflicts,
+            "max_batch": self.max_batch,
+            "throttle_delayed": self.throttle_delayed,
+            "throttle_dropped": self.throttle_dropped,
+        }
+
+    def _submit(self, owner: str, action: str, name: str, is_forced: bool = False) -> int:
+        with self._lock:
+            holder = self._owners.get(name)
+            if action in _HOLD_ACTIONS:
+                if holder is not None:
+                    if holder == owner:
+                        self.deduped += 1
+                    else:
+                        self.conflicts += 1
+                    return 0
+                if action == "down" and (self._click_limit is not None or self._button_cps):
+                    wait = self._limit_wait(name)
+                    if wait:
+                        if self.is_limit_drop:
+                            self.throttle_dropped += 1
+                            self._dropped_downs.add((owner, name))
+                            return 0
+                        self.throttle_delayed += 1
+                        return wait
+                    self._dropped_downs.discard((owner, name))
+                self._owners[name] = owner
+            elif action in _RELEASE_ACTIONS:
+                if holder is None:
+                    if (owner, name) in self._dropped_downs:
+                        # Release of a click the limit dropped: already counted in throttle_dropped.
+                        self._dropped_downs.discard((owner, name))
+                        if not is_forced:
+                            return 0
+                    elif not is_forced:
+                        self.deduped += 1
+                        return 0
+                elif holder != owner:
+                    self.conflicts += 1
+                    return 0
+                else:
+                    del self._owners[name]
+            elif holder is not None:
+                # A tap would release a key another macro is holding.
+                self.conflicts += 1
+                return 0
+            if self.recorder is not None:
+                self.recorder.record(get_backend().now_ns(), owner, action, name)
+            if self.trace is not None:
+                self.trace.record(get_backend().now_ns(), owner, action, name)
+            stamps = []
+            if self.timing is not None and action in _STAMP_ACTIONS:
+                stamps.append((owner, get_backend().now_ns()))
+            if self._is_flushing or self._batch_depth:
+                self._pending.append((action, name))
+                self._pending_stamps += stamps
+                return 0
+            # Nothing queued outside a flush: send this event right away.
+            self._is_flushing = True
+        self._flush([(action, name)], stamps)
+        return 0
+
+    def _limit_wait(self, btn_name: str) -> int:
+        # Both buckets must have a token; neither is charged unless both do.
+        now = get_backend().now_ns()
+        bucket = None
+        wait = 0
+        if self._button_cps:
+            bucket = self._button_limits.get(btn_name)
+            if bucket is None:
+                bucket = self._button_limits[btn_name] = TokenBucket(self._button_cps, self._burst)
+            wait = bucket.wait_ns(now)
+        if self._click_limit is not None:
+            wait = max(wait, self._click_limit.wait_ns(now))
+        if wait:
+            return wait
+        if bucket is not None:
+            bucket.take()
+        if self._click_limit is not None:
+            self._click_limit.take()
+        return 0
+
+    def _flush(self, batch: list[tuple[str, str]], stamps: list[tuple[str, int]]) -> None:
+        # Caller set _is_flushing; sends until the queue is found empty under the lock.
+        # Stamps are recorded here too, so one hotkey's are never recorded from two threads at once.
+        backend = get_backend()
+        send = backend.send_batch
+        while True:
+            if batch:
+                try:
+                    send(batch)
+                except BaseException:
+                    with self._lock:
+                        self._is_flushing = False
+                    raise
+                # Only the flushing thread updates these.
+                self.calls += 1
+                self.events += len(batch)
+                if len(batch) > self.max_batch:
+                    self.max_batch = len(batch)
+                if stamps:
+                    sent_ns = backend.now_ns()
+                    for owner, accepted_ns in stamps:
+                        self.timing.record_output(owner, accepted_ns, sent_ns)
+            with self._lock:
+                batch = self._pending
+                if not batch:
+                    self._is_flushing = False
+                    return
+                self._pending = []
+                stamps = self._pending_stamps
+                self._pending_stamps = []
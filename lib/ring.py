@@ -0,0 +1,162 @@
+from __future__ import annotations
+
+import threading
+from array import array
+
+
+class EventRing:
+    """Preallocated single-producer/single-consumer queue of hook events.
+
+    The hook thread is the only writer of ``_head`` and the dispatcher the only
+    writer of ``_tail``; each record is fully stored before ``_head`` moves, so
+    no lock is taken. The wake event is only set while the consumer is parked,
+    which makes a push on a busy consumer a few stores and an idle consumer
+    sleep without timeouts.
+    """
+
+    def __init__(self, capacity: int = 256) -> None:
+        size = 1
+        while size < capacity:
+            size <<= 1
+        self._mask = size - 1
+        self._kid = array("H", bytes(2 * size))
+        self._down = bytearray(size)
+        self._ts = array("q", bytes(8 * size))
+        self._head = 0
+        self._tail = 0
+        self._wake = threading.Event()
+        self._is_waiting = False
+        self._is_closed = False
+        self.pushed = 0
+        self.dropped = 0
+        self.wakeups = 0
+        self.max_depth = 0
+
+    def __len__(self) -> int:
+        return self._head - self._tail
+
+    def push(self, kid: int, is_down: bool, ts_ns: int) -> bool:
+        head = self._head
+        depth = head - self._tail
+        if depth > self._mask:
+            self.dropped += 1
+            return False
+        i = head & self._mask
+        self._kid[i] = kid
+        self._down[i] = is_down
+        self._ts[i] = ts_ns
+        self._head = head + 1
+        self.pushed += 1
+        if depth >= self.max_depth:
+            self.max_depth = depth + 1
+        if self._is_waiting:
+            self.wakeups += 1
+            self._wake.set()
+        return True
+
+    def pop(self) -> tuple[int, bool, int] | None:
+        tail = self._tail
+        if tail == self._head:
+            return None
+        i = tail & self._mask
+        rec = (self._kid[i], bool(self._down[i]), self._ts[i])
+        self._tail = tail + 1
+        return rec
+
+    def wait(self, timeout_s: float | None = None) -> None:
+        # Clear before publishing the flag: a push after the emptiness check
+        # sees _is_waiting and sets the event, so no wakeup is lost.
+        self._wake.clear()
+        self._is_waiting = True
+        try:
+            if self._tail == self._head and not self._is_closed:
+                self._wake.wait(timeout_s)
+        finally:
+            self._is_waiting = False
+
+    def open(self) -> None:
+        self._is_closed = False
+
+    def close(self) -> None:
+        # Releases a parked consumer; wait() returns immediately until open().
+        self._is_closed = True
+        self._wake.set()
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "pushed": self.pushed,
+            "dropped": self.dropped,
+            "wakeups": self.wakeups,
+            "max_depth": self.max_depth,
+            "capacity": self._mask + 1,
+        }
+
+
+# Action codes stored by OutputRecorder, in OutputArbiter event terms.
+OUTPUT_ACTIONS = ("tap", "press", "release", "down", "up")
+_ACTION_CODES = {a: i for i, a in enumerate(OUTPUT_ACTIONS)}
+
+
+class OutputRecorder:
+    """Preallocated ring of ``(ns, hotkey id, action, name)`` output records.
+
+    Hotkey ids and names are interned to small ints the first time they are
+    seen, so recording stores four numbers. When full the oldest records are
+    overwritten. Callers serialize ``record`` (the arbiter holds its lock).
+    """
+
+    def __init__(self, capacity: int = 1 << 16) -> None:
+        size = 1
+        while size < capacity:
+            size <<= 1
+        self._mask = size - 1
+        self._ts = array("q", bytes(8 * size))
+        self._owner = array("H", bytes(2 * size))
+        self._name = array("H", bytes(2 * size))
+        self._action = bytearray(size)
+        self._ids: dict[str, int] = {}
+        self._strs: list[str] = []
+        self.count = 0
+
+    def __len__(self) -> int:
+        return min(self.count, self._mask + 1)
+
+    def record(self, ts_ns: int, owner: str, action: str, name: str) -> None:
+        i = self.count & self._mask
+        ids = self._ids
+        oid = ids.get(owner)
+        if oid is None:
+            oid = self._intern(owner)
+        nid = ids.get(name)
+        if nid is None:
+            nid = self._intern(name)
+        self._ts[i] = ts_ns
+        self._owner[i] = oid
+        self._name[i] = nid
+        self._action[i] = _ACTION_CODES[action]
+        self.count += 1
+
+    def records(self) -> list[tuple[int, str, str, str]]:
+        # Oldest first.
+        strs = self._strs
+        out = []
+        for n in range(self.count - len(self), self.count):
+            i = n & self._mask
+            out.append((self._ts[i], strs[self._owner[i]], OUTPUT_ACTIONS[self._action[i]], strs[self._name[i]]))
+        return out
+
+    def clear(self) -> None:
+        self.count = 0
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "recorded": self.count,
+            "overwritten": self.count - len(self),
+            "capacity": self._mask + 1,
+        }
+
+    def _intern(self, s: str) -> int:
+        idx = len(self._strs)
+        self._strs.append(s)
+        self._ids[s] = idx
+        return idx
@@ -0,0 +1,163 @@
+from __future__ import annotations
+
+import heapq
+import itertools
+import threading
+from typing import TYPE_CHECKING, Callable, Iterator
+
+from .backend import get_backend
+from .timing import Cadence, CancelToken, _qpc_now_ns, get_wait_profile
+
+if TYPE_CHECKING:
+    from .hotkeys import HotkeyManager
+
+
+class _Task:
+    __slots__ = ("hotkey_id", "key_name", "steps", "token", "cadence", "wait_start", "is_done")
+
+    def __init__(self, hotkey_id: str, key_name: str, steps: Iterator[int], token: CancelToken, cadence: Cadence) -> None:
+        self.hotkey_id = hotkey_id
+        self.key_name = key_name
+        self.steps = steps
+        self.token = token
+        self.cadence = cadence
+        self.wait_start = 0
+        self.is_done = False
+
+
+class MacroScheduler:
+    """Drives every macro's step generator from one thread.
+
+    A step generator performs its output when resumed and yields the delay in
+    ms until it wants to be resumed again. Deadlines live in a heap, so the
+    thread wakes once per due deadline across all macros.
+    """
+
+    def __init__(
+        self,
+        hk: HotkeyManager,
+        now_ns: Callable[[], int] = _qpc_now_ns,
+        msg_wait: Callable[[int], None] | None = None,
+    ) -> None:
+        self.hk = hk
+        self._now_ns = now_ns
+        self._msg_wait = msg_wait
+        self._heap: list[tuple[int, int, _Task]] = []
+        self._seq = itertools.count()
+        self._incoming: list[_Task] = []
+        self._active: dict[str, _Task] = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        self.steps_run = 0
+
+    def start(self) -> None:
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._wake.set()
+        if self._thread and self._thread.is_alive():
+            self._thread.join(timeout=2.0)
+        with self._lock:
+            tasks = [t for _, _, t in self._heap] + self._incoming
+            self._heap = []
+            self._incoming = []
+        for task in tasks:
+            self._finish(task)
+
+    def is_running(self, hotkey_id: str) -> bool:
+        task = self._active.get(hotkey_id)
+        return task is not None and not task.is_done and not task.token.is_set()
+
+    def submit(self, hotkey_id: str, key_name: str, steps: Iterator[int], token: CancelToken) -> None:
+        task = _Task(hotkey_id, key_name, steps, token, self.hk.new_cadence(hotkey_id))
+        self.hk.timing.reset_run(hotkey_id)
+        token.add_callback(self._wake.set)
+        with self._lock:
+            self._active[hotkey_id] = task
+            self._incoming.append(task)
+        self._wake.set()
+
+    def run_due(self, now: int) -> int | None:
+        """Advance every task whose deadline has passed; return the next deadline."""
+        with self._lock:
+            incoming = self._incoming
+            self._incoming = []
+        heap = self._heap
+        if any(t.token.is_set() for _, _, t in heap):
+            # Close cancelled tasks first so their cleanup runs before a re-press starts.
+            for _, _, task in heap:
+                if task.token.is_set():
+                    self._finish(task)
+            heap[:] = [e for e in heap if not e[2].is_done]
+            heapq.heapify(heap)
+        for task in incoming:
+            heapq.heappush(heap, (now, next(self._seq), task))
+        due: list[tuple[int, _Task]] = []
+        # Outputs of every macro due in this pass leave as one batch.
+        with self.hk.output.batch():
+            while heap and heap[0][0] <= now:
+                deadline, _, task = heapq.heappop(heap)
+                if task.wait_start:
+                    self.hk.timing.record_wait(task.hotkey_id, task.wait_start, deadline, self._now_ns())
+                delay = self._advance(task)
+                if delay is None:
+                    continue
+                # Re-queue after the pass so a zero delay or catch-up burst cannot starve other macros.
+                task.wait_start = self._now_ns()
+                due.append((task.cadence.next_deadline(delay, task.wait_start), task))
+        for deadline, task in due:
+            heapq.heappush(heap, (deadline, next(self._seq), task))
+        return heap[0][0] if heap else None
+
+    def _advance(self, task: _Task) -> int | None:
+        if not self.hk.should_run(task.key_name, task.token):
+            self._finish(task)
+            return None
+        now = self._now_ns()
+        if not task.wait_start:
+            self.hk.timing.mark_run(task.hotkey_id, now)
+        task.cadence.mark(now)
+        try:
+            delay = next(task.steps)
+        except StopIteration:
+            self._finish(task)
+            return None
+        except Exception as exc:
+            self.hk.log.event("HK", task.hotkey_id, "stepError", f"err={exc}")
+            self._finish(task)
+            return None
+        self.steps_run += 1
+        return delay
+
+    def _finish(self, task: _Task) -> None:
+        if task.is_done:
+            return
+        task.is_done = True
+        try:
+            task.steps.close()
+        except Exception as exc:
+            self.hk.log.event("HK", task.hotkey_id, "stepError", f"err={exc}")
+
+    def _loop(self) -> None:
+        msg_wait = self._msg_wait
+        if msg_wait is None:
+            msg_wait = get_backend().msg_wait
+        while not self._stop.is_set():
+            self._wake.clear()
+            next_deadline = self.run_due(self._now_ns())
+            if next_deadline is None:
+                self._wake.wait()
+                continue
+            profile = get_wait_profile()
+            remaining_ms = (next_deadline - self._now_ns()) / 1_000_000
+            if remaining_ms >= profile.mid_above_ms + 1:
+                self._wake.wait((remaining_ms - profile.mid_above_ms) / 1000)
+            elif remaining_ms >= profile.mid_above_ms:
+                msg_wait(profile.mid_ms)
+            elif remaining_ms > 0:
+                msg_wait(profile.short_ms)
@@ -0,0 +1,117 @@
+from __future__ import annotations
+
+from .actions import Actions
+from .backend import SimBackend, set_backend
+from .config import Settings
+from .context import ForegroundContext
+from .hotkeys import HotkeyManager
+from .keys import mouse_id, vk_of
+from .log import Logger
+
+
+class Simulation:
+    """Deterministic, single-threaded run of HotkeyManager + Actions.
+
+    Installs a ``SimBackend`` (virtual clock), defines the standard hotkeys on
+    the scheduler engine and drives the scheduler directly instead of its
+    thread, so hours of activity replay in milliseconds with no OS calls.
+    Scripted input is resolved to key ids and goes through ``_on_hook_key``/
+    ``_on_hook_mouse`` exactly as the real hooks deliver it; outputs land in
+    ``backend.events``. Hooks are installed on the backend without starting a
+    hook thread, and input the current hook set would not see passes unseen.
+    """
+
+    def __init__(self, settings: Settings | None = None, cadence: str = "skip", exe: str = "nikke.exe") -> None:
+        self.settings = settings or Settings()
+        self.backend = SimBackend()
+        self._prev_backend = set_backend(self.backend)
+        self.backend.foreground_exe = exe
+        self.ctx = ForegroundContext(self.settings, backend=self.backend)
+        self.ctx.is_tracking = True
+        self.ctx.update(1, exe, True)
+        self.hk = HotkeyManager(
+            is_context_enabled=self.ctx.is_enabled,
+            logger=Logger(None),
+            context_info=self.ctx.info,
+            engine="scheduler",
+            cadence=cadence,
+        )
+        self.ctx.add_listener(self.hk.on_context_changed)
+        self.actions = Actions(self.settings, self.hk)
+        self.actions.define_hotkeys()
+        self.hk.set_key_blocking(self.ctx.is_enabled())
+        is_keyboard, is_mouse = self.hk._wanted_hooks()
+        self.hk._hook_state = self.backend.start_hooks(
+            self.hk._on_hook_key, self.hk._on_hook_mouse, is_keyboard_hook=is_keyboard, is_mouse_hook=is_mouse)
+        self.hk._publish_hook_config()
+
+    @property
+    def now_ns(self) -> int:
+        return self.backend.now
+
+    @property
+    def events(self) -> list[tuple[int, str, str]]:
+        return self.backend.events
+
+    def close(self) -> None:
+        self.hk.cancel_all()
+        self._pump()
+        self.backend.stop_hooks(self.hk._hook_state)
+        self.hk._hook_state = None
+        set_backend(self._prev_backend)
+
+    def key(self, name: str, is_down: bool) -> bool:
+        vk = vk_of(name)
+        if vk is None:
+            raise ValueError(f"unknown key: {name}")
+        if not self.backend.is_keyboard_hooked:
+            return False
+        blocked = self.hk._on_hook_key(vk, is_down)
+        self._pump()
+        return blocked
+
+    def mouse(self, name: str, is_down: bool) -> bool:
+        kid = mouse_id(name)
+        if kid is None:
+            raise ValueError(f"unknown mouse button: {name}")
+        if not self.backend.is_mouse_hooked:
+            return False
+        blocked = self.hk._on_hook_mouse(kid, is_down)
+        self._pump()
+        return blocked
+
+    def hold(self, name: str, ms: float) -> None:
+        self.key(name, True)
+        self.run_for(ms)
+        self.key(name, False)
+
+    def set_foreground(self, exe: str) -> None:
+        self.backend.foreground_exe = exe
+        self.ctx.update(1, exe, True)
+        self.hk.set_key_blocking(self.ctx.is_enabled())
+        self._pump()
+
+    def run_for(self, ms: float) -> None:
+        self.run_until(self.backend.now + int(ms * 1_000_000))
+
+    def run_until(self, t_ns: int) -> None:
+        sched = self.hk._scheduler
+        while True:
+            next_deadline = sched.run_due(self.backend.now)
+            if next_deadline is None or next_deadline > t_ns:
+                break
+            if next_deadline > self.backend.now:
+                self.backend.now = next_deadline
+        if t_ns > self.backend.now:
+            self.backend.now = t_ns
+
+    def outputs(self, kind: str | None = None, name: str | None = None) -> list[int]:
+        return [t for t, k, n in self.backend.events if (kind is None or k == kind) and (name is None or n == name)]
+
+    def intervals_ms(self, kind: str | None = None, name: str | None = None) -> list[float]:
+        ts = self.outputs(kind, name)
+        return [(b - a) / 1_000_000 for a, b in zip(ts, ts[1:])]
+
+    def _pump(self) -> None:
+        self.hk.pump_events()
+        self.hk._scheduler.run_due(self.backend.now)
@@ -0,0 +1,240 @@
+from __future__ import annotations
+
+from array import array
+from collections import deque
+from typing import Iterable
+
+_SUB_BITS = 5
+_SUB = 1 << _SUB_BITS
+_HALF = _SUB >> 1
+_BUCKETS = 384
+
+
+class Histogram:
+    """Fixed-memory log-linear histogram (HDR style, ~6% bucket width).
+
+    Values are non-negative integers (microseconds by convention). All
+    storage is allocated up front; ``record`` only indexes into it.
+    """
+
+    __slots__ = ("counts", "count", "total", "max", "min")
+
+    def __init__(self) -> None:
+        self.counts = array("Q", bytes(8 * _BUCKETS))
+        self.count = 0
+        self.total = 0
+        self.max = 0
+        self.min = 0
+
+    def record(self, value: int) -> None:
+        if value < 0:
+            value = 0
+        if value < _SUB:
+            idx = value
+        else:
+            m = value.bit_length() - _SUB_BITS
+            idx = (m + 1) * _HALF + (value >> m) - _HALF
+            if idx >= _BUCKETS:
+                idx = _BUCKETS - 1
+        self.counts[idx] += 1
+        if not self.count or value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+        self.count += 1
+        self.total += value
+
+    def percentile(self, q: float) -> int:
+        if not self.count:
+            return 0
+        rank = max(1, int(q * self.count + 0.5))
+        seen = 0
+        for idx, n in enumerate(self.counts):
+            if not n:
+                continue
+            seen += n
+            if seen >= rank:
+                return max(self.min, min(_bucket_mid(idx), self.max))
+        return self.max
+
+    def reset(self) -> None:
+        for i in range(_BUCKETS):
+            self.counts[i] = 0
+        self.count = self.total = self.max = self.min = 0
+
+    def snapshot(self) -> dict[str, float]:
+        mean = self.total / self.count if self.count else 0.0
+        return {
+            "count": self.count,
+            "min": self.min,
+            "mean": round(mean, 1),
+            "p50": self.percentile(0.50),
+            "p90": self.percentile(0.90),
+            "p99": self.percentile(0.99),
+            "max": self.max,
+        }
+
+
+def _bucket_mid(idx: int) -> int:
+    if idx < _SUB:
+        return idx
+    m = idx // _HALF - 1
+    return (((idx % _HALF) + _HALF) << m) + ((1 << m) >> 1)
+
+
+def group_outputs(records: Iterable[tuple[int, str, str, str]]) -> dict[str, list[int]]:
+    # OutputRecorder records -> timestamps per "hotkey action name" stream.
+    groups: dict[str, list[int]] = {}
+    for ts, owner, action, name in records:
+        groups.setdefault(f"{owner} {action} {name}", []).append(ts)
+    return groups
+
+
+def output_rates(groups: dict[str, list[int]], duration_ns: int) -> dict[str, dict[str, object]]:
+    """Count, events per second and interval histogram (us) for each output stream."""
+    out: dict[str, dict[str, object]] = {}
+    for key, ts in groups.items():
+        h = Histogram()
+        for a, b in zip(ts, ts[1:]):
+            h.record((b - a) // 1000)
+        out[key] = {
+            "count": len(ts),
+            "per_s": round(len(ts) * 1e9 / duration_ns, 2) if duration_ns > 0 else 0.0,
+            "interval_us": h.snapshot(),
+        }
+    return out
+
+
+# Trace stages, in order: hook entry -> dispatcher dequeue -> run accepted
+# (trigger) -> first should_run in the driver -> first output accepted by the
+# output arbiter -> that output sent.
+TRACE_STAGES = ("queue", "dispatch", "wake", "first_step", "send", "total")
+
+
+class HotkeyTiming:
+    __slots__ = (
+        "hotkey_id", "wait_actual", "wait_late", "output_interval", "first_output", "stages",
+        "last_output_ns", "trigger_ns", "trace_id", "hook_ns", "deq_ns", "run_ns",
+    )
+
+    def __init__(self, hotkey_id: str = "") -> None:
+        self.hotkey_id = hotkey_id
+        self.wait_actual = Histogram()
+        self.wait_late = Histogram()
+        self.output_interval = Histogram()
+        self.first_output = Histogram()
+        self.stages = {name: Histogram() for name in TRACE_STAGES}
+        self.last_output_ns = 0
+        self.trigger_ns = 0
+        self.trace_id = 0
+        self.hook_ns = 0
+        self.deq_ns = 0
+        self.run_ns = 0
+
+
+class TimingStats:
+    """Per-hotkey timing histograms (all values in microseconds).
+
+    ``wait_actual``: achieved wait duration. ``wait_late``: wake-up time minus
+    the requested deadline. ``output_interval``: time between consecutive
+    key taps / key and mouse downs sent for the same hotkey. ``first_output``:
+    time from the trigger being accepted to the first output of that run being
+    sent. Outputs are stamped by the output arbiter, keyed by hotkey id.
+
+    Every trigger also gets a trace id; its stage latencies (``TRACE_STAGES``)
+    always feed per-hotkey histograms, and every ``sample_every``-th trace is
+    additionally kept whole in ``samples`` (0 disables sampling).
+    """
+
+    def __init__(self, sample_every: int = 0, max_samples: int = 256) -> None:
+        self._by_id: dict[str, HotkeyTiming] = {}
+        self._next_trace = 0
+        self.sample_every = sample_every
+        self.samples: deque[dict[str, object]] = deque(maxlen=max_samples)
+
+    def register(self, hotkey_id: str) -> None:
+        if hotkey_id not in self._by_id:
+            self._by_id[hotkey_id] = HotkeyTiming(hotkey_id)
+
+    def ids(self) -> Iterable[str]:
+        return self._by_id.keys()
+
+    def get(self, hotkey_id: str) -> HotkeyTiming | None:
+        return self._by_id.get(hotkey_id)
+
+    def record_wait(self, hotkey_id: str, start_ns: int, deadline_ns: int, now_ns: int) -> None:
+        ht = self._by_id.get(hotkey_id)
+        if ht is None:
+            return
+        ht.wait_actual.record((now_ns - start_ns) // 1000)
+        ht.wait_late.record((now_ns - deadline_ns) // 1000)
+
+    def record_output(self, hotkey_id: str, accepted_ns: int, sent_ns: int) -> None:
+        # Called by the output arbiter once the event is sent, possibly from another macro's thread.
+        ht = self._by_id.get(hotkey_id)
+        if ht is None:
+            return
+        if ht.last_output_ns:
+            ht.output_interval.record((sent_ns - ht.last_output_ns) // 1000)
+        elif ht.trigger_ns:
+            ht.first_output.record((sent_ns - ht.trigger_ns) // 1000)
+            self._finish_trace(ht, accepted_ns, sent_ns)
+            ht.trigger_ns = 0
+        ht.last_output_ns = sent_ns
+
+    def mark_trigger(self, hotkey_id: str, now_ns: int, hook_ns: int = 0, deq_ns: int = 0) -> None:
+        ht = self._by_id.get(hotkey_id)
+        if ht is None:
+            return
+        self._next_trace += 1
+        ht.trace_id = self._next_trace
+        ht.trigger_ns = now_ns
+        ht.hook_ns = hook_ns
+        ht.deq_ns = deq_ns
+        ht.run_ns = 0
+
+    def mark_run(self, hotkey_id: str, now_ns: int) -> None:
+        # First should_run of a triggered run; later calls are ignored.
+        ht = self._by_id.get(hotkey_id)
+        if ht is not None and ht.trigger_ns and not ht.run_ns:
+            ht.run_ns = now_ns
+
+    def reset_run(self, hotkey_id: str) -> None:
+        # Intervals are only meaningful within one hold of the key.
+        ht = self._by_id.get(hotkey_id)
+        if ht is not None:
+            ht.last_output_ns = 0
+
+    def snapshot(self) -> dict[str, dict[str, dict[str, float]]]:
+        return {
+            hid: {
+                "wait_actual_us": ht.wait_actual.snapshot(),
+                "wait_late_us": ht.wait_late.snapshot(),
+                "output_interval_us": ht.output_interval.snapshot(),
+                "first_output_us": ht.first_output.snapshot(),
+                "trace_us": {name: h.snapshot() for name, h in ht.stages.items()},
+            }
+            for hid, ht in self._by_id.items()
+        }
+
+    def _finish_trace(self, ht: HotkeyTiming, accepted_ns: int, send_ns: int) -> None:
+        # A stage is only recorded when both of its ends were stamped.
+        marks = (ht.hook_ns, ht.deq_ns, ht.trigger_ns, ht.run_ns, accepted_ns, send_ns)
+        stages = ht.stages
+        for name, a, b in zip(TRACE_STAGES, marks, marks[1:]):
+            if a and b:
+                stages[name].record((b - a) // 1000)
+        if ht.hook_ns:
+            stages["total"].record((send_ns - ht.hook_ns) // 1000)
+        if self.sample_every and ht.trace_id % self.sample_every == 0:
+            self.samples.append({
+                "trace_id": ht.trace_id,
+                "hotkey_id": ht.hotkey_id,
+                "hook_ns": ht.hook_ns,
+                "deq_ns": ht.deq_ns,
+                "trigger_ns": ht.trigger_ns,
+                "run_ns": ht.run_ns,
+                "accepted_ns": accepted_ns,
+                "send_ns": send_ns,
+            })
+
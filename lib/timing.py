@@ -1,40 +1,244 @@
 from __future__ import annotations
 
-import time
+import threading
 from dataclasses import dataclass
 from typing import Callable
-from . import winapi
+from .backend import get_backend
 
 @dataclass
 class WaitProfile:
     long_ms: int = 14
     mid_ms: int = 1
     short_ms: int = 0
+    # remaining time (ms) at or above which long_ms / mid_ms waits are used
+    long_above_ms: float = 16.0
+    mid_above_ms: float = 2.0
+    spin_p99_ms: float = 0.0
+    is_calibrated: bool = False
+
+
+_wait_profile = WaitProfile()
+
+
+def get_wait_profile() -> WaitProfile:
+    return _wait_profile
+
+
+def set_wait_profile(profile: WaitProfile) -> None:
+    global _wait_profile
+    _wait_profile = profile
+
+
+def calibrate_wait_profile(
+    sleep_fn: Callable[[int], None] | None = None,
+    now_ns: Callable[[], int] | None = None,
+    samples: int = 20,
+    p99_bound_ms: float = 0.5,
+    candidates: tuple[int, ...] = (14, 8, 4, 2, 1),
+) -> WaitProfile:
+    """Measure oversleep of each wait granularity and derive switch points.
+
+    A granularity g is safe while ``remaining >= g + p99_oversleep(g) - bound``,
+    so a wait never overshoots the deadline by more than ``p99_bound_ms`` at
+    p99. The finest safe granularity becomes ``mid_ms`` and the spin region
+    below it is kept as small as that allows. Candidates are measured finest
+    first; since a threshold is never below g, sampling stops at the first g
+    that cannot beat the best threshold so far. ``long_ms`` is always sampled.
+    """
+    if sleep_fn is None:
+        sleep_fn = get_backend().msg_wait
+    if now_ns is None:
+        now_ns = _qpc_now_ns
+    thresholds: dict[int, float] = {}
+
+    def measure(g: int) -> None:
+        over = []
+        for _ in range(samples):
+            t0 = now_ns()
+            sleep_fn(g)
+            over.append((now_ns() - t0) / 1_000_000 - g)
+        thresholds[g] = max(float(g), g + _percentile(over, 0.99) - p99_bound_ms)
+
+    long_ms = max(candidates)
+    for g in sorted(candidates):
+        if thresholds and g >= min(thresholds.values()):
+            break
+        measure(g)
+    if long_ms not in thresholds:
+        measure(long_ms)
+    mid_ms = min(thresholds, key=lambda g: (thresholds[g], g))
+    mid_above = thresholds[mid_ms]
+    spin = []
+    for _ in range(samples):
+        t0 = now_ns()
+        sleep_fn(0)
+        spin.append((now_ns() - t0) / 1_000_000)
+    return WaitProfile(
+        long_ms=long_ms,
+        mid_ms=mid_ms,
+        short_ms=0,
+        long_above_ms=round(max(thresholds[long_ms], mid_above), 3),
+        mid_above_ms=round(mid_above, 3),
+        spin_p99_ms=round(_percentile(spin, 0.99), 4),
+        is_calibrated=True,
+    )
+
+
+class CancelToken(threading.Event):
+    # Signalled by the owner (key release, stop, context loss); waits block on it.
+    def __init__(self, hotkey_id: str = "") -> None:
+        super().__init__()
+        self.hotkey_id = hotkey_id
+        self.cancelled_ns = 0
+        self._callbacks: list[Callable[[], None]] = []
+        self._set_lock = threading.Lock()
+
+    def set(self) -> None:
+        # Only the first call stamps the time and fires the callbacks.
+        with self._set_lock:
+            if self.is_set():
+                return
+            self.cancelled_ns = _qpc_now_ns()
+            super().set()
+        for cb in self._callbacks:
+            cb()
+
+    def add_callback(self, cb: Callable[[], None]) -> None:
+        self._callbacks.append(cb)
+
+
+class CadenceStats:
+    # Accumulated over every run of one macro: planned vs achieved step time.
+    def __init__(self) -> None:
+        self.runs = 0
+        self.steps = 0
+        self.target_ns = 0
+        self.actual_ns = 0
+        self.late = 0
+        self.skipped = 0
+        self.max_late_ns = 0
+
+    def snapshot(self) -> dict[str, float]:
+        ratio = self.actual_ns / self.target_ns if self.target_ns else 0.0
+        return {
+            "runs": self.runs,
+            "steps": self.steps,
+            "target_ms": self.target_ns / 1_000_000,
+            "actual_ms": self.actual_ns / 1_000_000,
+            "period_ratio": ratio,
+            "late": self.late,
+            "skipped": self.skipped,
+            "max_late_ms": self.max_late_ns / 1_000_000,
+        }
+
+
+class Cadence:
+    """Step timeline of one macro run.
+
+    ``relative`` chains each delay from when the step actually ran (legacy).
+    ``catchup`` and ``skip`` schedule against t0 + sum(delays); on a missed
+    deadline ``catchup`` fires the backlog immediately while ``skip`` drops it
+    and re-anchors the timeline at the current time.
+    """
+
+    MODES = ("relative", "catchup", "skip")
+
+    def __init__(self, mode: str, stats: CadenceStats) -> None:
+        self.mode = mode if mode in self.MODES else "skip"
+        self.stats = stats
+        self.t0 = 0
+        self.deadline = 0
+        self.is_started = False
+        self._last = 0
+        self._planned_ns = 0
+
+    def mark(self, now: int) -> None:
+        # Called right before each step runs.
+        st = self.stats
+        if not self.is_started:
+            self.is_started = True
+            self.t0 = self.deadline = self._last = now
+            st.runs += 1
+            return
+        st.steps += 1
+        st.target_ns += self._planned_ns
+        st.actual_ns += now - self._last
+        self._last = now
+        late = now - self.deadline
+        if late > st.max_late_ns:
+            st.max_late_ns = late
+
+    def next_deadline(self, delay_ms: int, now: int) -> int:
+        delay_ns = int(delay_ms * 1_000_000)
+        self._planned_ns = delay_ns
+        if self.mode == "relative":
+            self.deadline = now + delay_ns
+            return self.deadline
+        self.deadline += delay_ns
+        if self.deadline < now:
+            self.stats.late += 1
+            if self.mode == "skip":
+                self.stats.skipped += 1
+                self.deadline = now
+        return self.deadline
 
 
 def wait_ms_cancel(ms: int, is_cancelled: Callable[[], bool], profile: WaitProfile | None = None) -> bool:
     if profile is None:
-        profile = WaitProfile()
-    start = _qpc_now_ns()
+        profile = _wait_profile
+    platform = get_backend()
+    start = platform.now_ns()
     target = start + int(ms * 1_000_000)
     while True:
         if is_cancelled():
             return False
-        now = _qpc_now_ns()
+        now = platform.now_ns()
         if now >= target:
             return True
         remaining_ms = (target - now) / 1_000_000
-        if remaining_ms >= 16:
-            winapi.msg_wait(profile.long_ms)
-        elif remaining_ms >= 2:
-            winapi.msg_wait(profile.mid_ms)
+        if remaining_ms >= profile.long_above_ms:
+            platform.msg_wait(profile.long_ms)
+        elif remaining_ms >= profile.mid_above_ms:
+            platform.msg_wait(profile.mid_ms)
         else:
-            winapi.msg_wait(profile.short_ms)
+            platform.msg_wait(profile.short_ms)
+
+
+def wait_ms_token(ms: int, token: threading.Event, profile: WaitProfile | None = None) -> bool:
+    return wait_until_token(_qpc_now_ns() + int(ms * 1_000_000), token, profile)
+
+
+def wait_until_token(target: int, token: threading.Event, profile: WaitProfile | None = None) -> bool:
+    if profile is None:
+        profile = _wait_profile
+    platform = get_backend()
+    while True:
+        if token.is_set():
+            return False
+        now = platform.now_ns()
+        if now >= target:
+            return True
+        remaining_ms = (target - now) / 1_000_000
+        if remaining_ms >= profile.mid_above_ms + 1:
+            # Block on the token; leave the tail to the fine-grained waits.
+            platform.wait_event(token, (remaining_ms - profile.mid_above_ms) / 1000)
+        elif remaining_ms >= profile.mid_above_ms:
+            platform.msg_wait(profile.mid_ms)
+        else:
+            platform.msg_wait(profile.short_ms)
 
 
 def sleep_ms(ms: int) -> None:
-    winapi.msg_wait(ms)
+    get_backend().msg_wait(ms)
+
+
+def _percentile(values: list[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    idx = min(len(ordered) - 1, int(q * len(ordered)))
+    return ordered[idx]
 
 
 def _qpc_now_ns() -> int:
-    return time.perf_counter_ns()
+    return get_backend().now_ns()
@@ -0,0 +1,266 @@
+from __future__ import annotations
+
+import mmap
+import struct
+import sys
+import threading
+from pathlib import Path
+from typing import Iterator, NamedTuple
+
+from .backend import get_backend
+from .keys import MOUSE_LEFT, MOUSE_RIGHT, vk_of
+from .ring import OUTPUT_ACTIONS
+
+# File layout (little endian):
+#   header   magic "NWTRACE1", u32 version, u32 record size, i64 start ns
+#   records  24 bytes each, in arrival order
+#   footer   hotkey ids as UTF-8 joined by "\n", u32 length, "NAMS" (written on close)
+#
+# Record: u8 kind, u8 flags, u8 state, u8 reserved, u16 code, u16 owner,
+#         u32 hook_time, u32 aux, i64 ts_ns
+#   kind       TRACE_KEY / TRACE_MOUSE (hook events) or TRACE_OUTPUT
+#   flags      hook: low byte of KBDLLHOOKSTRUCT / MSLLHOOKSTRUCT flags
+#   state      hook: STATE_DOWN | STATE_BLOCKED; output: index into OUTPUT_ACTIONS
+#   code       key id (VK code or MOUSE_*); 0 for mouse moves and wheel
+#   owner      output: index into the footer names; hook: 0
+#   hook_time  hook: the event's system time in ms
+#   aux        key: scan code; mouse: the WM_* message
+#   ts_ns      our perf counter at hook entry / at output acceptance
+# Fields sit at multiples of their size, so columns are strided views
+# straight over the mapped file.
+
+TRACE_MAGIC = b"NWTRACE1"
+TRACE_VERSION = 1
+TRACE_KEY = 0
+TRACE_MOUSE = 1
+TRACE_OUTPUT = 2
+STATE_DOWN = 1
+STATE_BLOCKED = 2
+
+_HEADER = struct.Struct("<8sIIq")
+_RECORD = struct.Struct("<BBBBHHIIq")
+_FOOTER = struct.Struct("<I4s")
+_FOOTER_MAGIC = b"NAMS"
+RECORD_SIZE = _RECORD.size
+_ACTION_CODES = {a: i for i, a in enumerate(OUTPUT_ACTIONS)}
+# Output button names -> the key ids the mouse hook reports for them.
+_BUTTON_IDS = {"LButton": MOUSE_LEFT, "RButton": MOUSE_RIGHT}
+# Longest an output producer waits on a full ring for the writer before
+# dropping. Hook producers never wait: a stalled hook stalls all system input.
+_FULL_WAIT_S = 0.002
+
+# name -> (format, byte offset) of each record field.
+_COLUMNS = {
+    "kind": ("B", 0),
+    "flags": ("B", 1),
+    "state": ("B", 2),
+    "code": ("H", 4),
+    "owner": ("H", 6),
+    "hook_time": ("I", 8),
+    "aux": ("I", 12),
+    "ts_ns": ("q", 16),
+}
+
+
+class TraceRecord(NamedTuple):
+    kind: int
+    flags: int
+    state: int
+    code: int
+    owner: str
+    hook_time: int
+    aux: int
+    ts_ns: int
+
+
+class TraceWriter:
+    """Appends hook events and outputs to a trace file from a background thread.
+
+    Producers (hook thread, output arbiter) pack records into a preallocated
+    ring under a short lock; the writer thread hands filled spans of the ring
+    straight to ``write``. Nothing is allocated per event. When the writer
+    falls a full ring behind, hook records are dropped and counted at once;
+    output records wait up to ``_FULL_WAIT_S`` for a drain first. The default
+    ring holds about 8 s of 8 kHz mouse moves.
+    """
+
+    def __init__(self, path: Path, capacity: int = 1 << 16) -> None:
+        size = 1
+        while size < capacity:
+            size <<= 1
+        self.path = path
+        self._mask = size - 1
+        self._half = size >> 1
+        self._buf = bytearray(size * RECORD_SIZE)
+        self._view = memoryview(self._buf)
+        self._pack = _RECORD.pack_into
+        self._lock = threading.Lock()
+        self._head = 0
+        self._tail = 0
+        self._wake = threading.Event()
+        # Set by the producer that crosses half full, cleared by the writer once it drains.
+        self._is_wake_pending = False
+        self._drained = threading.Event()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._file = None
+        self._owner_ids: dict[str, int] = {}
+        self._owners: list[str] = []
+        self._codes: dict[str, int] = {}
+        self.written = 0
+        self.dropped = 0
+
+    def start(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = self.path.open("wb")
+        self._file.write(_HEADER.pack(TRACE_MAGIC, TRACE_VERSION, RECORD_SIZE, get_backend().now_ns()))
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def close(self) -> None:
+        # Drains the ring, then writes the names footer.
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._wake.set()
+        self._thread.join()
+        self._thread = None
+        names = "\n".join(self._owners).encode("utf-8")
+        self._file.write(names)
+        self._file.write(_FOOTER.pack(len(names), _FOOTER_MAGIC))
+        self._file.close()
+        self._file = None
+
+    def hook(self, kind: int, code: int, flags: int, is_down: bool, is_blocked: bool,
+             hook_time: int, aux: int, ts_ns: int) -> None:
+        state = STATE_DOWN if is_down else 0
+        if is_blocked:
+            state |= STATE_BLOCKED
+        self._put(kind, flags & 0xFF, state, code, 0, hook_time & 0xFFFFFFFF, aux & 0xFFFFFFFF, ts_ns, False)
+
+    def record(self, ts_ns: int, owner: str, action: str, name: str) -> None:
+        # Same signature as OutputRecorder.record; called by the output arbiter.
+        oid = self._owner_ids.get(owner)
+        if oid is None:
+            oid = self._owner_ids[owner] = len(self._owners)
+            self._owners.append(owner)
+        code = self._codes.get(name)
+        if code is None:
+            code = self._codes[name] = _BUTTON_IDS.get(name) or vk_of(name) or 0
+        self._put(TRACE_OUTPUT, 0, _ACTION_CODES[action], code, oid, 0, 0, ts_ns, True)
+
+    def stats(self) -> dict[str, int]:
+        return {"written": self.written, "dropped": self.dropped, "capacity": self._mask + 1}
+
+    def _put(self, kind: int, flags: int, state: int, code: int, owner: int,
+             hook_time: int, aux: int, ts_ns: int, is_waiting: bool) -> None:
+        if is_waiting and self._head - self._tail > self._mask and self._thread is not None:
+            # Full: a producer in a tight loop keeps the writer off the GIL, so
+            # block briefly for a drain before dropping.
+            self._drained.clear()
+            self._wake.set()
+            self._drained.wait(_FULL_WAIT_S)
+        with self._lock:
+            head = self._head
+            depth = head - self._tail
+            if depth > self._mask:
+                self.dropped += 1
+                return
+            self._pack(self._buf, (head & self._mask) * RECORD_SIZE,
+                       kind, flags, state, 0, code, owner, hook_time, aux, ts_ns)
+            self._head = head + 1
+            if depth < self._half or self._is_wake_pending:
+                return
+            self._is_wake_pending = True
+        self._wake.set()
+
+    def _run(self) -> None:
+        # Only this thread moves _tail; records below _head are complete.
+        view = self._view
+        size = self._mask + 1
+        while True:
+            is_stopping = self._stop.is_set()
+            head = self._head
+            tail = self._tail
+            n = head - tail
+            if not n:
+                if is_stopping:
+                    return
+                self._wake.wait(0.1)
+                self._wake.clear()
+                continue
+            start = tail & self._mask
+            first = min(n, size - start)
+            self._file.write(view[start * RECORD_SIZE:(start + first) * RECORD_SIZE])
+            if n > first:
+                self._file.write(view[:(n - first) * RECORD_SIZE])
+            self.written += n
+            self._tail = head
+            self._is_wake_pending = False
+            self._drained.set()
+
+
+class TraceReader:
+    """Memory-mapped view of a trace file; nothing is copied until asked.
+
+    ``columns()`` returns strided memoryviews, one per record field, over the
+    mapping; ``records()`` decodes rows lazily. Drop the returned views before
+    ``close()``. A trace cut short (no footer) reads up to its last full record,
+    with owners as their index.
+    """
+
+    def __init__(self, path: Path) -> None:
+        if sys.byteorder != "little":
+            raise ValueError("trace columns need a little-endian host")
+        self.path = path
+        with path.open("rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        mm = self._mm
+        if len(mm) < _HEADER.size:
+            raise ValueError(f"not a trace file: {path}")
+        magic, version, record_size, self.start_ns = _HEADER.unpack_from(mm, 0)
+        if magic != TRACE_MAGIC or version != TRACE_VERSION or record_size != RECORD_SIZE:
+            raise ValueError(f"not a trace file: {path}")
+        end = len(mm)
+        names: tuple[str, ...] = ()
+        if end >= _HEADER.size + _FOOTER.size:
+            n_bytes, tag = _FOOTER.unpack_from(mm, end - _FOOTER.size)
+            body = end - _FOOTER.size - n_bytes
+            if tag == _FOOTER_MAGIC and body >= _HEADER.size and (body - _HEADER.size) % RECORD_SIZE == 0:
+                names = tuple(bytes(mm[body:end - _FOOTER.size]).decode("utf-8").split("\n")) if n_bytes else ()
+                end = body
+        self.names = names
+        self._count = (end - _HEADER.size) // RECORD_SIZE
+        self._mv = memoryview(mm)[_HEADER.size:_HEADER.size + self._count * RECORD_SIZE]
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __enter__(self) -> TraceReader:
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self._mv.release()
+        self._mm.close()
+
+    def owner_name(self, owner: int) -> str:
+        return self.names[owner] if owner < len(self.names) else str(owner)
+
+    def columns(self) -> dict[str, memoryview]:
+        """Field name -> strided view with one item per record (zero-copy)."""
+        out = {}
+        for name, (fmt, offset) in _COLUMNS.items():
+            width = struct.calcsize(fmt)
+            step = RECORD_SIZE // width
+            out[name] = self._mv.cast(fmt)[offset // width::step]
+        return out
+
+    def records(self, kind: int | None = None) -> Iterator[TraceRecord]:
+        for k, flags, state, _, code, owner, hook_time, aux, ts in _RECORD.iter_unpack(self._mv):
+            if kind is not None and k != kind:
+                continue
+            yield TraceRecord(k, flags, state, code, self.owner_name(owner) if k == TRACE_OUTPUT else "",
+                              hook_time, aux, ts)
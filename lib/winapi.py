@@ -5,6 +5,8 @@ from ctypes import wintypes
 from dataclasses import dataclass
 import os
 
+from .keys import key_info
+
 user32 = ctypes.WinDLL("user32", use_last_error=True)
 kernel32 = ctypes.WinDLL("kernel32", use_last_error=True)
 psapi = ctypes.WinDLL("psapi", use_last_error=True)
@@ -56,6 +58,10 @@ user32.SendInput.argtypes = [wintypes.UINT, ctypes.c_void_p, ctypes.c_int]
 user32.SendInput.restype = wintypes.UINT
 user32.MapVirtualKeyW.argtypes = [wintypes.UINT, wintypes.UINT]
 user32.MapVirtualKeyW.restype = wintypes.UINT
+user32.MapVirtualKeyExW.argtypes = [wintypes.UINT, wintypes.UINT, wintypes.HKL]
+user32.MapVirtualKeyExW.restype = wintypes.UINT
+user32.GetKeyboardLayout.argtypes = [wintypes.DWORD]
+user32.GetKeyboardLayout.restype = wintypes.HKL
 
 kernel32.OpenProcess.argtypes = [wintypes.DWORD, wintypes.BOOL, wintypes.DWORD]
 kernel32.OpenProcess.restype = wintypes.HANDLE
@@ -233,33 +239,20 @@ MOUSEEVENTF_LEFTUP = 0x0004
 MOUSEEVENTF_RIGHTDOWN = 0x0008
 MOUSEEVENTF_RIGHTUP = 0x0010
 
+KEYEVENTF_EXTENDEDKEY = 0x0001
 KEYEVENTF_KEYUP = 0x0002
 KEYEVENTF_SCANCODE = 0x0008
 
 
-def _vk_from_name(name: str) -> int | None:
-    n = name.strip().lower()
-    if len(n) == 1:
-        return ord(n.upper())
-    if n.startswith("f") and n[1:].isdigit():
-        idx = int(n[1:])
-        if 1 <= idx <= 24:
-            return 0x6F + idx
-    vk_map = {
-        "esc": 0x1B,
-        "escape": 0x1B,
-        "tab": 0x09,
-        "enter": 0x0D,
-        "space": 0x20,
-        "backspace": 0x08,
-        "shift": 0x10,
-        "ctrl": 0x11,
-        "alt": 0x12,
-        "lwin": 0x5B,
-    }
-    return vk_map.get(n)
-
-def _scan_from_vk(vk: int) -> int:
+_MOUSE_FLAGS = {
+    "lbutton": (MOUSEEVENTF_LEFTDOWN, MOUSEEVENTF_LEFTUP),
+    "rbutton": (MOUSEEVENTF_RIGHTDOWN, MOUSEEVENTF_RIGHTUP),
+}
+
+
+def _scan_from_vk(vk: int, hkl: int | None = None) -> int:
+    if hkl:
+        return int(user32.MapVirtualKeyExW(vk, 0, hkl))
     return int(user32.MapVirtualKeyW(vk, 0))
 
 class KEYBDINPUT(ctypes.Structure):
@@ -297,11 +290,14 @@ class INPUT(ctypes.Structure):
     ]
 
 
-def _send_input(inputs: list[INPUT]) -> None:
-    if not inputs:
-        return
-    arr = (INPUT * len(inputs))(*inputs)
-    user32.SendInput(len(inputs), ctypes.byref(arr), ctypes.sizeof(INPUT))
+_INPUT_SIZE = ctypes.sizeof(INPUT)
+
+# Ready-to-send INPUT arrays keyed by (action, name as passed by the caller):
+# ("tap" / "press" / "release", key), ("down" / "up", button). Keyboard payloads carry scan
+# codes of the layout in _payload_hkl; a layout change swaps in a new dict
+# instead of mutating this one, so senders never see a half-built cache.
+_payloads: dict[tuple[str, str], tuple[int, ctypes.Array]] = {}
+_payload_hkl = 0
 
 
 def _key_input(vk: int, flags: int) -> INPUT:
@@ -311,6 +307,13 @@ def _key_input(vk: int, flags: int) -> INPUT:
     return inp
 
 
+def _scan_input(sc: int, flags: int) -> INPUT:
+    inp = INPUT()
+    inp.type = INPUT_KEYBOARD
+    inp.union.ki = KEYBDINPUT(0, sc, KEYEVENTF_SCANCODE | flags, 0, None)
+    return inp
+
+
 def _mouse_input(flags: int) -> INPUT:
     inp = INPUT()
     inp.type = INPUT_MOUSE
@@ -318,37 +321,130 @@ def _mouse_input(flags: int) -> INPUT:
     return inp
 
 
-def send_key_tap(name: str) -> None:
-    vk = _vk_from_name(name)
-    if vk is None:
-        return
-    sc = _scan_from_vk(vk)
-    if sc:
-        down = INPUT()
-        down.type = INPUT_KEYBOARD
-        down.union.ki = KEYBDINPUT(0, sc, KEYEVENTF_SCANCODE, 0, None)
-        up = INPUT()
-        up.type = INPUT_KEYBOARD
-        up.union.ki = KEYBDINPUT(0, sc, KEYEVENTF_SCANCODE | KEYEVENTF_KEYUP, 0, None)
-        _send_input([down, up])
+def _build_payload(action: str, name: str, hkl: int) -> tuple[int, ctypes.Array] | None:
+    if action in ("tap", "press", "release"):
+        info = key_info(name)
+        if info is None or not info.vk:
+            return None
+        # The layout's scan code wins; the table's US code covers keys it does not map.
+        sc = _scan_from_vk(info.vk, hkl) or info.scan
+        ext = KEYEVENTF_EXTENDEDKEY if info.is_extended else 0
+        flags = [ext, ext | KEYEVENTF_KEYUP]
+        if action == "press":
+            flags = flags[:1]
+        elif action == "release":
+            flags = flags[1:]
+        if sc:
+            inputs = [_scan_input(sc, f) for f in flags]
+        else:
+            inputs = [_key_input(info.vk, f) for f in flags]
     else:
-        _send_input([_key_input(vk, 0), _key_input(vk, KEYEVENTF_KEYUP)])
+        flags = _MOUSE_FLAGS.get(name.strip().lower())
+        if flags is None:
+            return None
+        inputs = [_mouse_input(flags[0] if action == "down" else flags[1])]
+    return len(inputs), (INPUT * len(inputs))(*inputs)
+
+
+def _payload(action: str, name: str) -> tuple[int, ctypes.Array] | None:
+    # Cache miss path: names that were not prepared still get cached on first use.
+    payload = _build_payload(action, name, _payload_hkl)
+    if payload is not None:
+        _payloads[(action, name)] = payload
+    return payload
+
+
+def get_keyboard_layout(hwnd: int | None = None) -> int:
+    tid = user32.GetWindowThreadProcessId(hwnd, None) if hwnd else 0
+    return int(user32.GetKeyboardLayout(tid) or 0)
+
+
+def prepare_payloads(keys: list[str], buttons: list[str], held_keys: list[str] = (), hkl: int | None = None) -> None:
+    """Builds tap payloads for keys, press/release for held_keys and down/up for buttons.
+
+    hkl defaults to the layout already in use; passing a different one
+    rebuilds every cached payload for that layout.
+    """
+    global _payloads, _payload_hkl
+    if hkl is None:
+        hkl = _payload_hkl or get_keyboard_layout()
+    wanted = {("tap", k) for k in keys}
+    wanted.update((a, k) for k in held_keys for a in ("press", "release"))
+    wanted.update((a, b) for b in buttons for a in ("down", "up"))
+    cache = dict(_payloads) if hkl == _payload_hkl else {}
+    wanted.update(_payloads)
+    for action, name in wanted:
+        if (action, name) not in cache:
+            payload = _build_payload(action, name, hkl)
+            if payload is not None:
+                cache[(action, name)] = payload
+    _payloads = cache
+    _payload_hkl = hkl
+
+
+def refresh_keyboard_layout(hwnd: int | None = None) -> bool:
+    # Rebuilds keyboard payloads when the foreground window's layout changed.
+    hkl = get_keyboard_layout(hwnd or get_foreground_hwnd())
+    if not hkl or hkl == _payload_hkl:
+        return False
+    prepare_payloads([], [], hkl=hkl)
+    return True
+
+
+def send_key_tap(name: str) -> None:
+    payload = _payloads.get(("tap", name)) or _payload("tap", name)
+    if payload is not None:
+        user32.SendInput(payload[0], payload[1], _INPUT_SIZE)
+
+
+def send_key_down(name: str) -> None:
+    payload = _payloads.get(("press", name)) or _payload("press", name)
+    if payload is not None:
+        user32.SendInput(payload[0], payload[1], _INPUT_SIZE)
+
+
+def send_key_up(name: str) -> None:
+    payload = _payloads.get(("release", name)) or _payload("release", name)
+    if payload is not None:
+        user32.SendInput(payload[0], payload[1], _INPUT_SIZE)
 
 
 def send_mouse_down(btn_name: str) -> None:
-    name = btn_name.strip().lower()
-    if name == "lbutton":
-        _send_input([_mouse_input(MOUSEEVENTF_LEFTDOWN)])
-    elif name == "rbutton":
-        _send_input([_mouse_input(MOUSEEVENTF_RIGHTDOWN)])
+    payload = _payloads.get(("down", btn_name)) or _payload("down", btn_name)
+    if payload is not None:
+        user32.SendInput(payload[0], payload[1], _INPUT_SIZE)
 
 
 def send_mouse_up(btn_name: str) -> None:
-    name = btn_name.strip().lower()
-    if name == "lbutton":
-        _send_input([_mouse_input(MOUSEEVENTF_LEFTUP)])
-    elif name == "rbutton":
-        _send_input([_mouse_input(MOUSEEVENTF_RIGHTUP)])
+    payload = _payloads.get(("up", btn_name)) or _payload("up", btn_name)
+    if payload is not None:
+        user32.SendInput(payload[0], payload[1], _INPUT_SIZE)
+
+
+def send_batch(events: list[tuple[str, str]]) -> None:
+    """Sends (action, name) events in order with a single SendInput call."""
+    if len(events) == 1:
+        payload = _payloads.get(events[0]) or _payload(*events[0])
+        if payload is not None:
+            user32.SendInput(payload[0], payload[1], _INPUT_SIZE)
+        return
+    payloads = [p for p in (_payloads.get(e) or _payload(*e) for e in events) if p is not None]
+    total = sum(n for n, _ in payloads)
+    if not total:
+        return
+    arr = (INPUT * total)()
+    offset = 0
+    for n, src in payloads:
+        ctypes.memmove(ctypes.byref(arr, offset), src, n * _INPUT_SIZE)
+        offset += n * _INPUT_SIZE
+    user32.SendInput(total, arr, _INPUT_SIZE)
+
+
+def warm_send_path() -> None:
+    # Touches the cached payloads and SendInput from this thread without emitting input.
+    for _, arr in list(_payloads.values()):
+        user32.SendInput(0, arr, _INPUT_SIZE)
+    user32.SendInput(0, None, _INPUT_SIZE)
 
 
 def send_mouse_click(btn_name: str) -> None:
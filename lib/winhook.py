@@ -7,6 +7,9 @@ import time
 from typing import Callable
 
 from . import winapi
+from .keys import KEY_TABLE_SIZE, MOUSE_LEFT, MOUSE_MIDDLE, MOUSE_RIGHT, MOUSE_X1, MOUSE_X2
+from .stats import Histogram
+from .trace import TRACE_KEY, TRACE_MOUSE, TraceWriter
 
 user32 = ctypes.WinDLL("user32", use_last_error=True)
 kernel32 = ctypes.WinDLL("kernel32", use_last_error=True)
@@ -26,9 +29,16 @@ WM_MBUTTONUP = 0x0208
 WM_XBUTTONDOWN = 0x020B
 WM_XBUTTONUP = 0x020C
 WM_QUIT = 0x0012
+WM_MOUSEMOVE = 0x0200
+WM_MOUSEWHEEL = 0x020A
+WM_MOUSEHWHEEL = 0x020E
+PM_NOREMOVE = 0x0000
+# Thread message asking the hook thread to match its hooks to the is_*_wanted flags.
+WM_APP_SYNC_HOOKS = 0x8000 + 1
 HC_ACTION = 0
 LLKHF_INJECTED = 0x00000010
 LLMHF_INJECTED = 0x00000001
+_MOUSE_DOWN_MSGS = (WM_LBUTTONDOWN, WM_RBUTTONDOWN, WM_MBUTTONDOWN, WM_XBUTTONDOWN)
 
 
 ULONG_PTR = ctypes.c_uint64 if ctypes.sizeof(ctypes.c_void_p) == 8 else ctypes.c_uint32
@@ -74,6 +84,8 @@ user32.DispatchMessageW.argtypes = [ctypes.POINTER(wintypes.MSG)]
 user32.DispatchMessageW.restype = LRESULT
 user32.PostThreadMessageW.argtypes = [wintypes.DWORD, wintypes.UINT, WPARAM, LPARAM]
 user32.PostThreadMessageW.restype = wintypes.BOOL
+user32.PeekMessageW.argtypes = [ctypes.POINTER(wintypes.MSG), wintypes.HWND, wintypes.UINT, wintypes.UINT, wintypes.UINT]
+user32.PeekMessageW.restype = wintypes.BOOL
 
 
 class HookState:
@@ -86,171 +98,97 @@ class HookState:
         self.ms_cb = None
         self.hook_error_count = 0
         self.fail_open_enabled = False
+        # Callback accounting; cost histograms are in nanoseconds.
+        self.seen = 0
+        self.blocked = 0
+        self.passed = 0
+        self.injected = 0
+        self.fast_passed = 0
+        self.cost_ns = Histogram()
+        self.is_degraded = False
+        # Installed / removed on the hook thread via WM_APP_SYNC_HOOKS.
+        self.is_keyboard_wanted = True
+        self.is_mouse_wanted = True
+        # Key ids the handler must see; everything else passes untouched while degraded.
+        self.key_filter = bytearray(b"\x01" * KEY_TABLE_SIZE)
+        # TraceWriter receiving every event the hooks see, moves and injected ones included.
+        self.trace: TraceWriter | None = None
         self._stop = threading.Event()
 
 
-VK_NAME_MAP: dict[int, str] = {
-    # 1) System / control
-    0x03: "cancel",
-    0x08: "backspace",
-    0x09: "tab",
-    0x0C: "clear",
-    0x0D: "enter",
-    0x10: "shift",
-    0x11: "ctrl",
-    0x12: "alt",
-    0x13: "pause",
-    0x14: "capslock",
-    0x15: "ime_kana",
-    0x17: "ime_junja",
-    0x18: "ime_final",
-    0x19: "ime_hanja",
-    0x1B: "esc",
-    0x1C: "ime_convert",
-    0x1D: "ime_nonconvert",
-    0x1E: "ime_accept",
-    0x1F: "ime_modechange",
-    0x20: "space",
-    0x29: "select",
-    0x2A: "print",
-    0x2B: "execute",
-    0x2F: "help",
-    # Left/right modifiers (distinct names)
-    0xA0: "lshift",  # VK_LSHIFT
-    0xA1: "rshift",  # VK_RSHIFT
-    0xA2: "lctrl",   # VK_LCONTROL
-    0xA3: "rctrl",   # VK_RCONTROL
-    0xA4: "lalt",    # VK_LMENU
-    0xA5: "ralt",    # VK_RMENU
-    # 2) Navigation / edit
-    0x21: "pageup",
-    0x22: "pagedown",
-    0x23: "end",
-    0x24: "home",
-    0x25: "left",
-    0x26: "up",
-    0x27: "right",
-    0x28: "down",
-    0x2C: "printscreen",
-    0x2D: "insert",
-    0x2E: "delete",
-    # 4) Windows keys / apps
-    0x5B: "lcmd",
-    0x5C: "rcmd",
-    0x5D: "apps",
-    0x5F: "sleep",
-    # 5) Numpad operators
-    0x6A: "num*",
-    0x6B: "num+",
-    0x6C: "numsep",  # VK_SEPARATOR
-    0x6D: "num-",
-    0x6E: "num.",
-    0x6F: "num/",
-    # 7) Lock keys
-    0x90: "numlock",
-    0x91: "scrolllock",
-    # 9) Browser / media / launch
-    0xA6: "browser_back",
-    0xA7: "browser_forward",
-    0xA8: "browser_refresh",
-    0xA9: "browser_stop",
-    0xAA: "browser_search",
-    0xAB: "browser_favorites",
-    0xAC: "browser_home",
-    0xAD: "volume_mute",
-    0xAE: "volume_down",
-    0xAF: "volume_up",
-    0xB0: "media_next",
-    0xB1: "media_prev",
-    0xB2: "media_stop",
-    0xB3: "media_play_pause",
-    0xB4: "launch_mail",
-    0xB5: "launch_media",
-    0xB6: "launch_app1",
-    0xB7: "launch_app2",
-    # 8) OEM symbols (US layout names)
-    0xBA: ";",   # VK_OEM_1
-    0xBB: "=",   # VK_OEM_PLUS
-    0xBC: ",",   # VK_OEM_COMMA
-    0xBD: "-",   # VK_OEM_MINUS
-    0xBE: ".",   # VK_OEM_PERIOD
-    0xBF: "/",   # VK_OEM_2
-    0xC0: "`",   # VK_OEM_3 (`~ key)
-    0xDB: "[",   # VK_OEM_4
-    0xDC: "\\",  # VK_OEM_5
-    0xDD: "]",   # VK_OEM_6
-    0xDE: "'",   # VK_OEM_7
-    0xDF: "oem_8",
-    0xE1: "oem_ax",
-    0xE2: "oem_102",
-    0xE5: "processkey",
-    0xE7: "packet",
-    0xE9: "oem_reset",
-    0xEA: "oem_jump",
-    0xEB: "oem_pa1",
-    0xEC: "oem_pa2",
-    0xED: "oem_pa3",
-    0xEE: "oem_wsctrl",
-    0xEF: "oem_cusel",
-    0xF0: "oem_attn",
-    0xF1: "oem_finish",
-    0xF2: "oem_copy",
-    0xF3: "oem_auto",
-    0xF4: "oem_enlw",
-    0xF5: "oem_backtab",
-    0xF6: "attn",
-    0xF7: "crsel",
-    0xF8: "exsel",
-    0xF9: "ereof",
-    0xFA: "play",
-    0xFB: "zoom",
-    0xFD: "pa1",
-    0xFE: "oem_clear",
-}
-
-# 3) Main alnum area
-VK_NAME_MAP.update({vk: chr(vk) for vk in range(0x30, 0x3A)})
-VK_NAME_MAP.update({vk: chr(vk + 32) for vk in range(0x41, 0x5B)})
-
-# 5) Numpad digits
-VK_NAME_MAP.update({vk: f"num{vk - 0x60}" for vk in range(0x60, 0x6A)})
-
-# 6) Function keys
-VK_NAME_MAP.update({vk: f"f{vk - 0x6F}" for vk in range(0x70, 0x88)})
-
-
-def _vk_to_name(vk: int) -> str | None:
-    # Unknown VK still returns a stable name so it can be bound.
-    return VK_NAME_MAP.get(vk) or f"vk_{vk:02x}"
-
-
-def _mouse_name(msg: int, mouseData: int) -> str | None:
+def set_key_filter(state: HookState, key_filter: bytearray) -> None:
+    state.key_filter = key_filter
+
+
+def set_trace(state: HookState, trace: TraceWriter | None) -> None:
+    state.trace = trace
+
+
+def set_hooks(state: HookState, is_keyboard: bool, is_mouse: bool) -> None:
+    # Compared with what is installed too, so a hook that failed to install is retried.
+    if (state.is_keyboard_wanted == is_keyboard and state.is_mouse_wanted == is_mouse
+            and bool(state.h_kb) == is_keyboard and bool(state.h_ms) == is_mouse):
+        return
+    state.is_keyboard_wanted = is_keyboard
+    state.is_mouse_wanted = is_mouse
+    # Before tid is published, run() reads the flags itself.
+    if state.tid:
+        user32.PostThreadMessageW(state.tid, WM_APP_SYNC_HOOKS, 0, 0)
+
+
+def hook_stats(state: HookState) -> dict[str, object]:
+    return {
+        "is_keyboard_hooked": bool(state.h_kb),
+        "is_mouse_hooked": bool(state.h_ms),
+        "seen": state.seen,
+        "blocked": state.blocked,
+        "passed": state.passed,
+        "injected": state.injected,
+        "fast_passed": state.fast_passed,
+        "is_degraded": state.is_degraded,
+        "cost_ns": state.cost_ns.snapshot(),
+    }
+
+
+def _mouse_id(msg: int, mouseData: int) -> int | None:
     if msg in (WM_LBUTTONDOWN, WM_LBUTTONUP):
-        return "left"
+        return MOUSE_LEFT
     if msg in (WM_RBUTTONDOWN, WM_RBUTTONUP):
-        return "right"
+        return MOUSE_RIGHT
     if msg in (WM_MBUTTONDOWN, WM_MBUTTONUP):
-        return "middle"
+        return MOUSE_MIDDLE
     if msg in (WM_XBUTTONDOWN, WM_XBUTTONUP):
         xbtn = (mouseData >> 16) & 0xFFFF
         if xbtn == 1:
-            return "x1"
+            return MOUSE_X1
         if xbtn == 2:
-            return "x2"
+            return MOUSE_X2
     return None
 
 
 def start_hooks(
-    on_key: Callable[[str, bool], bool],
-    on_mouse: Callable[[str, bool], bool],
+    on_key: Callable[[int, bool], bool],
+    on_mouse: Callable[[int, bool], bool],
     on_log: Callable[[str, str, str, str], None] | None = None,
     on_auto_fail_open: Callable[[], None] | None = None,
+    budget_us: int = 0,
+    is_keyboard_hook: bool = True,
+    is_mouse_hook: bool = True,
 ) -> HookState:
     state = HookState()
+    state.is_keyboard_wanted = is_keyboard_hook
+    state.is_mouse_wanted = is_mouse_hook
     err_lock = threading.Lock()
     last_err_log_ts = 0.0
     err_log_interval_sec = 1.0
     err_threshold = 10
+    # p99 callback budget; checked every 256 events over a fresh window.
+    budget_ns = max(0, int(budget_us)) * 1000
+    window = Histogram()
+    last_slow_log_ts = 0.0
+    perf_ns = time.perf_counter_ns
+    kb_ptr = ctypes.POINTER(KBDLLHOOKSTRUCT)
+    ms_ptr = ctypes.POINTER(MSLLHOOKSTRUCT)
 
     def _safe_next(nCode, wParam, lParam):
         return user32.CallNextHookEx(None, nCode, wParam, lParam)
@@ -270,56 +208,167 @@ def start_hooks(
             if on_log:
                 on_log("SYS", "HookError", "autoFailOpen", f"count={state.hook_error_count}")
 
+    def _check_budget():
+        p99 = window.percentile(0.99)
+        window.reset()
+        if not state.is_degraded and p99 > budget_ns:
+            state.is_degraded = True
+            if on_log:
+                on_log("SYS", "Hook", "degrade", f"p99={p99 // 1000}us budget={budget_ns // 1000}us")
+        elif state.is_degraded and p99 < budget_ns // 2:
+            state.is_degraded = False
+            if on_log:
+                on_log("SYS", "Hook", "recover", f"p99={p99 // 1000}us budget={budget_ns // 1000}us")
+
+    def _account(kind: str, t0: int, t1: int, t2: int, t3: int) -> None:
+        # t0 entry, t1/t2 around the handler (0 if it did not run), t3 before CallNextHookEx.
+        nonlocal last_slow_log_ts
+        t4 = perf_ns()
+        total = t4 - t0
+        state.cost_ns.record(total)
+        if not budget_ns:
+            return
+        window.record(total)
+        if total > budget_ns and on_log:
+            now = time.monotonic()
+            if now - last_slow_log_ts >= err_log_interval_sec:
+                last_slow_log_ts = now
+                handler = t2 - t1 if t1 else 0
+                stages = {"decode": (t1 or t3) - t0, "handler": handler, "next": t4 - t3}
+                stage = max(stages, key=stages.get)
+                on_log("SYS", "Hook", "slow", f"kind={kind} stage={stage} us={total // 1000} "
+                       + " ".join(f"{k}={v // 1000}" for k, v in stages.items()))
+        if window.count >= 256:
+            _check_budget()
+
     def kb_proc(nCode, wParam, lParam):
+        t0 = perf_ns()
+        t1 = t2 = 0
         try:
             if state.fail_open_enabled:
                 return _safe_next(nCode, wParam, lParam)
             if nCode == HC_ACTION:
-                data = ctypes.cast(lParam, ctypes.POINTER(KBDLLHOOKSTRUCT)).contents
+                data = ctypes.cast(lParam, kb_ptr).contents
+                state.seen += 1
+                vk = data.vkCode
+                # Key ids are VK codes; names are only resolved at the binding boundary.
+                is_down = wParam in (WM_KEYDOWN, WM_SYSKEYDOWN)
+                trace = state.trace
                 if data.flags & LLKHF_INJECTED:
+                    state.injected += 1
+                    if trace is not None:
+                        trace.hook(TRACE_KEY, vk, data.flags, is_down, False, data.time, data.scanCode, t0)
+                elif state.is_degraded and not state.key_filter[vk]:
+                    state.fast_passed += 1
+                    if trace is not None:
+                        trace.hook(TRACE_KEY, vk, data.flags, is_down, False, data.time, data.scanCode, t0)
                     return _safe_next(nCode, wParam, lParam)
-                name = _vk_to_name(data.vkCode)
-                if name:
-                    is_down = wParam in (WM_KEYDOWN, WM_SYSKEYDOWN)
-                    if on_key(name, is_down):
+                else:
+                    t1 = perf_ns()
+                    is_blocked = on_key(vk, is_down)
+                    t2 = perf_ns()
+                    if trace is not None:
+                        trace.hook(TRACE_KEY, vk, data.flags, is_down, is_blocked, data.time, data.scanCode, t0)
+                    if is_blocked:
+                        state.blocked += 1
+                        _account("keyboard", t0, t1, t2, t2)
                         return 1
+                    state.passed += 1
         except Exception as exc:
             _log_error("keyboard", exc)
-        return _safe_next(nCode, wParam, lParam)
+        t3 = perf_ns()
+        ret = _safe_next(nCode, wParam, lParam)
+        _account("keyboard", t0, t1, t2, t3)
+        return ret
+
+    call_next = user32.CallNextHookEx
+    fast_mouse_msgs = frozenset((WM_MOUSEMOVE, WM_MOUSEWHEEL, WM_MOUSEHWHEEL))
 
     def ms_proc(nCode, wParam, lParam):
+        # Moves and wheel arrive at up to 8 kHz and are never handled: leave before any other work.
+        if wParam in fast_mouse_msgs:
+            trace = state.trace
+            if trace is not None and nCode == HC_ACTION:
+                data = ctypes.cast(lParam, ms_ptr).contents
+                trace.hook(TRACE_MOUSE, 0, data.flags, False, False, data.time, wParam, perf_ns())
+            return call_next(None, nCode, wParam, lParam)
+        t0 = perf_ns()
+        t1 = t2 = 0
         try:
             if state.fail_open_enabled:
                 return _safe_next(nCode, wParam, lParam)
             if nCode == HC_ACTION:
-                data = ctypes.cast(lParam, ctypes.POINTER(MSLLHOOKSTRUCT)).contents
+                data = ctypes.cast(lParam, ms_ptr).contents
+                state.seen += 1
+                trace = state.trace
                 if data.flags & LLMHF_INJECTED:
-                    return _safe_next(nCode, wParam, lParam)
-                name = _mouse_name(wParam, data.mouseData)
-                if name:
-                    is_down = wParam in (WM_LBUTTONDOWN, WM_RBUTTONDOWN, WM_MBUTTONDOWN, WM_XBUTTONDOWN)
-                    if on_mouse(name, is_down):
-                        return 1
+                    state.injected += 1
+                    if trace is not None:
+                        trace.hook(TRACE_MOUSE, _mouse_id(wParam, data.mouseData) or 0, data.flags,
+                                   wParam in _MOUSE_DOWN_MSGS, False, data.time, wParam, t0)
+                else:
+                    kid = _mouse_id(wParam, data.mouseData)
+                    if kid is not None:
+                        is_down = wParam in _MOUSE_DOWN_MSGS
+                        if state.is_degraded and not state.key_filter[kid]:
+                            state.fast_passed += 1
+                            if trace is not None:
+                                trace.hook(TRACE_MOUSE, kid, data.flags, is_down, False, data.time, wParam, t0)
+                            return _safe_next(nCode, wParam, lParam)
+                        t1 = perf_ns()
+                        is_blocked = on_mouse(kid, is_down)
+                        t2 = perf_ns()
+                        if trace is not None:
+                            trace.hook(TRACE_MOUSE, kid, data.flags, is_down, is_blocked, data.time, wParam, t0)
+                        if is_blocked:
+                            state.blocked += 1
+                            _account("mouse", t0, t1, t2, t2)
+                            return 1
+                    state.passed += 1
         except Exception as exc:
             _log_error("mouse", exc)
-        return _safe_next(nCode, wParam, lParam)
+        t3 = perf_ns()
+        ret = _safe_next(nCode, wParam, lParam)
+        _account("mouse", t0, t1, t2, t3)
+        return ret
+
+    def _sync_one(handle, is_wanted: bool, hook_id: int, cb):
+        if is_wanted and not handle:
+            return user32.SetWindowsHookExW(hook_id, cb, 0, 0)
+        if not is_wanted and handle:
+            user32.UnhookWindowsHookEx(handle)
+            return None
+        return handle
+
+    def _sync_hooks() -> bool:
+        # Match installed hooks to the wanted flags; False if a wanted hook failed.
+        state.h_kb = _sync_one(state.h_kb, state.is_keyboard_wanted, WH_KEYBOARD_LL, state.kb_cb)
+        state.h_ms = _sync_one(state.h_ms, state.is_mouse_wanted, WH_MOUSE_LL, state.ms_cb)
+        return bool(state.h_kb) == state.is_keyboard_wanted and bool(state.h_ms) == state.is_mouse_wanted
 
     def run():
-        state.tid = kernel32.GetCurrentThreadId()
+        msg = wintypes.MSG()
+        # Create the thread's message queue before publishing tid, so set_hooks can always post.
+        user32.PeekMessageW(ctypes.byref(msg), 0, 0, 0, PM_NOREMOVE)
         state.kb_cb = LowLevelProc(kb_proc)
         state.ms_cb = LowLevelProc(ms_proc)
-        state.h_kb = user32.SetWindowsHookExW(WH_KEYBOARD_LL, state.kb_cb, 0, 0)
-        state.h_ms = user32.SetWindowsHookExW(WH_MOUSE_LL, state.ms_cb, 0, 0)
+        state.tid = kernel32.GetCurrentThreadId()
+        ok = _sync_hooks()
         if on_log:
-            if not state.h_kb or not state.h_ms:
+            if not ok:
                 err = ctypes.get_last_error()
                 on_log("SYS", "Hook", "initFail", f"hkb={int(bool(state.h_kb))} hms={int(bool(state.h_ms))} err={err}")
                 state.fail_open_enabled = True
                 if on_auto_fail_open:
                     on_auto_fail_open()
             on_log("SYS", "Hook", "init", f"tid={state.tid} hkb={int(bool(state.h_kb))} hms={int(bool(state.h_ms))}")
-        msg = wintypes.MSG()
         while not state._stop.is_set() and user32.GetMessageW(ctypes.byref(msg), 0, 0, 0) != 0:
+            if msg.message == WM_APP_SYNC_HOOKS:
+                ok = _sync_hooks()
+                if on_log:
+                    on_log("SYS", "Hook", "sync" if ok else "syncFail",
+                           f"hkb={int(bool(state.h_kb))} hms={int(bool(state.h_ms))}")
+                continue
             user32.TranslateMessage(ctypes.byref(msg))
             user32.DispatchMessageW(ctypes.byref(msg))
         if state.h_kb:
@@ -10,8 +10,13 @@ from functools import partial
 
 from lib.config import Settings, ConfigStore, APP_NAME, APP_TITLE
 from lib.log import Logger
-from lib.hotkeys import HotkeyManager, HotkeyDef
+from lib.hotkeys import HotkeyManager
+from lib.backend import WinBackend, set_backend
+from lib.ring import OutputRecorder
+from lib.trace import TraceWriter
 from lib.actions import Actions
+from lib.context import ForegroundContext
+from lib.timing import WaitProfile, calibrate_wait_profile, set_wait_profile
 from lib.gui.ui import AppUI
 from lib import winapi
 from PIL import Image, ImageDraw
@@ -25,8 +30,9 @@ _fg_pending = {"fg": 0, "exe": "-", "hwnd": 0}
 _fg_ui: AppUI | None = None
 _fg_log: Logger | None = None
 _fg_queue: queue.Queue[tuple[int, str, int, int, int]] = queue.Queue()
+_fg_drain = None
 _faulthandler_file = None
-_app_state = {"hk": None, "icon": None, "log": None, "closing": False}
+_app_state = {"hk": None, "ctx": None, "icon": None, "log": None, "closing": False, "cursor_tick": False}
 
 
 def ensure_admin(log: Logger) -> None:
@@ -71,41 +77,43 @@ def main() -> None:
     _terminate_existing_instances()
     store = ConfigStore(base_dir)
     settings = store.load(Settings())
+    if settings.output_sink in ("null", "record"):
+        set_backend(WinBackend(settings.output_sink))
+        log.event("SYS", "OutputSink", "init", f"sink={settings.output_sink}")
     winapi.time_begin_period(1)
     log.event("SYS", "timeBeginPeriod", "init", "ok=1")
+    _init_wait_profile(store, settings, log)
 
+    ctx = ForegroundContext(settings, "nikke.exe")
     hk = HotkeyManager(
-        is_context_enabled=partial(_is_context_enabled, settings),
+        is_context_enabled=ctx.is_enabled,
         logger=log,
-        context_info=partial(_context_info, settings),
+        context_info=ctx.info,
+        engine=settings.engine,
+        cadence=settings.cadence,
     )
+    hk.timing.sample_every = settings.trace_sample_every
+    hk.hook_budget_us = settings.hook_budget_us
+    if settings.output_sink == "record":
+        hk.output.recorder = OutputRecorder()
+    if settings.trace_file:
+        trace = TraceWriter(base_dir / settings.trace_file)
+        trace.start()
+        hk.set_trace(trace)
+        _app_state["trace"] = trace
+        log.event("SYS", "Trace", "init", f"path={trace.path}")
     _app_state["hk"] = hk
+    _app_state["ctx"] = ctx
+    log.event("SYS", "Engine", "init", f"mode={hk.engine} cadence={hk.cadence}")
+    ctx.add_listener(hk.on_context_changed)
     actions = Actions(settings, hk)
 
-    hk.define(HotkeyDef("DSpam", settings.key_spam_d, settings.is_spam_d_enabled,
-                        lambda stop: actions.run_spam(settings.key_spam_d, "d", stop)))
-    hk.define(HotkeyDef("SSpam", settings.key_spam_s, settings.is_spam_s_enabled,
-                        lambda stop: actions.run_spam(settings.key_spam_s, "s", stop)))
-    hk.define(HotkeyDef("ASpam", settings.key_spam_a, settings.is_spam_a_enabled,
-                        lambda stop: actions.run_spam(settings.key_spam_a, "a", stop)))
-
-    hk.define(HotkeyDef("ClickSeq1", settings.key_click1, settings.is_click1_enabled,
-                        lambda stop: actions.run_click(settings.key_click1, settings.click_btn1,
-                                                       settings.click1_hold_ms, settings.click1_gap_ms, stop)))
-    hk.define(HotkeyDef("ClickSeq2", settings.key_click2, settings.is_click2_enabled,
-                        lambda stop: actions.run_click(settings.key_click2, settings.click_btn2,
-                                                       settings.click2_hold_ms, settings.click2_gap_ms, stop)))
-    hk.define(HotkeyDef("ClickSeq3", settings.key_click3, settings.is_click3_enabled,
-                        lambda stop: actions.run_click(settings.key_click3, settings.click_btn3,
-                                                       settings.click3_hold_ms, settings.click3_gap_ms, stop)))
-
-    hk.define(HotkeyDef("Jitter", settings.key_jitter, settings.is_jitter_enabled,
-                        lambda stop: actions.run_jitter(settings.key_jitter, stop)))
+    actions.define_hotkeys()
 
     hk.start()
 
     root, ui = _init_ui(settings, store, hk, actions, log)
-    _install_foreground_hook(root, ui, log, hk, settings)
+    _install_foreground_hook(root, ui, log, hk, settings, ctx)
 
     tray = pystray.Icon(
         APP_TITLE,
@@ -121,19 +129,32 @@ def main() -> None:
 
     root.protocol("WM_DELETE_WINDOW", partial(_close_ui, root))
     tray.run_detached()
-    root.after(200, lambda: _cursor_lock_tick(root, settings))
+    _ensure_cursor_tick(root, settings, ctx)
     root.mainloop()
 
 
-def _is_context_enabled(settings: Settings) -> bool:
-    return settings.is_global_hotkeys or winapi.is_foreground_exe("nikke.exe")
+def _init_wait_profile(store: ConfigStore, settings: Settings, log: Logger) -> None:
+    profile = store.load_wait_profile(WaitProfile())
+    if profile.is_calibrated and not settings.is_wait_recalibrate:
+        set_wait_profile(profile)
+        log.event("SYS", "WaitProfile", "load",
+                  f"long={profile.long_ms}@{profile.long_above_ms} mid={profile.mid_ms}@{profile.mid_above_ms}")
+        return
 
+    def run():
+        try:
+            p = calibrate_wait_profile(p99_bound_ms=settings.wait_p99_bound_ms)
+            set_wait_profile(p)
+            store.save_wait_profile(p)
+            if settings.is_wait_recalibrate:
+                settings.is_wait_recalibrate = False
+                store.save(settings)
+            log.event("SYS", "WaitProfile", "calibrate",
+                      f"long={p.long_ms}@{p.long_above_ms} mid={p.mid_ms}@{p.mid_above_ms} spinP99={p.spin_p99_ms}")
+        except Exception as exc:
+            log.event("SYS", "WaitProfile", "calibrateFail", f"err={exc}")
 
-def _context_info(settings: Settings) -> str:
-    fg = 1 if winapi.is_foreground_exe("nikke.exe") else 0
-    g = 1 if settings.is_global_hotkeys else 0
-    exe = winapi.get_foreground_exe_name() or "-"
-    return f"global={g} fg={fg} exe={exe}"
+    threading.Thread(target=run, daemon=True).start()
 
 
 def _init_ui(settings: Settings, store: ConfigStore, hk: HotkeyManager, actions: Actions, log: Logger) -> tuple[tk.Tk, AppUI]:
@@ -150,9 +171,10 @@ def _init_ui(settings: Settings, store: ConfigStore, hk: HotkeyManager, actions:
         raise
 
 
-def _install_foreground_hook(root: tk.Tk, ui: AppUI, log: Logger, hk: HotkeyManager, settings: Settings) -> None:
+def _install_foreground_hook(root: tk.Tk, ui: AppUI, log: Logger, hk: HotkeyManager, settings: Settings,
+                             ctx: ForegroundContext) -> None:
     state = {"last": None}
-    _install_foreground_pending(root, ui, log, hk, settings)
+    _install_foreground_pending(root, ui, log, hk, settings, ctx)
 
     def on_foreground(hook, event, hwnd, obj_id, child_id, thread_id, time_ms):
         try:
@@ -165,6 +187,9 @@ def _install_foreground_hook(root: tk.Tk, ui: AppUI, log: Logger, hk: HotkeyMana
             if state["last"] != current:
                 state["last"] = current
                 is_primary = 1 if winapi.is_window_on_primary_monitor(hwnd) else 0
+                ctx.update(hwnd, exe, bool(is_primary))
+                if fg:
+                    _refresh_layout(hwnd)
                 _queue_foreground_update(fg, exe, hwnd, is_primary, 1 if settings.is_global_hotkeys else 0)
         except Exception as exc:
             log.event("SYS", "ForegroundHook", "error", f"err={exc}")
@@ -175,14 +200,35 @@ def _install_foreground_hook(root: tk.Tk, ui: AppUI, log: Logger, hk: HotkeyMana
         log.event("SYS", "ForegroundHook", "initFail", f"err={err}")
     else:
         log.event("SYS", "ForegroundHook", "init", "ok=1")
+        ctx.is_tracking = True
     setattr(root, "_fg_hook", hook)
     setattr(root, "_fg_proc", proc)
     hwnd = winapi.get_foreground_hwnd()
     on_foreground(0, 0, hwnd, 0, 0, 0, 0)
 
 
-def _cursor_lock_tick(root: tk.Tk, settings: Settings) -> None:
-    if settings.is_cursor_lock and winapi.is_foreground_exe("nikke.exe"):
+def _ensure_cursor_tick(root: tk.Tk, settings: Settings, ctx: ForegroundContext) -> None:
+    if not _app_state["cursor_tick"] and ctx.is_foreground():
+        _app_state["cursor_tick"] = True
+        root.after(0, lambda: _cursor_lock_tick(root, settings, ctx))
+
+
+def _refresh_layout(hwnd: int) -> None:
+    # Keyboard payloads carry scan codes, so they follow the game's input layout.
+    if winapi.refresh_keyboard_layout(hwnd):
+        log: Logger | None = _app_state.get("log")
+        if log:
+            log.event("SYS", "SendInput", "layout", f"hkl={winapi.get_keyboard_layout(hwnd):#x}")
+
+
+def _cursor_lock_tick(root: tk.Tk, settings: Settings, ctx: ForegroundContext) -> None:
+    if not ctx.is_foreground():
+        # Game left the foreground: release once and stop ticking; the foreground event restarts it.
+        winapi.clip_cursor(None)
+        _app_state["cursor_tick"] = False
+        return
+    _refresh_layout(winapi.get_foreground_hwnd())
+    if settings.is_cursor_lock:
         rect = winapi.get_client_rect_screen(winapi.get_foreground_hwnd())
         if rect and rect.width > 0 and rect.height > 0:
             winapi.clip_cursor(rect)
@@ -190,7 +236,7 @@ def _cursor_lock_tick(root: tk.Tk, settings: Settings) -> None:
             winapi.clip_cursor(None)
     else:
         winapi.clip_cursor(None)
-    root.after(200, lambda: _cursor_lock_tick(root, settings))
+    root.after(200, lambda: _cursor_lock_tick(root, settings, ctx))
 
 
 def _show_ui(root: tk.Tk) -> None:
@@ -239,7 +285,40 @@ def _shutdown_app(root: tk.Tk, reason: str, icon=None) -> None:
         if hk:
             if log:
                 log.event("SYS", "App", "shutdown", "step=hotkeys_stop")
+                hs = hk.hook_stats()
+                if hs:
+                    cost = hs["cost_ns"]
+                    log.event("SYS", "Hook", "stats",
+                              f"seen={hs['seen']} blocked={hs['blocked']} passed={hs['passed']} "
+                              f"injected={hs['injected']} fast={hs['fast_passed']} "
+                              f"p50={cost['p50'] // 1000}us p99={cost['p99'] // 1000}us max={cost['max'] // 1000}us")
             hk.stop()
+            for hid, st in hk.cadence_stats().items():
+                if log and st["steps"]:
+                    log.event("HK", hid, "cadence",
+                              f"steps={st['steps']} ratio={st['period_ratio']:.4f} late={st['late']} skipped={st['skipped']}")
+            if log:
+                ev = hk.event_stats()
+                lat = ev["hook_latency_us"]
+                log.event("HK", "-", "events",
+                          f"pushed={ev['pushed']} dropped={ev['dropped']} wakeups={ev['wakeups']} "
+                          f"lat_p50={lat['p50']}us lat_p99={lat['p99']}us")
+                out = hk.output.stats()
+                log.event("HK", "-", "output",
+                          f"events={out['events']} calls={out['calls']} saved={out['calls_saved']} "
+                          f"deduped={out['deduped']} conflicts={out['conflicts']} max_batch={out['max_batch']} "
+                          f"throttled={out['throttle_delayed']}/{out['throttle_dropped']}")
+            trace: TraceWriter | None = _app_state.get("trace")
+            if trace:
+                hk.set_trace(None)
+                trace.close()
+                if log:
+                    st = trace.stats()
+                    log.event("SYS", "Trace", "close", f"written={st['written']} dropped={st['dropped']}")
+        ctx: ForegroundContext | None = _app_state.get("ctx")
+        if ctx and log:
+            log.event("SYS", "Context", "stats",
+                      f"avoided={ctx.queries_avoided} win32={ctx.win32_queries}")
         fg_hook = getattr(root, "_fg_hook", None)
         if fg_hook:
             if log:
@@ -260,8 +339,9 @@ def _shutdown_app(root: tk.Tk, reason: str, icon=None) -> None:
             log.event("SYS", "App", "shutdownFail", f"err={exc}")
 
 
-def _install_foreground_pending(root: tk.Tk, ui: AppUI, log: Logger, hk: HotkeyManager, settings: Settings) -> None:
-    global _fg_ui, _fg_log
+def _install_foreground_pending(root: tk.Tk, ui: AppUI, log: Logger, hk: HotkeyManager, settings: Settings,
+                                ctx: ForegroundContext) -> None:
+    global _fg_ui, _fg_log, _fg_drain
     _fg_ui = ui
     _fg_log = log
 
@@ -278,13 +358,13 @@ def _install_foreground_pending(root: tk.Tk, ui: AppUI, log: Logger, hk: HotkeyM
                 suppress = 1 if (is_global or (fg == 1 and is_primary == 1)) else 0
                 hk.set_key_blocking(bool(suppress))
                 _fg_ui.set_game_state(fg, exe)
+                _ensure_cursor_tick(root, settings, ctx)
         except Exception as exc:
             if _fg_log:
                 _fg_log.event("SYS", "ForegroundHook", "pendingError", f"err={exc}")
-        finally:
-            root.after(500, _drain_queue)
 
-    root.after(500, _drain_queue)
+    # Drained when an update is queued, not on a timer, so a background app wakes for nothing.
+    _fg_drain = lambda: root.after_idle(_drain_queue)
 
 
 def _queue_foreground_update(fg: int, exe: str, hwnd: int, is_primary: int, is_global: int) -> None:
@@ -292,6 +372,8 @@ def _queue_foreground_update(fg: int, exe: str, hwnd: int, is_primary: int, is_g
     _fg_pending["exe"] = exe
     _fg_pending["hwnd"] = hwnd
     _fg_queue.put((fg, exe, hwnd, is_primary, is_global))
+    if _fg_drain:
+        _fg_drain()
 
 
 def _install_exception_logging(log: Logger) -> None:
@@ -0,0 +1,37 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from lib.backend import SimBackend, set_backend  # noqa: E402
+from lib.config import Settings  # noqa: E402
+from lib.sim import Simulation  # noqa: E402
+
+
+@pytest.fixture
+def backend():
+    # Virtual clock off zero: a zero timestamp reads as "not stamped" in TimingStats.
+    b = SimBackend(start_ns=1_000_000)
+    prev = set_backend(b)
+    yield b
+    set_backend(prev)
+
+
+@pytest.fixture
+def make_sim():
+    sims = []
+
+    def make(settings: Settings | None = None, **kw) -> Simulation:
+        sim = Simulation(settings, **kw)
+        sims.append(sim)
+        return sim
+
+    yield make
+    for sim in reversed(sims):
+        sim.close()
+
+
+def pytest_configure(config):
+    config.addinivalue_line("markers", "slow: long-running soak tests (deselect with -m 'not slow')")
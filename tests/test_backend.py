@@ -0,0 +1,61 @@
+from __future__ import annotations
+
+import threading
+
+import pytest
+
+from lib.backend import Backend, DryRunBackend, SimBackend, WinBackend
+
+
+def test_incomplete_backend_fails_at_construction():
+    class NoHooks(Backend):
+        def now_ns(self) -> int:
+            return 0
+
+    with pytest.raises(TypeError, match="start_hooks"):
+        NoHooks()
+
+
+@pytest.mark.parametrize("cls", [WinBackend, SimBackend, DryRunBackend])
+def test_shipped_backends_are_complete(cls):
+    assert issubclass(cls, Backend)
+    assert not cls.__abstractmethods__
+
+
+def test_release_stops_spam_at_the_release_time(make_sim):
+    sim = make_sim()
+    s = sim.settings
+    sim.key(s.key_spam_d, True)
+    sim.run_for(500)
+    released_ns = sim.now_ns
+    sim.key(s.key_spam_d, False)
+    sim.run_for(500)
+    taps = sim.outputs("tap", "d")
+    assert len(taps) > 5
+    assert taps[-1] <= released_ns
+
+
+def test_release_mid_hold_lifts_the_button_at_once(make_sim):
+    sim = make_sim()
+    s = sim.settings
+    sim.key(s.key_click1, True)
+    sim.run_for(s.click1_hold_ms // 2)
+    released_ns = sim.now_ns
+    sim.key(s.key_click1, False)
+    sim.run_for(1000)
+    assert sim.outputs("down", s.click_btn1) == [released_ns - s.click1_hold_ms // 2 * 1_000_000]
+    assert sim.outputs("up", s.click_btn1) == [released_ns]
+
+
+def test_simulation_starts_no_threads(make_sim):
+    before = threading.active_count()
+    sim = make_sim()
+    s = sim.settings
+    for name in (s.key_spam_d, s.key_spam_s, s.key_click1, s.key_jitter):
+        sim.key(name, True)
+    sim.run_for(2000)
+    assert threading.active_count() == before
+    for name in (s.key_spam_d, s.key_spam_s, s.key_click1, s.key_jitter):
+        sim.key(name, False)
+    sim.run_for(100)
+    assert threading.active_count() == before
@@ -0,0 +1,97 @@
+from __future__ import annotations
+
+import pytest
+
+from lib.config import Settings
+from lib.sim import Simulation
+from lib.timing import Cadence, CadenceStats
+
+MS = 1_000_000
+PERIOD_MS = 10
+
+
+def _drive(mode: str, n: int, late_ns, t0: int = 1_000 * MS) -> tuple[Cadence, list[int], list[int]]:
+    """Virtual-clock driver: each step wakes late_ns(k) after its deadline."""
+    cad = Cadence(mode, CadenceStats())
+    now = t0
+    marks: list[int] = []
+    deadlines: list[int] = []
+    for k in range(n):
+        cad.mark(now)
+        marks.append(now)
+        deadline = cad.next_deadline(PERIOD_MS, now)
+        deadlines.append(deadline)
+        now = max(now, deadline) + late_ns(k)
+    return cad, marks, deadlines
+
+
+@pytest.mark.parametrize("mode", ["skip", "catchup"])
+def test_absolute_modes_do_not_drift(mode):
+    n = 1_000
+    cad, marks, deadlines = _drive(mode, n, lambda k: 300_000)
+    t0 = marks[0]
+    # Constant wake-up lateness never accumulates: step k runs at t0 + k*P + late.
+    assert deadlines == [t0 + (k + 1) * PERIOD_MS * MS for k in range(n)]
+    assert marks[-1] - t0 == (n - 1) * PERIOD_MS * MS + 300_000
+    assert cad.stats.late == 0
+    assert cad.stats.skipped == 0
+
+
+def test_relative_mode_accumulates_lateness():
+    n = 1_000
+    _, marks, _ = _drive("relative", n, lambda k: 300_000)
+    assert marks[-1] - marks[0] == (n - 1) * (PERIOD_MS * MS + 300_000)
+
+
+def _overrun(k: int) -> int:
+    # Step 5 overruns by 3.5 periods; every other step wakes on time.
+    return 35 * MS if k == 5 else 0
+
+
+def test_catchup_fires_backlog_then_returns_to_grid():
+    cad, marks, deadlines = _drive("catchup", 20, _overrun)
+    t0 = marks[0]
+    assert deadlines == [t0 + (k + 1) * PERIOD_MS * MS for k in range(20)]
+    late_at = t0 + 6 * PERIOD_MS * MS + 35 * MS
+    # The three missed deadlines fire back to back at the late wake-up time.
+    assert marks[6:10] == [late_at] * 4
+    assert marks[10] == t0 + 10 * PERIOD_MS * MS
+    assert cad.stats.late == 3
+    assert cad.stats.skipped == 0
+
+
+def test_skip_drops_backlog_and_reanchors():
+    cad, marks, deadlines = _drive("skip", 20, _overrun)
+    t0 = marks[0]
+    late_at = t0 + 6 * PERIOD_MS * MS + 35 * MS
+    # The overdue step fires once at the late wake-up; the rest of the backlog is
+    # dropped and the timeline restarts from there at the normal period.
+    assert marks[6:8] == [late_at] * 2
+    assert [b - a for a, b in zip(marks[7:], marks[8:])] == [PERIOD_MS * MS] * 12
+    assert cad.stats.late == 1
+    assert cad.stats.skipped == 1
+    assert cad.stats.steps == 19
+
+
+def test_relative_shifts_after_overrun():
+    cad, marks, _ = _drive("relative", 20, _overrun)
+    assert [b - a for a, b in zip(marks, marks[1:])] == [PERIOD_MS * MS] * 5 + [45 * MS] + [PERIOD_MS * MS] * 13
+    assert cad.stats.late == 0
+
+
+def test_unknown_mode_falls_back_to_skip():
+    assert Cadence("bogus", CadenceStats()).mode == "skip"
+
+
+@pytest.mark.parametrize("cadence", ["skip", "catchup", "relative"])
+def test_spam_has_no_drift_on_the_sim_clock(cadence):
+    s = Settings()
+    sim = Simulation(s, cadence=cadence)
+    try:
+        sim.run_for(10)
+        sim.hold(s.key_spam_d, 10_000)
+        iv = sim.intervals_ms("tap", "d")
+        assert iv and all(v == s.key_spam_delay_ms for v in iv)
+        assert len(iv) == 10_000 // s.key_spam_delay_ms
+    finally:
+        sim.close()
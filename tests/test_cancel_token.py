@@ -0,0 +1,35 @@
+from __future__ import annotations
+
+import threading
+
+from lib.timing import CancelToken
+
+
+def test_set_fires_callbacks_once(backend):
+    token = CancelToken("A")
+    calls = []
+    token.add_callback(lambda: calls.append(backend.now_ns()))
+    first = backend.now
+    token.set()
+    backend.advance(1_000)
+    token.set()
+    assert calls == [first]
+    assert token.cancelled_ns == first
+
+
+def test_concurrent_sets_fire_callbacks_once(backend):
+    token = CancelToken("A")
+    calls = []
+    token.add_callback(lambda: calls.append(1))
+    start = threading.Barrier(8)
+
+    def cancel() -> None:
+        start.wait()
+        token.set()
+
+    threads = [threading.Thread(target=cancel) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert calls == [1]
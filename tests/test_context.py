@@ -0,0 +1,30 @@
+from __future__ import annotations
+
+from lib.backend import SimBackend
+from lib.config import Settings
+from lib.context import ForegroundContext
+
+
+def _context(is_global: bool) -> ForegroundContext:
+    s = Settings()
+    s.is_global_hotkeys = is_global
+    return ForegroundContext(s, backend=SimBackend())
+
+
+def test_global_hotkeys_do_not_count_as_avoided_queries():
+    ctx = _context(True)
+    for _ in range(5):
+        assert ctx.is_enabled()
+    assert ctx.stats() == {"queries_avoided": 0, "win32_queries": 0}
+
+
+def test_cached_snapshot_counts_as_avoided_query():
+    ctx = _context(False)
+    assert ctx.is_enabled()
+    ctx.update(1, "nikke.exe", True)
+    ctx.is_tracking = True
+    for _ in range(3):
+        assert ctx.is_enabled()
+    ctx.update(2, "explorer.exe", True)
+    assert not ctx.is_enabled()
+    assert ctx.stats() == {"queries_avoided": 4, "win32_queries": 1}
@@ -0,0 +1,81 @@
+from __future__ import annotations
+
+from lib.config import Settings
+from lib.keys import vk_of
+
+
+def test_binding_mode_passes_both_directions(make_sim):
+    sim = make_sim()
+    key = sim.settings.key_spam_d
+    sim.hk.set_key_blocking(True)
+    # Outside binding mode a bound key is suppressed both ways.
+    assert sim.key(key, True)
+    assert sim.key(key, False)
+    before = len(sim.outputs())
+    names = []
+    sim.hk.set_binding_callback(names.append)
+    assert not sim.key(key, True)
+    assert not sim.key(key, False)
+    assert len(names) == 1
+    assert not sim.hk._down[vk_of(key)]
+    # Binding mode starts no macro.
+    assert len(sim.outputs()) == before
+
+
+def _no_clicks(**kw) -> Settings:
+    s = Settings()
+    s.is_click1_enabled = s.is_click2_enabled = s.is_click3_enabled = False
+    for k, v in kw.items():
+        setattr(s, k, v)
+    return s
+
+
+def test_leaving_the_game_unhooks_and_coming_back_rehooks(make_sim):
+    sim = make_sim()
+    s = sim.settings
+    assert (sim.backend.is_keyboard_hooked, sim.backend.is_mouse_hooked) == (True, True)
+    sim.key(s.key_spam_d, True)
+    sim.set_foreground("explorer.exe")
+    assert sim.hk.is_idle
+    assert (sim.backend.is_keyboard_hooked, sim.backend.is_mouse_hooked) == (False, False)
+    # The release is never seen while unhooked, so the key must not stay down.
+    assert not sim.key(s.key_spam_d, False)
+    assert not any(sim.hk._down)
+    count = len(sim.events)
+    assert not sim.key(s.key_spam_s, True)
+    sim.run_for(500)
+    assert len(sim.events) == count
+    sim.key(s.key_spam_s, False)
+
+    sim.set_foreground("nikke.exe")
+    assert not sim.hk.is_idle
+    assert (sim.backend.is_keyboard_hooked, sim.backend.is_mouse_hooked) == (True, True)
+    sim.hold(s.key_spam_s, 200)
+    assert sim.outputs("tap", "s")
+
+
+def test_mouse_hook_follows_bindings(make_sim):
+    sim = make_sim(_no_clicks())
+    assert (sim.backend.is_keyboard_hooked, sim.backend.is_mouse_hooked) == (True, False)
+    sim = make_sim(_no_clicks(key_spam_d="x1"))
+    assert (sim.backend.is_keyboard_hooked, sim.backend.is_mouse_hooked) == (True, True)
+    sim.mouse("x1", True)
+    sim.run_for(200)
+    sim.mouse("x1", False)
+    assert sim.outputs("tap", "d")
+
+
+def test_binding_mode_hooks_everything_even_when_idle(make_sim):
+    sim = make_sim(_no_clicks())
+    sim.set_foreground("explorer.exe")
+    assert sim.hk.is_idle
+    names = []
+    sim.hk.set_binding_callback(names.append)
+    assert not sim.hk.is_idle
+    assert (sim.backend.is_keyboard_hooked, sim.backend.is_mouse_hooked) == (True, True)
+    sim.mouse("x1", True)
+    sim.mouse("x1", False)
+    assert names == ["x1"]
+    sim.hk.set_binding_callback(None)
+    assert sim.hk.is_idle
+    assert (sim.backend.is_keyboard_hooked, sim.backend.is_mouse_hooked) == (False, False)
@@ -0,0 +1,99 @@
+from __future__ import annotations
+
+import pytest
+
+from lib.actions import _JITTER_TABLE_SIZE, _build_jitter_table
+from lib.config import Settings
+
+
+def _settings(**kw) -> Settings:
+    s = Settings()
+    for k, v in kw.items():
+        setattr(s, k, v)
+    return s
+
+
+def _taps(sim) -> list[str]:
+    return [name for _, kind, name in sim.events if kind == "tap"]
+
+
+def test_cycle_keeps_the_enabled_keys_in_order():
+    s = _settings(jitter_x=False, key_spam_delay_ms=30)
+    assert _build_jitter_table(s) == (("z", 30), ("c", 30), ("v", 30), ("b", 30))
+
+
+@pytest.mark.parametrize("trial", range(50))
+def test_shuffle_never_repeats_a_key_across_cycles(trial):
+    table = _build_jitter_table(_settings(jitter_order="shuffle"))
+    keys = [k for k, _ in table]
+    assert len(keys) >= _JITTER_TABLE_SIZE
+    for start in range(0, len(keys), 5):
+        assert sorted(keys[start:start + 5]) == ["b", "c", "v", "x", "z"]
+    # The table loops, so the wrap from last to first counts as a boundary too.
+    assert all(a != b for a, b in zip(keys, keys[1:] + keys[:1]))
+
+
+def test_shuffle_with_one_key_is_that_key():
+    s = _settings(jitter_order="shuffle", jitter_x=False, jitter_c=False, jitter_v=False, jitter_b=False)
+    assert [k for k, _ in _build_jitter_table(s)] == ["z"]
+
+
+def test_weighted_skips_zero_weights():
+    table = _build_jitter_table(_settings(jitter_order="weighted", jitter_weights="z=3, x=0 c=0,v=0 b=1"))
+    keys = [k for k, _ in table]
+    assert len(keys) == _JITTER_TABLE_SIZE
+    assert set(keys) == {"z", "b"}
+    assert keys.count("z") > keys.count("b")
+
+
+def test_weighted_with_every_weight_zero_is_empty():
+    table = _build_jitter_table(_settings(jitter_order="weighted", jitter_weights="z=0 x=0 c=0 v=0 b=0"))
+    assert table == ()
+
+
+def test_per_key_delays_fall_back_to_the_spam_delay():
+    s = _settings(jitter_delays_ms="z=15, c=40 bogus q=x", key_spam_delay_ms=25)
+    assert dict(_build_jitter_table(s)) == {"z": 15, "x": 25, "c": 40, "v": 25, "b": 25}
+
+
+def test_jitter_run_follows_per_key_delays(make_sim):
+    sim = make_sim(_settings(jitter_x=False, jitter_v=False, jitter_b=False, jitter_delays_ms="z=10 c=30"))
+    sim.hold(sim.settings.key_jitter, 200)
+    taps = sim.outputs("tap")
+    gaps = [(b - a) / 1e6 for a, b in zip(taps, taps[1:])]
+    assert _taps(sim)[:4] == ["z", "c", "z", "c"]
+    assert gaps[:4] == pytest.approx([10, 30, 10, 30], abs=1)
+
+
+def test_table_swap_mid_run_restarts_the_new_pattern(make_sim):
+    sim = make_sim(_settings(key_spam_delay_ms=20))
+    s = sim.settings
+    sim.key(s.key_jitter, True)
+    sim.run_for(50)
+    before = len(_taps(sim))
+    s.jitter_z = s.jitter_x = s.jitter_c = False
+    sim.actions.update_jitter()
+    sim.run_for(200)
+    sim.key(s.key_jitter, False)
+    after = _taps(sim)[before:]
+    assert after[:4] == ["v", "b", "v", "b"]
+    assert set(after) == {"v", "b"}
+
+
+def test_empty_table_mid_run_ends_the_run(make_sim):
+    sim = make_sim(_settings(key_spam_delay_ms=20))
+    s = sim.settings
+    sim.key(s.key_jitter, True)
+    sim.run_for(50)
+    s.jitter_z = s.jitter_x = s.jitter_c = s.jitter_v = s.jitter_b = False
+    sim.actions.update_jitter()
+    sim.run_for(30)
+    count = len(_taps(sim))
+    sim.run_for(200)
+    assert len(_taps(sim)) == count
+
+
+def test_empty_table_blocks_start(make_sim):
+    sim = make_sim(_settings(jitter_z=False, jitter_x=False, jitter_c=False, jitter_v=False, jitter_b=False))
+    sim.hold(sim.settings.key_jitter, 200)
+    assert _taps(sim) == []
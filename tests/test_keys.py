@@ -0,0 +1,54 @@
+from __future__ import annotations
+
+from lib.keys import (
+    KEY_TABLE, KEY_TABLE_SIZE, MOUSE_NAME_MAP, is_mouse_id, key_ids, key_info, mouse_id, name_of, vk_of, vk_to_name,
+)
+
+
+def test_key_table_covers_every_vk():
+    assert len(KEY_TABLE) == 0x100
+    assert [info.vk for info in KEY_TABLE] == list(range(0x100))
+
+
+def test_vk_name_round_trip():
+    names = set()
+    for vk in range(1, 0x100):
+        info = KEY_TABLE[vk]
+        assert info.name not in names, info
+        names.add(info.name)
+        assert vk_to_name(vk) == info.name
+        assert name_of(vk) == info.name
+        assert key_info(info.name) is info
+        assert key_info(info.name.upper()) is info
+        assert vk_of(info.name) == vk
+        assert key_info(f"vk_{vk:02x}") is info
+
+
+def test_key_ids_index_the_pressed_table():
+    for vk in range(1, 0x100):
+        ids = key_ids(KEY_TABLE[vk].name)
+        assert vk in ids
+        assert all(0 <= kid < KEY_TABLE_SIZE for kid in ids)
+
+
+def test_mouse_round_trip():
+    for kid, name in MOUSE_NAME_MAP.items():
+        assert is_mouse_id(kid)
+        assert mouse_id(name) == kid
+        assert name_of(kid) == name
+        assert kid in key_ids(name)
+        assert kid < KEY_TABLE_SIZE
+
+
+def test_aliases_and_generic_modifiers():
+    assert key_info("escape") is key_info("esc")
+    assert key_info("lwin") is key_info("lcmd")
+    assert key_info("rwin") is key_info("rcmd")
+    assert set(key_ids("shift")) >= {vk_of("shift"), vk_of("lshift"), vk_of("rshift")}
+
+
+def test_unknown_names_are_interned_in_range():
+    kid = key_ids("no-such-key-xyz")[0]
+    assert 0x100 < kid < KEY_TABLE_SIZE
+    assert name_of(kid) == "no-such-key-xyz"
+    assert key_ids("no-such-key-xyz") == (kid,)
@@ -0,0 +1,110 @@
+from __future__ import annotations
+
+import pytest
+
+from lib.macro import OP_LOOP, OP_SET, compile_macro
+
+
+class RecordingOut:
+    """Stands in for OutputArbiter; records (action, name) in call order."""
+
+    def __init__(self) -> None:
+        self.calls: list[tuple[str, str]] = []
+
+    def tap(self, owner: str, name: str) -> None:
+        self.calls.append(("tap", name))
+
+    def press(self, owner: str, name: str) -> None:
+        self.calls.append(("press", name))
+
+    def release(self, owner: str, name: str) -> None:
+        self.calls.append(("release", name))
+
+    def down(self, owner: str, btn_name: str) -> int:
+        self.calls.append(("down", btn_name))
+        return 0
+
+    def up(self, owner: str, btn_name: str, is_forced: bool = False) -> None:
+        self.calls.append(("up", btn_name))
+
+
+def _run(source: str, max_waits: int = 100) -> tuple[list[tuple[str, str]], list[float]]:
+    out = RecordingOut()
+    waits = []
+    steps = compile_macro(source).steps(out, "Macro:t")
+    for delay in steps:
+        waits.append(delay)
+        if len(waits) >= max_waits:
+            break
+    steps.close()
+    return out.calls, waits
+
+
+@pytest.mark.parametrize("source, message", [
+    ("tap notakey", "unknown key: notakey"),
+    ("press middle", "unknown key: middle"),
+    ("click z", "unknown button: z"),
+    ("jump 5", "unknown statement: jump"),
+    ("loop { tap z; wait 5", "missing '}'"),
+    ("tap z }", "unexpected '}'"),
+    ("loop { tap z }", "loop without wait"),
+    ("wait abc", "bad delay: abc"),
+    ("wait -5", "bad delay: -5"),
+    ("wait 3600001", "bad delay: 3600001"),
+    ("repeat x { tap z }", "bad count: x"),
+    ("repeat 2 tap z", "expected '{'"),
+    ("tap", "tap: missing argument"),
+    ("; \n ;", "empty macro"),
+])
+def test_compile_errors(source, message):
+    with pytest.raises(ValueError, match=message):
+        compile_macro(source)
+
+
+def test_nested_repeat():
+    calls, waits = _run("repeat 2 { repeat 3 { tap z }; tap x; wait 5 }")
+    assert calls == [("tap", "z")] * 3 + [("tap", "x")] + [("tap", "z")] * 3 + [("tap", "x")]
+    assert waits == [5.0, 5.0]
+
+
+def test_repeat_zero_is_removed():
+    prog = compile_macro("repeat 0 { tap z; wait 5 }; tap x")
+    ops = prog.code[::3].tolist()
+    assert OP_SET not in ops and OP_LOOP not in ops
+    calls, waits = _run("repeat 0 { tap z; wait 5 }; tap x")
+    assert calls == [("tap", "x")]
+    assert waits == []
+
+
+def test_loop_runs_until_closed():
+    calls, waits = _run("loop { tap z; wait 2.5 }", max_waits=4)
+    assert calls == [("tap", "z")] * 4
+    assert waits == [2.5] * 4
+
+
+def test_click_with_hold():
+    calls, waits = _run("click lbutton 20; wait 10")
+    assert calls == [("down", "LButton"), ("up", "LButton")]
+    assert waits == [20.0, 10.0]
+
+
+def test_outputs_lists_every_name_once():
+    prog = compile_macro("tap z; tap Z; press lshift; click lbutton; release lshift; press rbutton; release rbutton")
+    assert prog.outputs() == (["z"], ["lshift"], ["LButton", "RButton"])
+
+
+def test_close_mid_run_releases_held_outputs():
+    out = RecordingOut()
+    steps = compile_macro("press lshift; press lbutton; tap a; wait 100; release lshift; release lbutton").steps(out, "m")
+    assert next(steps) == 100.0
+    steps.close()
+    assert out.calls[:3] == [("press", "lshift"), ("down", "LButton"), ("tap", "a")]
+    assert sorted(out.calls[3:]) == [("release", "lshift"), ("up", "LButton")]
+
+
+def test_released_outputs_are_not_released_again():
+    out = RecordingOut()
+    steps = compile_macro("press lshift; release lshift; wait 100; tap a").steps(out, "m")
+    next(steps)
+    steps.close()
+    assert out.calls == [("press", "lshift"), ("release", "lshift")]
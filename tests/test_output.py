@@ -0,0 +1,126 @@
+from __future__ import annotations
+
+from lib.config import Settings
+from lib.output import OutputArbiter
+
+
+def _sent(backend) -> list[tuple[str, str]]:
+    return [(kind, name) for _, kind, name in backend.events]
+
+
+def _record_batches(backend, monkeypatch) -> list[list[tuple[str, str]]]:
+    batches = []
+    send = backend.send_batch
+
+    def send_batch(events):
+        batches.append(list(events))
+        send(events)
+
+    monkeypatch.setattr(backend, "send_batch", send_batch)
+    return batches
+
+
+def test_other_owner_cannot_take_or_release_a_held_button(backend):
+    out = OutputArbiter()
+    out.down("A", "LButton")
+    out.down("B", "LButton")
+    out.up("B", "LButton")
+    assert out.owner_of("LButton") == "A"
+    out.up("A", "LButton")
+    out.down("B", "LButton")
+    assert _sent(backend) == [("down", "LButton"), ("up", "LButton"), ("down", "LButton")]
+    assert out.conflicts == 2
+    assert out.owner_of("LButton") == "B"
+
+
+def test_tap_of_a_key_held_by_another_owner_is_dropped(backend):
+    out = OutputArbiter()
+    out.press("A", "lshift")
+    out.tap("B", "lshift")
+    out.tap("A", "lshift")
+    assert _sent(backend) == [("press", "lshift")]
+    assert out.conflicts == 2
+
+
+def test_logical_state_dedup(backend):
+    out = OutputArbiter()
+    out.press("A", "lshift")
+    out.press("A", "lshift")
+    out.release("A", "lshift")
+    out.release("A", "lshift")
+    out.up("A", "LButton")
+    assert _sent(backend) == [("press", "lshift"), ("release", "lshift")]
+    assert out.deduped == 3
+
+
+def test_forced_release_passes_without_a_holder(backend):
+    out = OutputArbiter()
+    out.up("A", "RButton", is_forced=True)
+    assert _sent(backend) == [("up", "RButton")]
+    assert out.deduped == 0
+
+
+def test_batch_sends_once_at_the_outermost_exit(backend, monkeypatch):
+    batches = _record_batches(backend, monkeypatch)
+    out = OutputArbiter()
+    with out.batch():
+        out.tap("A", "d")
+        with out.batch():
+            out.tap("B", "s")
+        assert batches == []
+        out.down("C", "LButton")
+    assert batches == [[("tap", "d"), ("tap", "s"), ("down", "LButton")]]
+    stats = out.stats()
+    assert (stats["events"], stats["calls"], stats["calls_saved"], stats["max_batch"]) == (3, 1, 2, 3)
+
+
+def test_events_submitted_during_a_send_follow_in_one_batch(backend, monkeypatch):
+    out = OutputArbiter()
+    batches = []
+    send = backend.send_batch
+
+    def send_batch(events):
+        # Another macro submits while this call is in flight: it only queues.
+        if not batches:
+            out.tap("B", "s")
+            out.tap("C", "a")
+        batches.append(list(events))
+        send(events)
+
+    monkeypatch.setattr(backend, "send_batch", send_batch)
+    out.tap("A", "d")
+    assert batches == [[("tap", "d")], [("tap", "s"), ("tap", "a")]]
+    assert out.stats()["calls_saved"] == 1
+
+
+def test_two_click_macros_on_one_button_never_interleave(make_sim):
+    s = Settings()
+    s.click_btn1 = s.click_btn2 = "LButton"
+    sim = make_sim(s)
+    sim.key(s.key_click1, True)
+    sim.run_for(100)
+    sim.key(s.key_click2, True)
+    sim.run_for(3000)
+    sim.key(s.key_click1, False)
+    sim.run_for(1000)
+    sim.key(s.key_click2, False)
+    kinds = [k for _, k, n in sim.events if n == "LButton"]
+    assert len(kinds) > 20
+    assert kinds == ["down", "up"] * (len(kinds) // 2)
+    assert sim.hk.output.conflicts > 0
+
+
+def test_scheduler_tick_sends_one_batch(make_sim, monkeypatch):
+    sim = make_sim()
+    batches = _record_batches(sim.backend, monkeypatch)
+    s = sim.settings
+    sim.key(s.key_spam_d, True)
+    sim.key(s.key_spam_s, True)
+    sim.run_for(1000)
+    sim.key(s.key_spam_d, False)
+    sim.key(s.key_spam_s, False)
+    # The two first taps come from separate key events; after that both spams share every deadline.
+    assert [len(b) for b in batches[:2]] == [1, 1]
+    assert len(batches) > 20
+    assert all(sorted(b) == [("tap", "d"), ("tap", "s")] for b in batches[2:])
+    assert sim.hk.output.stats()["max_batch"] == 2
@@ -0,0 +1,70 @@
+from __future__ import annotations
+
+import pytest
+
+from lib.output import OutputArbiter
+from lib.stats import TimingStats
+
+
+def _arbiter(timing: TimingStats) -> OutputArbiter:
+    out = OutputArbiter()
+    out.timing = timing
+    return out
+
+
+def test_first_output_is_stamped_when_sent(backend):
+    timing = TimingStats(sample_every=1)
+    timing.register("A")
+    out = _arbiter(timing)
+    timing.mark_trigger("A", backend.now_ns(), hook_ns=backend.now_ns() - 300_000)
+    backend.advance(100_000)
+    with out.batch():
+        out.tap("A", "d")
+        # Accepted now, sent when the batch closes 2 ms later.
+        backend.advance(2_000_000)
+    ht = timing.get("A")
+    assert ht.first_output.count == 1
+    assert ht.first_output.snapshot()["max"] == pytest.approx(2100, rel=0.07)
+    assert ht.stages["send"].snapshot()["max"] == pytest.approx(2000, rel=0.07)
+    assert ht.stages["total"].snapshot()["max"] == pytest.approx(2400, rel=0.07)
+    sample = timing.samples[-1]
+    assert sample["send_ns"] - sample["accepted_ns"] == 2_000_000
+
+
+def test_stamps_follow_the_owner_not_the_sending_thread(backend):
+    timing = TimingStats()
+    timing.register("A")
+    timing.register("B")
+    out = _arbiter(timing)
+    timing.mark_trigger("A", backend.now_ns())
+    timing.mark_trigger("B", backend.now_ns())
+    backend.advance(1_000_000)
+    with out.batch():
+        out.tap("A", "d")
+        out.down("B", "LButton")
+        out.up("B", "LButton")
+        out.tap("A", "s")
+    a, b = timing.get("A"), timing.get("B")
+    assert (a.first_output.count, a.output_interval.count) == (1, 1)
+    # The release is not an output for timing purposes.
+    assert (b.first_output.count, b.output_interval.count) == (1, 0)
+
+
+def test_rejected_outputs_are_not_stamped(backend):
+    timing = TimingStats()
+    timing.register("A")
+    timing.register("B")
+    out = _arbiter(timing)
+    timing.mark_trigger("B", backend.now_ns())
+    backend.advance(1_000_000)
+    out.down("A", "LButton")
+    # B conflicts with A's hold: nothing is sent for B.
+    out.down("B", "LButton")
+    assert timing.get("B").first_output.count == 0
+    out.set_rate_limit(1, 0)
+    for _ in range(2):
+        out.up("A", "LButton")
+        out.down("A", "LButton")
+    # The bucket's one token went to the first click; the second down was held back.
+    assert out.throttle_delayed == 1
+    assert timing.get("A").output_interval.count == 1
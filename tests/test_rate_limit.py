@@ -0,0 +1,121 @@
+from __future__ import annotations
+
+from lib.config import Settings
+
+
+def _fast_click_settings(**kw) -> Settings:
+    # ClickSeq1 at 20 ms hold + 10 ms gap: ~33 clicks/s unlimited.
+    s = Settings()
+    s.is_click1_enabled = True
+    s.click1_hold_ms = 20
+    s.click1_gap_ms = 10
+    for k, v in kw.items():
+        setattr(s, k, v)
+    return s
+
+
+def test_unlimited_baseline(make_sim):
+    sim = make_sim(_fast_click_settings())
+    sim.hold(sim.settings.key_click1, 2000)
+    assert len(sim.outputs("down")) > 60
+    assert sim.hk.output.stats()["throttle_delayed"] == 0
+
+
+def test_global_limit_delay_mode(make_sim):
+    sim = make_sim(_fast_click_settings(rate_limit_cps=10))
+    sim.hold(sim.settings.key_click1, 2000)
+    downs = sim.outputs("down")
+    # One token up front, then 10/s over 2 s.
+    assert len(downs) == 21
+    assert min(sim.intervals_ms("down")) >= 100 - 1e-6
+    st = sim.hk.output.stats()
+    assert st["throttle_delayed"] > 0
+    assert st["throttle_dropped"] == 0
+    assert len(sim.outputs("up")) == len(downs)
+
+
+def test_global_limit_drop_mode(make_sim):
+    sim = make_sim(_fast_click_settings(rate_limit_cps=10, rate_limit_mode="drop"))
+    sim.hold(sim.settings.key_click1, 2000)
+    assert len(sim.outputs("down")) <= 21
+    assert min(sim.intervals_ms("down")) >= 100 - 1e-6
+    st = sim.hk.output.stats()
+    assert st["throttle_dropped"] > 0
+    assert st["throttle_delayed"] == 0
+    assert len(sim.outputs("up")) == len(sim.outputs("down"))
+
+
+def test_button_limit_with_burst(make_sim):
+    s = _fast_click_settings(rate_limit_button_cps=5, rate_limit_burst=3)
+    s.is_click1_enabled = False
+    s.macros = {"m": ("f", "loop { click lbutton 5; wait 5 }")}
+    sim = make_sim(s)
+    sim.hold("f", 2000)
+    iv = sim.intervals_ms("down", "LButton")
+    # The burst goes out at the macro's own pace, then one click per 200 ms.
+    assert iv[:2] == [10.0, 10.0]
+    assert all(v >= 200 - 1e-6 for v in iv[3:])
+    assert len(sim.outputs("down")) == 3 + 9
+
+
+def test_button_limit_is_per_button(make_sim):
+    s = _fast_click_settings(rate_limit_button_cps=5)
+    s.is_click1_enabled = False
+    s.macros = {
+        "l": ("f", "loop { click lbutton 5; wait 5 }"),
+        "r": ("g", "loop { click rbutton 5; wait 5 }"),
+    }
+    sim = make_sim(s)
+    sim.key("f", True)
+    sim.key("g", True)
+    sim.run_for(900)
+    sim.key("f", False)
+    sim.key("g", False)
+    left = len(sim.outputs("down", "LButton"))
+    right = len(sim.outputs("down", "RButton"))
+    # Each button gets its own 5/s budget.
+    assert left == right == 5
+
+
+def test_throttled_down_is_not_recorded(make_sim):
+    sim = make_sim(_fast_click_settings(rate_limit_cps=10))
+    # Off t=0: a zero timestamp reads as "not stamped" in TimingStats.
+    sim.run_for(10)
+    sim.hold(sim.settings.key_click1, 2000)
+    ht = sim.hk.timing.get("ClickSeq1")
+    assert ht.output_interval.count + ht.first_output.count == len(sim.outputs("down"))
+
+
+def test_reapplying_same_limit_keeps_buckets(make_sim):
+    sim = make_sim(_fast_click_settings(rate_limit_cps=10, rate_limit_burst=5))
+    key = sim.settings.key_click1
+    sim.key(key, True)
+    sim.run_for(1000)
+    before = len(sim.outputs("down"))
+    # A settings refresh mid-run must not hand out a fresh burst.
+    sim.actions.apply_rate_limit()
+    sim.run_for(200)
+    sim.key(key, False)
+    assert len(sim.outputs("down")) - before <= 2
+
+
+def test_throttled_macro_down_is_not_recorded(make_sim):
+    s = _fast_click_settings(rate_limit_cps=5)
+    s.is_click1_enabled = False
+    s.macros = {"m": ("f", "loop { press lbutton; wait 5; release lbutton; wait 5 }")}
+    sim = make_sim(s)
+    sim.run_for(10)
+    sim.hold("f", 1000)
+    ht = sim.hk.timing.get("Macro:m")
+    # One stamp per button down actually sent; releases are not stamped.
+    assert sim.hk.output.stats()["throttle_delayed"] > 0
+    assert ht.output_interval.count + ht.first_output.count == len(sim.outputs("down"))
+
+
+def test_dropped_click_release_is_not_deduped(make_sim):
+    sim = make_sim(_fast_click_settings(rate_limit_cps=10, rate_limit_mode="drop"))
+    sim.hold(sim.settings.key_click1, 2000)
+    st = sim.hk.output.stats()
+    assert st["throttle_dropped"] > 0
+    # At most the stop cleanup's release of an already released button, as without a limit.
+    assert st["deduped"] <= 1
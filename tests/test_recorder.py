@@ -0,0 +1,78 @@
+from __future__ import annotations
+
+import json
+import re
+
+import pytest
+
+from lib import dryrun
+from lib.ring import OutputRecorder
+from lib.stats import group_outputs, output_rates
+
+
+def test_capacity_rounds_up_to_a_power_of_two():
+    assert OutputRecorder(5).stats() == {"recorded": 0, "overwritten": 0, "capacity": 8}
+
+
+def test_wraparound_keeps_the_newest_records_oldest_first():
+    rec = OutputRecorder(4)
+    for i in range(10):
+        rec.record(i, "DSpam" if i % 2 else "SSpam", "tap", "d" if i % 2 else "s")
+    assert len(rec) == 4
+    assert rec.stats() == {"recorded": 10, "overwritten": 6, "capacity": 4}
+    assert rec.records() == [
+        (6, "SSpam", "tap", "s"),
+        (7, "DSpam", "tap", "d"),
+        (8, "SSpam", "tap", "s"),
+        (9, "DSpam", "tap", "d"),
+    ]
+    rec.clear()
+    assert rec.records() == []
+    rec.record(11, "ClickSeq1", "down", "LButton")
+    assert rec.records() == [(11, "ClickSeq1", "down", "LButton")]
+
+
+def test_rates_per_stream():
+    records = [(i * 10_000_000, "DSpam", "tap", "d") for i in range(11)]
+    records += [(i * 50_000_000, "ClickSeq1", "down", "LButton") for i in range(3)]
+    rates = output_rates(group_outputs(records), 100_000_000)
+    assert rates["DSpam tap d"]["count"] == 11
+    assert rates["DSpam tap d"]["per_s"] == 110.0
+    assert rates["DSpam tap d"]["interval_us"]["count"] == 10
+    assert rates["ClickSeq1 down LButton"]["per_s"] == 30.0
+    assert output_rates({"x": [1]}, 0)["x"]["per_s"] == 0.0
+
+
+def test_timing_dump_summarizes_recorded_outputs(make_sim, tmp_path):
+    sim = make_sim()
+    sim.hk.output.recorder = OutputRecorder(1 << 10)
+    sim.hold(sim.settings.key_spam_d, 1000)
+    path = sim.hk.dump_timing_stats(tmp_path / "timing.json")
+    data = json.loads(path.read_text(encoding="utf-8"))
+    st = data["_recorded"]["DSpam tap d"]
+    assert st["count"] == len(sim.outputs("tap", "d"))
+    assert st["per_s"] == pytest.approx(1000 / sim.settings.key_spam_delay_ms, rel=0.05)
+
+
+def test_dump_has_no_recorded_summary_without_records(make_sim, tmp_path):
+    sim = make_sim()
+    sim.hk.output.recorder = OutputRecorder(16)
+    data = json.loads(sim.hk.dump_timing_stats(tmp_path / "timing.json").read_text(encoding="utf-8"))
+    assert "_recorded" not in data
+
+
+def test_dryrun_reports_rates(capsys):
+    assert dryrun.main(["--seconds", "0.5", "--engine", "scheduler", "--hold", "F13"]) == 0
+    out = capsys.readouterr().out
+    assert "engine=scheduler" in out
+    m = re.search(r"^DSpam tap d: count=(\d+) rate=([\d.]+)/s$", out, re.M)
+    assert m, out
+    # 34 ms default spam delay: ~29/s, loose for a loaded CI machine.
+    assert 20 <= float(m.group(2)) <= 32
+    assert "interval ms:" in out
+    assert "overwritten" not in out
+
+
+def test_dryrun_warns_when_the_ring_overflows(capsys):
+    assert dryrun.main(["--seconds", "0.3", "--engine", "scheduler", "--hold", "F13", "--capacity", "4"]) == 0
+    assert re.search(r"^recorder: \d+ oldest records overwritten", capsys.readouterr().out, re.M)
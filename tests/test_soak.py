@@ -0,0 +1,59 @@
+from __future__ import annotations
+
+import threading
+import time
+import tracemalloc
+
+import pytest
+
+from lib.actions import Actions
+from lib.backend import DryRunBackend, set_backend
+from lib.config import Settings
+from lib.hotkeys import HotkeyManager
+from lib.keys import vk_of
+from lib.log import Logger
+
+
+@pytest.fixture
+def thread_engine():
+    backend = DryRunBackend()
+    prev = set_backend(backend)
+    settings = Settings()
+    hk = HotkeyManager(is_context_enabled=lambda: True, logger=Logger(None), engine="thread")
+    Actions(settings, hk).define_hotkeys()
+    hk.start()
+    yield backend, settings, hk
+    hk.stop()
+    set_backend(prev)
+
+
+def _cycle(backend: DryRunBackend, hk: HotkeyManager, kid: int) -> None:
+    # Press until the run's first tap is out, then release.
+    n = hk.output.events
+    backend.on_key(kid, True)
+    deadline = time.perf_counter() + 1.0
+    while hk.output.events == n and time.perf_counter() < deadline:
+        time.sleep(0)
+    backend.on_key(kid, False)
+
+
+@pytest.mark.slow
+def test_press_release_soak_keeps_threads_and_memory_flat(thread_engine):
+    backend, settings, hk = thread_engine
+    kid = vk_of(settings.key_spam_d)
+    for _ in range(200):
+        _cycle(backend, hk, kid)
+    threads = threading.active_count()
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        for _ in range(10_000):
+            _cycle(backend, hk, kid)
+        grown = tracemalloc.get_traced_memory()[0] - before
+    finally:
+        tracemalloc.stop()
+    assert threading.active_count() == threads
+    assert grown < 256 * 1024
+    # Every press started a run on the parked worker and reached its first output.
+    assert hk.output.events == 10_200
+    assert hk.timing.get("DSpam").first_output.count == 10_200
@@ -0,0 +1,115 @@
+from __future__ import annotations
+
+import pytest
+
+from lib.ring import OUTPUT_ACTIONS
+from lib.trace import (
+    RECORD_SIZE, STATE_BLOCKED, STATE_DOWN, TRACE_KEY, TRACE_MOUSE, TRACE_OUTPUT,
+    TraceReader, TraceRecord, TraceWriter,
+)
+from lib.keys import MOUSE_LEFT
+
+
+pytestmark = pytest.mark.usefixtures("backend")
+
+
+def _write_mixed(path, n: int, capacity: int = 1 << 15) -> tuple[TraceWriter, list[TraceRecord]]:
+    w = TraceWriter(path, capacity=capacity)
+    w.start()
+    expected = []
+    owners = ("DSpam", "ClickSeq1", "Macro:連發")
+    for i in range(n):
+        ts = 1_000 + i
+        if i % 3 == 2:
+            k = i // 3
+            owner = owners[k % len(owners)]
+            action = ("tap", "down", "up")[(k // len(owners)) % 3]
+            name = "d" if action == "tap" else "LButton"
+            w.record(ts, owner, action, name)
+            code = 0x44 if name == "d" else MOUSE_LEFT
+            expected.append(TraceRecord(TRACE_OUTPUT, 0, OUTPUT_ACTIONS.index(action), code, owner, 0, 0, ts))
+        elif i % 3 == 1:
+            w.hook(TRACE_MOUSE, MOUSE_LEFT, 0x01, True, False, 0x1_0000_0005, 0x0201, ts)
+            expected.append(TraceRecord(TRACE_MOUSE, 1, STATE_DOWN, MOUSE_LEFT, "", 5, 0x0201, ts))
+        else:
+            is_down = i % 2 == 0
+            w.hook(TRACE_KEY, 0x41, 0x90, is_down, True, i, 0x1E, ts)
+            state = (STATE_DOWN if is_down else 0) | STATE_BLOCKED
+            expected.append(TraceRecord(TRACE_KEY, 0x90, state, 0x41, "", i, 0x1E, ts))
+    w.close()
+    return w, expected
+
+
+def test_round_trip_records(tmp_path, backend):
+    path = tmp_path / "t.trace"
+    w, expected = _write_mixed(path, 30_000)
+    assert w.dropped == 0
+    with TraceReader(path) as r:
+        assert len(r) == len(expected)
+        assert r.start_ns == backend.now
+        assert set(r.names) == {"DSpam", "ClickSeq1", "Macro:連發"}
+        assert list(r.records()) == expected
+        assert list(r.records(TRACE_OUTPUT)) == [e for e in expected if e.kind == TRACE_OUTPUT]
+
+
+def test_round_trip_columns(tmp_path):
+    path = tmp_path / "t.trace"
+    _, expected = _write_mixed(path, 3_000)
+    with TraceReader(path) as r:
+        cols = r.columns()
+        for field in ("kind", "flags", "state", "code", "hook_time", "aux", "ts_ns"):
+            assert cols[field].tolist() == [getattr(e, field) for e in expected], field
+        owners = [r.owner_name(o) for o, k in zip(cols["owner"].tolist(), cols["kind"].tolist()) if k == TRACE_OUTPUT]
+        assert owners == [e.owner for e in expected if e.kind == TRACE_OUTPUT]
+        del cols
+
+
+def test_truncated_trace_reads_whole_records(tmp_path):
+    path = tmp_path / "t.trace"
+    _, expected = _write_mixed(path, 300)
+    cut = tmp_path / "cut.trace"
+    cut.write_bytes(path.read_bytes()[:24 + 100 * RECORD_SIZE + 7])
+    with TraceReader(cut) as r:
+        assert len(r) == 100
+        assert r.names == ()
+        got = list(r.records())
+    # Owners fall back to their index without the footer.
+    assert [g._replace(owner="") for g in got] == [e._replace(owner="") for e in expected[:100]]
+
+
+def test_not_a_trace(tmp_path):
+    path = tmp_path / "x.trace"
+    path.write_bytes(b"x" * 64)
+    with pytest.raises(ValueError):
+        TraceReader(path)
+
+
+def test_small_ring_under_output_burst_keeps_everything(tmp_path):
+    path = tmp_path / "t.trace"
+    w = TraceWriter(path, capacity=64)
+    w.start()
+    for i in range(2000):
+        w.record(i, "DSpam", "tap", "d")
+    w.close()
+    assert w.dropped == 0
+    with TraceReader(path) as r:
+        ts = r.columns()["ts_ns"]
+        assert ts.tolist() == list(range(2000))
+        del ts
+
+
+def test_hook_records_never_wait_on_a_full_ring(tmp_path, monkeypatch):
+    path = tmp_path / "t.trace"
+    w = TraceWriter(path, capacity=64)
+    waits = []
+    monkeypatch.setattr(w._drained, "wait", lambda timeout=None: waits.append(timeout))
+    w.start()
+    for i in range(5000):
+        w.hook(TRACE_MOUSE, 0, 0, False, False, i, 0x0200, i)
+    w.close()
+    assert waits == []
+    assert w.written + w.dropped == 5000
+    with TraceReader(path) as r:
+        ts = r.columns()["ts_ns"].tolist()
+    # Whatever was kept is in order.
+    assert ts == sorted(ts) and len(ts) == w.written
@@ -0,0 +1,69 @@
+from __future__ import annotations
+
+import pytest
+
+from lib.timing import calibrate_wait_profile
+
+
+class FakeClock:
+    """Sleep advances a virtual clock by the request plus a scripted overshoot (ms)."""
+
+    def __init__(self, overshoot) -> None:
+        self.now = 0
+        self.overshoot = overshoot
+        self.calls: dict[int, int] = {}
+
+    def now_ns(self) -> int:
+        return self.now
+
+    def sleep(self, ms: int) -> None:
+        n = self.calls.get(ms, 0)
+        self.calls[ms] = n + 1
+        self.now += int((ms + self.overshoot(ms, n)) * 1_000_000)
+
+
+def test_constant_overshoot_picks_finest_granularity():
+    over = {14: 1.0, 8: 1.5, 4: 0.9, 2: 0.6, 1: 0.4, 0: 0.05}
+    clock = FakeClock(lambda ms, n: over[ms])
+    p = calibrate_wait_profile(clock.sleep, clock.now_ns, samples=20, p99_bound_ms=0.5)
+    # threshold(g) = max(g, g + p99 - bound): 1 -> 1.0, so nothing from 2 up can do better.
+    assert p.is_calibrated
+    assert (p.long_ms, p.mid_ms, p.short_ms) == (14, 1, 0)
+    assert p.long_above_ms == pytest.approx(14.5)
+    assert p.mid_above_ms == pytest.approx(1.0)
+    assert p.spin_p99_ms == pytest.approx(0.05)
+    assert clock.calls == {1: 20, 14: 20, 0: 20}
+
+
+def test_p99_outlier_moves_mid_to_a_coarser_wait():
+    # 1 ms waits are usually fine but one sample in 20 overshoots by 2 ms,
+    # which lands on p99: 1 ms costs 2.5 ms of headroom, 2 ms only 2.1.
+    over = {14: 1.0, 8: 1.5, 4: 0.9, 2: 0.6, 0: 0.02}
+    clock = FakeClock(lambda ms, n: (2.0 if n == 7 else 0.4) if ms == 1 else over[ms])
+    p = calibrate_wait_profile(clock.sleep, clock.now_ns, samples=20, p99_bound_ms=0.5)
+    assert p.mid_ms == 2
+    assert p.mid_above_ms == pytest.approx(2.1)
+    assert p.long_above_ms == pytest.approx(14.5)
+    # 4 ms and up cannot beat 2.1 and are never sampled.
+    assert clock.calls == {1: 20, 2: 20, 14: 20, 0: 20}
+
+
+def test_tighter_bound_raises_thresholds():
+    over = {14: 1.0, 8: 1.0, 4: 1.0, 2: 1.0, 1: 1.0, 0: 0.0}
+    clock = FakeClock(lambda ms, n: over[ms])
+    p = calibrate_wait_profile(clock.sleep, clock.now_ns, samples=10, p99_bound_ms=0.0)
+    # Every granularity needs its full overshoot as headroom; the smallest total wins.
+    assert p.mid_ms == 1
+    assert p.mid_above_ms == pytest.approx(2.0)
+    assert p.long_above_ms == pytest.approx(15.0)
+
+
+def test_coarse_tiers_are_sampled_when_fine_ones_are_poor():
+    # Without timeBeginPeriod(1) every wait below ~15.6 ms rounds up to a tick.
+    clock = FakeClock(lambda ms, n: 15.6 - ms if ms else 0.01)
+    p = calibrate_wait_profile(clock.sleep, clock.now_ns, samples=10, p99_bound_ms=0.5)
+    # threshold(g) = 15.1 for every g < 15.6; ties go to the finest.
+    assert (p.long_ms, p.mid_ms) == (14, 1)
+    assert p.mid_above_ms == pytest.approx(15.1)
+    assert p.long_above_ms == pytest.approx(15.1)
+    assert clock.calls == {1: 10, 2: 10, 4: 10, 8: 10, 14: 10, 0: 10}